@@ -11,7 +11,10 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Modules jamais utilisés par l'application : moins de fichiers à charger au démarrage
+    excludes=['tkinter', 'unittest', 'pydoc', 'matplotlib', 'scipy', 'pandas', 'PIL',
+              'librosa', 'soundfile', 'IPython', 'PyQt6.QtWebEngineCore', 'PyQt6.QtQml',
+              'PyQt6.QtQuick', 'PyQt6.QtMultimedia', 'PyQt6.QtNetwork'],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -20,20 +23,18 @@ a = Analysis(
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
+# Mode dossier (onedir) : pas de décompression dans un dossier temporaire à chaque lancement
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='AutoDerush',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    # UPX ralentit le chargement des DLL (décompression à chaque démarrage)
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     target_arch=None,
@@ -41,4 +42,15 @@ exe = EXE(
     entitlements_file=None,
     icon='icon.ico',
     version='version_info.txt',
-) 
\ No newline at end of file
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='AutoDerush',
+)
@@ -0,0 +1,82 @@
+"""Vérification et mesure du décodage audio par tranches parallèles
+
+Analyse un fichier d'un seul tenant puis par tranches, compare les deux
+enveloppes (fenêtres, statistiques globales, segments détectés) et affiche
+les temps de décodage.
+
+    python benchmarks/sharded_extraction.py long_enregistrement.m4a --shards 8 --json shards.json
+
+Le script échoue si les segments détectés diffèrent ou si l'écart sur les
+énergies par fenêtre dépasse --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from video_cutter.audio_analyzer import AudioAnalyzer
+from video_cutter.media_probe import probe_media
+from video_cutter.sharded_extract import shard_count, extract_envelope_sharded, compare_envelopes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vérification du décodage audio par tranches")
+    parser.add_argument("media_path", help="fichier audio ou vidéo à analyser")
+    parser.add_argument("--shards", type=int, help="nombre de tranches (par défaut : selon les cœurs)")
+    parser.add_argument("--value", type=int, default=50, help="valeur du slider de seuil pour la comparaison")
+    parser.add_argument("--margin", type=int, default=100, help="marge (ms) pour la comparaison")
+    parser.add_argument("--tolerance", type=float, default=1e-3, help="écart maximal admis par fenêtre")
+    parser.add_argument("--json", help="fichier où enregistrer le rapport")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+
+    duration = probe_media(args.media_path)["duration"]
+    shards = args.shards or max(2, shard_count(duration))
+
+    analyzer = AudioAnalyzer()
+    started = time.monotonic()
+    audio_data, sample_rate = analyzer.extract_audio(args.media_path)
+    reference = analyzer.compute_envelope(audio_data, sample_rate)
+    single_seconds = time.monotonic() - started
+    del audio_data
+
+    started = time.monotonic()
+    sharded, _ = extract_envelope_sharded(args.media_path, duration, shards)
+    sharded_seconds = time.monotonic() - started
+
+    report = compare_envelopes(reference, sharded, args.value, args.margin / 1000.0)
+    report.update({
+        "duration": duration,
+        "shards": shards,
+        "single_seconds": round(single_seconds, 3),
+        "sharded_seconds": round(sharded_seconds, 3),
+        "speedup": round(single_seconds / sharded_seconds, 2) if sharded_seconds else None
+    })
+
+    print(f"Durée : {duration:.1f}s, {shards} tranches")
+    print(f"Décodage d'un seul tenant : {single_seconds:.1f}s")
+    print(f"Décodage par tranches : {sharded_seconds:.1f}s (x{report['speedup']})")
+    print(f"Fenêtres : {report['windows'][0]} / {report['windows'][1]}")
+    print(f"Écart maximal par fenêtre : {report['max_window_diff']:.2e} (moyen {report['mean_window_diff']:.2e})")
+    print(f"Écart sur la moyenne : {report['mean_diff']:.2e}, sur l'écart-type : {report['std_diff']:.2e}")
+    print(f"Segments : {report['segments'][0]} / {report['segments'][1]}"
+          f"{' identiques' if report['segments_equal'] else ' différents'}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if not report["segments_equal"] or report["max_window_diff"] > args.tolerance:
+        print("\nLe décodage par tranches ne reproduit pas le décodage d'un seul tenant")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
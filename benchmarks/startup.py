@@ -0,0 +1,106 @@
+"""Mesure du démarrage à froid d'AutoDerush
+
+Lance l'application plusieurs fois avec -X importtime, relève le délai avant
+le premier affichage de la fenêtre et les modules les plus coûteux à importer.
+
+    python benchmarks/startup.py --runs 5 --budget 1500 --json startup.json
+
+Avec --budget, le script échoue si la médiane du premier affichage dépasse le
+budget (en ms), pour repérer les régressions.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_SCRIPT = os.path.join(ROOT_DIR, "video_cutter", "main.py")
+BENCHMARK_ENV = "AUTODERUSH_STARTUP_BENCHMARK"
+# Modules qui ne doivent pas être chargés avant le premier affichage
+LAZY_MODULES = ["cv2", "numpy", "video_cutter.audio_analyzer"]
+
+
+def parse_importtime(stderr):
+    """Durées d'import (self et cumulée, en µs) par module"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return modules
+
+
+def run_once(timeout):
+    """Lance l'application une fois et retourne (premier affichage en ms, imports)"""
+    env = dict(os.environ, **{BENCHMARK_ENV: "1"})
+    result = subprocess.run([sys.executable, "-X", "importtime", MAIN_SCRIPT],
+                            capture_output=True, text=True, env=env, timeout=timeout, cwd=ROOT_DIR)
+    first_paint = None
+    for line in result.stdout.splitlines():
+        if line.startswith("first_paint_ms="):
+            first_paint = float(line.split("=", 1)[1])
+    if first_paint is None:
+        raise RuntimeError(f"Premier affichage non mesuré (code {result.returncode}) :\n{result.stderr[-2000:]}")
+    return first_paint, parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure du démarrage à froid d'AutoDerush")
+    parser.add_argument("--runs", type=int, default=5, help="nombre de lancements")
+    parser.add_argument("--top", type=int, default=15, help="nombre de modules affichés")
+    parser.add_argument("--budget", type=float, help="budget du premier affichage (ms)")
+    parser.add_argument("--json", help="fichier où enregistrer les mesures")
+    parser.add_argument("--timeout", type=float, default=60, help="délai maximal par lancement (s)")
+    args = parser.parse_args()
+
+    paints = []
+    imports = {}
+    for index in range(args.runs):
+        first_paint, modules = run_once(args.timeout)
+        paints.append(first_paint)
+        for name, times in modules.items():
+            imports.setdefault(name, []).append(times)
+        print(f"Lancement {index + 1}/{args.runs} : premier affichage en {first_paint:.0f} ms")
+
+    median_paint = statistics.median(paints)
+    # Médiane par module sur tous les lancements
+    summary = {name: (statistics.median(t[0] for t in times), statistics.median(t[1] for t in times))
+               for name, times in imports.items()}
+    top_level = {name: times for name, times in summary.items() if "." not in name}
+    total_import = sum(cumulative for _, cumulative in top_level.values())
+
+    print(f"\nPremier affichage (médiane) : {median_paint:.0f} ms "
+          f"(min {min(paints):.0f}, max {max(paints):.0f})")
+    print(f"Imports avant le premier affichage : {total_import / 1000:.0f} ms\n")
+    print(f"{'cumulé (ms)':>12} {'propre (ms)':>12}  module")
+    for name, (self_us, cumulative_us) in sorted(top_level.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"{cumulative_us / 1000:12.1f} {self_us / 1000:12.1f}  {name}")
+
+    eager = [name for name in LAZY_MODULES if name in summary]
+    if eager:
+        print(f"\nAttention : modules chargés avant le premier affichage : {', '.join(eager)}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "first_paint_ms": paints,
+                "first_paint_median_ms": median_paint,
+                "import_total_ms": total_import / 1000,
+                "imports_us": {name: {"self": t[0], "cumulative": t[1]} for name, t in summary.items()},
+                "eager_heavy_modules": eager
+            }, f, indent=2)
+
+    if args.budget is not None and median_paint > args.budget:
+        print(f"\nBudget dépassé : {median_paint:.0f} ms > {args.budget:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,14 +8,19 @@ icon_path = os.path.join('resources', 'icon.ico')
 PyInstaller.__main__.run([
     'video_cutter/main.py',  # Script principal
     '--name=AutoDerush',     # Nom de l'exécutable
-    '--onefile',             # Créer un seul fichier
+    '--onedir',              # Dossier plutôt qu'un fichier unique : démarrage sans décompression
+    '--noupx',               # Pas de compression UPX des DLL (démarrage plus rapide)
     '--windowed',            # Mode fenêtré (pas de console)
     '--icon=' + icon_path,   # Icône de l'application
     '--add-data=resources;resources',  # Inclure les ressources
     '--clean',               # Nettoyer les fichiers temporaires
     # Ajouter les dépendances nécessaires
-    '--hidden-import=librosa',
     '--hidden-import=numpy',
-    '--hidden-import=soundfile',
     '--hidden-import=PyQt6',
+    # Modules inutilisés exclus du paquet
+    '--exclude-module=tkinter',
+    '--exclude-module=matplotlib',
+    '--exclude-module=scipy',
+    '--exclude-module=librosa',
+    '--exclude-module=soundfile',
 ]) 
\ No newline at end of file
@@ -1,35 +1,110 @@
 import numpy as np
 import os
-import subprocess
+import json
+import threading
 import tempfile
 import logging
 import traceback
+import time
 import wave
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-# Pour masquer la fenêtre de commande sous Windows
-startupinfo = None
-if os.name == 'nt':
-    startupinfo = subprocess.STARTUPINFO()
-    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-    startupinfo.wShowWindow = subprocess.SW_HIDE
+from video_cutter.audio_export import export_audio
+from video_cutter.chunked_export import (ChunkedExport, DEFAULT_ENCODING, DRAFT_ENCODING, DRAFT_HEIGHT, DRAFT_FPS,
+                                         build_filter_complex, build_clips_filter, normalization_filters,
+                                         encoding_arguments, decoder_arguments, thread_arguments)
+from video_cutter.chunk_cache import source_identity
+from video_cutter.ffmpeg_runner import run_ffmpeg, FFmpegError
+from video_cutter.envelope_cache import EnvelopeCache
+from video_cutter.ingest import ingest, existing_proxy
+from video_cutter.envelope import (AudioEnvelope, detect_segments, threshold_multiplier, sweep, solve_for_duration,
+                                   DEFAULT_HYSTERESIS, STABLE_HYSTERESIS)
+from video_cutter.loudness import LoudnessEnvelope, loudnorm_filter
+from video_cutter.media_probe import probe_media
+from video_cutter.resource_governor import ANALYSIS
+from video_cutter.segments import SegmentList
+from video_cutter.sharded_extract import ANALYSIS_SAMPLE_RATE, shard_count, extract_envelope_sharded
+
+# Délai maximal de la vérification de FFmpeg
+FFMPEG_CHECK_TIMEOUT = 30
+# Nombre maximal d'analyses simultanées de plusieurs clips
+MAX_PARALLEL_ANALYSES = 4
 
 class AudioAnalyzer:
-    def __init__(self):
+    def __init__(self, envelope_cache=None):
         self.threshold = 0.02
         self.margin_ms = 100  # Marge par défaut en millisecondes
+        self.keep_visual_activity = False
+        self.cancel_event = threading.Event()
+        self.hysteresis = dict(DEFAULT_HYSTERESIS)
+        # Nombre de tranches décodées en parallèle (None : selon la durée et les cœurs, 1 : désactivé)
+        self.shards = None
+        # Extraction en basse priorité (analyses spéculatives)
+        self.low_priority = False
+        # Threads de chaque FFmpeg d'export (None : un par cœur, voir ResourceGovernor)
+        self.threads = None
+        # Gouverneur de ressources réglant le parallélisme des analyses (voir analyze_many)
+        self.governor = None
+        # Aperçu de prévisualisation produit par le décodage de l'analyse (voir ingest)
+        self.with_proxy = False
+        # Partagé avec d'autres analyseurs (préchargement) s'il est fourni
+        self.envelope_cache = envelope_cache if envelope_cache is not None else EnvelopeCache()
         logging.info("AudioAnalyzer initialisé")
         
     def set_threshold(self, value):
         """Met à jour le seuil de détection"""
         try:
             # Convertir la valeur du slider (1-100) en un multiplicateur (0.1-2.0)
-            self.threshold = 0.1 + (value / 50.0)
+            self.threshold = float(threshold_multiplier(value))
             logging.info(f"Seuil mis à jour : {self.threshold}")
         except Exception as e:
             logging.error(f"Erreur lors de la mise à jour du seuil : {str(e)}")
             logging.error(traceback.format_exc())
             raise
         
+    def cancel(self):
+        """Demande l'arrêt du traitement en cours (pris en compte entre deux étapes)"""
+        self.cancel_event.set()
+        logging.info("Annulation demandée")
+        
+    def check_cancelled(self):
+        """Interrompt le traitement si une annulation a été demandée"""
+        if self.cancel_event.is_set():
+            raise Exception("Traitement annulé")
+        
+    def set_hysteresis(self, enabled, **settings):
+        """Active la détection avec hystérésis (seuils d'ouverture et de fermeture, attaque, maintien)
+
+        Sans réglage explicite, STABLE_HYSTERESIS est utilisé ; désactivée, la
+        détection compare chaque fenêtre à un seul seuil.
+        """
+        if enabled:
+            self.hysteresis = dict(STABLE_HYSTERESIS, **settings)
+        else:
+            self.hysteresis = dict(DEFAULT_HYSTERESIS)
+        logging.info(f"Hystérésis : {self.hysteresis}")
+        
+    def set_sharding(self, shards):
+        """Règle le décodage par tranches parallèles des longs fichiers (None : automatique)"""
+        self.shards = shards
+        logging.info(f"Décodage par tranches : {shards if shards else 'automatique'}")
+        
+    def set_threads(self, threads):
+        """Règle le nombre de threads de chaque FFmpeg d'export (None : un par cœur)"""
+        self.threads = threads
+        logging.info(f"Threads par FFmpeg : {threads if threads else 'automatique'}")
+        
+    def set_proxy(self, enabled):
+        """Produit l'aperçu de prévisualisation pendant le décodage de l'analyse"""
+        self.with_proxy = enabled
+        logging.info(f"Aperçu pendant l'analyse : {enabled}")
+        
+    def set_keep_visual_activity(self, enabled):
+        """Active la conservation des passages silencieux mais visuellement actifs"""
+        self.keep_visual_activity = enabled
+        logging.info(f"Conservation de l'activité visuelle : {enabled}")
+        
     def set_margin(self, value_ms):
         """Met à jour la marge temporelle"""
         try:
@@ -55,23 +130,21 @@ class AudioAnalyzer:
                 raise FileNotFoundError(error_msg)
                 
             # Créer un fichier audio temporaire dans le dossier temp du système
-            temp_dir = tempfile.gettempdir()
-            temp_audio = os.path.join(temp_dir, 'temp_audio.wav')
+            # (nom unique : plusieurs analyses peuvent tourner en même temps)
+            handle, temp_audio = tempfile.mkstemp(prefix='temp_audio_', suffix='.wav')
+            os.close(handle)
             logging.info(f"Fichier audio temporaire : {temp_audio}")
             
             # S'assurer que ffmpeg est disponible
             try:
                 logging.info("Vérification de FFmpeg...")
-                result = subprocess.run(['ffmpeg', '-version'], 
-                    capture_output=True, 
-                    text=True, 
-                    check=True,
-                    startupinfo=startupinfo)
-                logging.info(f"Version de FFmpeg : {result.stdout.split('\\n')[0]}")
-            except subprocess.CalledProcessError as e:
+                result = run_ffmpeg(['ffmpeg', '-version'], timeout=FFMPEG_CHECK_TIMEOUT, capture_stdout=True)
+                version_line = result.stdout.split('\n')[0]
+                logging.info(f"Version de FFmpeg : {version_line}")
+            except (FFmpegError, OSError) as e:
                 error_msg = "FFmpeg n'est pas installé ou n'est pas accessible"
                 logging.error(error_msg)
-                logging.error(f"Erreur FFmpeg : {e.stderr}")
+                logging.error(f"Erreur FFmpeg : {str(e)}")
                 raise Exception(error_msg)
             
             # Extraire l'audio avec ffmpeg
@@ -82,7 +155,7 @@ class AudioAnalyzer:
                 '-i', video_path,
                 '-vn',  # Pas de vidéo
                 '-acodec', 'pcm_s16le',  # Codec audio
-                '-ar', '44100',  # Taux d'échantillonnage
+                '-ar', str(ANALYSIS_SAMPLE_RATE),  # Taux d'échantillonnage
                 '-ac', '1',  # Mono
                 temp_audio
             ]
@@ -90,14 +163,10 @@ class AudioAnalyzer:
             logging.info(f"Commande FFmpeg : {' '.join(command)}")
             
             try:
-                result = subprocess.run(command, 
-                    capture_output=True, 
-                    text=True, 
-                    check=True,
-                    startupinfo=startupinfo)
+                run_ffmpeg(command, cancel_event=self.cancel_event, low_priority=self.low_priority)
                 logging.info("Extraction audio terminée")
-            except subprocess.CalledProcessError as e:
-                error_msg = f"Erreur lors de l'extraction audio : {e.stderr}"
+            except FFmpegError as e:
+                error_msg = f"Erreur lors de l'extraction audio : {str(e)}"
                 logging.error(error_msg)
                 raise Exception(error_msg)
             
@@ -146,137 +215,282 @@ class AudioAnalyzer:
                 logging.error(f"Erreur lors de la suppression du fichier temporaire : {str(e)}")
             logging.info("=== Fin de l'extraction audio ===")
             
-    def detect_speech_segments(self, audio_data, sample_rate):
-        """Détecte les segments avec de la parole et optimise les transitions"""
+    def extract_with_proxy(self, video_path):
+        """Extrait l'audio et produit l'aperçu en un seul décodage (extraction seule si l'aperçu échoue)"""
         try:
-            logging.info("Début de la détection des segments de parole")
-            
-            # Conversion en mono si stéréo
-            if len(audio_data.shape) > 1:
-                logging.info("Conversion du signal stéréo en mono")
-                audio_data = np.mean(audio_data, axis=1)
+            audio_data, sample_rate, _ = ingest(video_path, cancel_event=self.cancel_event,
+                                                low_priority=self.low_priority)
+            return audio_data, sample_rate
+        except Exception as e:
+            self.check_cancelled()
+            logging.warning(f"Aperçu non produit, extraction de l'audio seul : {str(e)}")
+            return self.extract_audio(video_path)
             
-            # Calcul de l'énergie du signal
-            logging.info("Calcul de l'énergie du signal")
-            try:
-                # Utiliser la valeur absolue du signal comme énergie
-                energy = np.abs(audio_data)
-                energy_mean = np.mean(energy)
-                energy_std = np.std(energy)
-                # Le seuil est maintenant basé sur la moyenne et l'écart-type
-                energy_threshold = energy_mean + (energy_std * self.threshold)
-                logging.info(f"Statistiques du signal :")
-                logging.info(f"- Énergie moyenne : {energy_mean}")
-                logging.info(f"- Écart-type : {energy_std}")
-                logging.info(f"- Seuil calculé : {energy_threshold}")
-                logging.info(f"- Multiplicateur utilisé : {self.threshold}")
-            except Exception as e:
-                error_msg = f"Erreur lors du calcul de l'énergie : {str(e)}"
-                logging.error(error_msg)
-                logging.error(traceback.format_exc())
-                raise Exception(error_msg)
+    def extract_sharded(self, video_path, duration, shards, keep_audio=False):
+        """Calcule l'enveloppe d'un long fichier en décodant plusieurs tranches en parallèle"""
+        try:
+            logging.info(f"=== Extraction audio par tranches ({shards} tranches) ===")
+            envelope, audio_data = extract_envelope_sharded(video_path, duration, shards, self.cancel_event,
+                                                            keep_audio=keep_audio, low_priority=self.low_priority)
+            logging.info(f"Audio analysé : {envelope.total_samples} échantillons, {envelope.sample_rate}Hz")
+            return envelope, audio_data
+        except Exception as e:
+            error_msg = f"Erreur lors de l'extraction audio par tranches : {str(e)}"
+            logging.error(error_msg)
+            logging.error(traceback.format_exc())
+            raise Exception(error_msg)
             
-            # Détection des segments parlés
-            raw_segments = []
-            is_speech = False
-            start_time = 0
-            end_time = 0
-            speech_samples = 0
-            total_samples = len(energy)
-            
-            # Détecter les segments avec une fenêtre glissante pour réduire le bruit
-            window_size = int(sample_rate * 0.05)  # fenêtre de 50ms
-            for i in range(0, len(energy), window_size):
-                # Calculer la moyenne d'énergie sur la fenêtre
-                window_end = min(i + window_size, len(energy))
-                window_energy = np.mean(energy[i:window_end])
-                
-                if window_energy > energy_threshold and not is_speech:
-                    is_speech = True
-                    start_time = i
-                    speech_samples += window_size
-                elif window_energy > energy_threshold and is_speech:
-                    speech_samples += window_size
-                elif window_energy <= energy_threshold and is_speech:
-                    is_speech = False
-                    end_time = i
-                    if (end_time - start_time) > sample_rate * 0.1:  # Ignorer les segments < 100ms
-                        raw_segments.append((start_time / sample_rate, end_time / sample_rate))
-            
-            # Gérer le dernier segment si nécessaire
-            if is_speech:
-                end_time = len(audio_data)
-                if (end_time - start_time) > sample_rate * 0.1:
-                    raw_segments.append((start_time / sample_rate, end_time / sample_rate))
-            
-            # Fusionner les segments proches
-            if raw_segments:
-                merged_segments = [raw_segments[0]]
-                min_gap = 0.3  # 300ms de gap minimum entre les segments
+    def compute_envelope(self, audio_data, sample_rate):
+        """Calcule l'enveloppe d'énergie (fenêtres de 50ms) du signal"""
+        # Conversion en mono si stéréo
+        if len(audio_data.shape) > 1:
+            logging.info("Conversion du signal stéréo en mono")
+            audio_data = np.mean(audio_data, axis=1)
+        
+        envelope = AudioEnvelope.from_audio(audio_data, sample_rate)
+        logging.info(f"Statistiques du signal :")
+        logging.info(f"- Énergie moyenne : {envelope.energy_mean}")
+        logging.info(f"- Écart-type : {envelope.energy_std}")
+        logging.info(f"- Nombre de fenêtres : {len(envelope.window_energy)}")
+        return envelope
+        
+    @staticmethod
+    def needs_analysis(envelope, with_loudness=False, with_visual=False):
+        """Indique si une enveloppe en cache manque des mesures demandées"""
+        if envelope is None:
+            return True
+        return (with_loudness and envelope.loudness is None) or (with_visual and envelope.visual_activity is None)
+        
+    def cache_envelope(self, video_path, envelope):
+        """Place dans le cache une enveloppe calculée ailleurs (index de la médiathèque)"""
+        self.envelope_cache.put(json.dumps(source_identity(video_path), sort_keys=True), envelope)
+        
+    def is_analyzed(self, video_path):
+        """Indique si l'enveloppe d'un fichier est déjà en cache"""
+        try:
+            key = json.dumps(source_identity(video_path), sort_keys=True)
+        except OSError:
+            return False
+        return key in self.envelope_cache
+        
+    def cached_envelope(self, video_path, with_visual=False):
+        """Enveloppe en cache couvrant les mesures demandées, ou None ; ne calcule jamais rien"""
+        try:
+            key = json.dumps(source_identity(video_path), sort_keys=True)
+        except OSError:
+            return None
+        cached = self.envelope_cache.get(key)
+        return None if self.needs_analysis(cached, with_visual=with_visual) else cached
+        
+    def analyze(self, video_path, with_loudness=False, with_visual=False):
+        """Retourne l'enveloppe d'une vidéo, calculée une seule fois par fichier
+
+        Avec with_loudness, les mesures d'intensité sont faites pendant la même
+        passe d'analyse, sur l'audio déjà décodé. Avec with_visual, l'activité
+        visuelle est détectée en parallèle de l'extraction audio.
+        """
+        key = json.dumps(source_identity(video_path), sort_keys=True)
+        cached = self.envelope_cache.get(key)
+        if not self.needs_analysis(cached, with_loudness, with_visual):
+            logging.info("Enveloppe audio reprise du cache")
+            return cached
+        
+        # Un seul calcul par fichier : si un autre thread (préchargement) l'analyse
+        # déjà, on attend son résultat
+        with self.envelope_cache.analysis_lock(key):
+            cached = self.envelope_cache.get(key)
+            if not self.needs_analysis(cached, with_loudness, with_visual):
+                logging.info("Enveloppe audio reprise du cache")
+                return cached
+            need_audio = cached is None or (with_loudness and cached.loudness is None)
+            need_visual = with_visual and (cached is None or cached.visual_activity is None)
+            
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                visual_future = None
+                if need_visual:
+                    # cv2 n'est chargé que si l'activité visuelle est demandée
+                    from video_cutter.visual_activity import detect_visual_activity
+                    visual_future = executor.submit(detect_visual_activity, video_path)
                 
-                for i in range(1, len(raw_segments)):
-                    current_start, current_end = raw_segments[i]
-                    last_start, last_end = merged_segments[-1]
-                    
-                    if current_start - last_end < min_gap:
-                        # Fusionner les segments
-                        merged_segments[-1] = (last_start, current_end)
+                if need_audio:
+                    info = (probe_media(video_path, self.cancel_event)
+                            if self.shards != 1 or with_loudness or self.with_proxy else {})
+                    # L'aperçu manquant est produit par le même décodage, d'un seul tenant
+                    with_proxy = self.with_proxy and info.get("has_video") and existing_proxy(video_path) is None
+                    shards = 1 if with_proxy else shard_count(info.get("duration", 0.0), self.shards)
+                    if with_proxy:
+                        audio_data, sample_rate = self.extract_with_proxy(video_path)
+                        envelope = self.compute_envelope(audio_data, sample_rate)
+                    elif shards > 1:
+                        envelope, audio_data = self.extract_sharded(video_path, info["duration"], shards,
+                                                                    keep_audio=with_loudness)
+                        sample_rate = envelope.sample_rate
                     else:
-                        merged_segments.append((current_start, current_end))
+                        audio_data, sample_rate = self.extract_audio(video_path)
+                        envelope = self.compute_envelope(audio_data, sample_rate)
+                    if with_loudness:
+                        logging.info("Mesure de l'intensité sonore (pondération K)")
+                        channels = info.get("channels", 1)
+                        envelope.loudness = LoudnessEnvelope.from_audio(audio_data, sample_rate, channels)
+                    if cached is not None:
+                        envelope.visual_activity = cached.visual_activity
+                else:
+                    envelope = cached
                 
-                raw_segments = merged_segments
+                if visual_future is not None:
+                    envelope.visual_activity = visual_future.result()
             
-            # Logs des statistiques de détection
-            logging.info(f"Statistiques de détection :")
-            logging.info(f"- Nombre total d'échantillons : {total_samples}")
-            logging.info(f"- Échantillons avec parole : {speech_samples}")
-            logging.info(f"- Pourcentage de parole : {(speech_samples/total_samples)*100:.2f}%")
-            logging.info(f"- Nombre de segments bruts : {len(raw_segments)}")
+            self.envelope_cache.put(key, envelope)
+        return envelope
+        
+    def analyze_many(self, video_paths, with_loudness=False, with_visual=False, max_workers=MAX_PARALLEL_ANALYSES):
+        """Analyse plusieurs clips en parallèle ; retourne leurs enveloppes dans l'ordre
+
+        Le décodage se fait dans des processus FFmpeg distincts et NumPy libère
+        le GIL pendant les calculs : les analyses avancent réellement ensemble.
+        """
+        analyze = self.analyze
+        if self.governor is not None:
+            # Parallélisme décidé par le gouverneur, qui apprend du débit de chaque analyse
+            max_workers, _ = self.governor.plan(ANALYSIS, len(video_paths))
+            analyze = partial(self.analyze_measured, concurrency=max_workers)
+        workers = max(1, min(max_workers, len(video_paths)))
+        logging.info(f"Analyse de {len(video_paths)} clips ({workers} en parallèle)")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(analyze, video_path, with_loudness, with_visual)
+                       for video_path in video_paths]
+            try:
+                return [future.result() for future in futures]
+            except Exception:
+                # Une analyse a échoué : inutile d'attendre les suivantes
+                for future in futures:
+                    future.cancel()
+                raise
+        
+    def analyze_measured(self, video_path, with_loudness=False, with_visual=False, concurrency=1):
+        """Analyse un clip et transmet son débit au gouverneur (sauf enveloppe déjà en cache)"""
+        cached = self.is_analyzed(video_path)
+        started = time.monotonic()
+        envelope = self.analyze(video_path, with_loudness, with_visual)
+        if not cached:
+            self.governor.record(ANALYSIS, envelope.duration, time.monotonic() - started, concurrency)
+        return envelope
+        
+    def keep_mask(self, envelope):
+        """Fenêtres à garder quel que soit le seuil (passages visuellement actifs)"""
+        if not self.keep_visual_activity or envelope.visual_activity is None:
+            return None
+        return envelope.window_mask(envelope.visual_activity)
+        
+    def segments_from_envelope(self, envelope):
+        """Détecte les segments de parole à partir d'une enveloppe avec le seuil et la marge courants"""
+        try:
+            energy_threshold = envelope.energy_threshold(self.threshold)
+            logging.info(f"- Seuil calculé : {energy_threshold}")
+            logging.info(f"- Multiplicateur utilisé : {self.threshold}")
             
-            if not raw_segments:
-                logging.warning("Aucun segment détecté - ajustez le seuil de détection")
-                return []
+            segments = detect_segments(envelope, self.threshold, self.margin_ms / 1000.0,
+                                       self.keep_mask(envelope), self.hysteresis)
             
-            # Optimisation des segments
-            optimized_segments = []
-            margin_time = self.margin_ms / 1000.0
+            # Logs des statistiques de détection
+            if envelope.total_samples:
+                speech_windows = int(np.count_nonzero(envelope.window_energy > energy_threshold))
+                speech_ratio = min(1.0, speech_windows * envelope.window_size / envelope.total_samples)
+                logging.info(f"Statistiques de détection :")
+                logging.info(f"- Nombre total d'échantillons : {envelope.total_samples}")
+                logging.info(f"- Pourcentage de parole : {speech_ratio * 100:.2f}%")
+            
+            if not segments:
+                logging.warning("Aucun segment détecté - ajustez le seuil de détection")
+                return segments
             
-            # Traiter le premier segment
-            current_segment = list(raw_segments[0])
+            logging.info(f"Segments détectés : {len(segments)}")
+            return segments
             
-            # Fusionner les segments proches
-            for i in range(1, len(raw_segments)):
-                next_start, next_end = raw_segments[i]
-                
-                # Si les segments se chevauchent avec les marges
-                if (current_segment[1] + margin_time) >= (next_start - margin_time):
-                    # Fusionner les segments
-                    current_segment[1] = next_end
-                else:
-                    # Ajouter le segment avec les marges
-                    optimized_segments.append((
-                        max(0, current_segment[0] - margin_time),
-                        min(len(audio_data) / sample_rate, current_segment[1] + margin_time)
-                    ))
-                    current_segment = [next_start, next_end]
-            
-            # Ajouter le dernier segment
-            optimized_segments.append((
-                max(0, current_segment[0] - margin_time),
-                min(len(audio_data) / sample_rate, current_segment[1] + margin_time)
-            ))
-            
-            logging.info(f"Segments détectés : {len(optimized_segments)}")
-            return optimized_segments
+        except Exception as e:
+            error_msg = f"Erreur lors de la détection des segments : {str(e)}"
+            logging.error(error_msg)
+            logging.error(traceback.format_exc())
+            raise Exception(error_msg)
             
+    def detect_speech_segments(self, audio_data, sample_rate):
+        """Détecte les segments avec de la parole et optimise les transitions
+
+        Retourne une SegmentList (vide si aucun segment n'est détecté).
+        """
+        try:
+            logging.info("Début de la détection des segments de parole")
+            envelope = self.compute_envelope(audio_data, sample_rate)
+            return self.segments_from_envelope(envelope)
         except Exception as e:
             error_msg = f"Erreur lors de la détection des segments : {str(e)}"
             logging.error(error_msg)
             logging.error(traceback.format_exc())
             raise Exception(error_msg)
             
-    def export_segments(self, video_path, segments, output_dir, output_filename="video_sans_blancs.mp4"):
-        """Exporte les segments de vidéo sélectionnés"""
+    def measure_loudness(self, envelope, segments):
+        """Intensité intégrée, crête vraie et LRA des seuls segments gardés (EBU R128)"""
+        try:
+            if envelope.loudness is None:
+                raise Exception("L'analyse a été faite sans mesure d'intensité")
+            measurement = envelope.loudness.measure(segments)
+            logging.info(f"Intensité mesurée : {measurement['input_i']:.2f} LUFS, "
+                         f"crête vraie {measurement['input_tp']:.2f} dBTP, "
+                         f"LRA {measurement['input_lra']:.2f} LU")
+            return measurement
+        except Exception as e:
+            error_msg = f"Erreur lors de la mesure de l'intensité : {str(e)}"
+            logging.error(error_msg)
+            logging.error(traceback.format_exc())
+            raise Exception(error_msg)
+            
+    def normalization_filter(self, envelope, segments, target=None):
+        """Filtre loudnorm linéaire en une passe pour les segments gardés"""
+        return loudnorm_filter(self.measure_loudness(envelope, segments), target)
+        
+    def sweep_thresholds(self, envelope, margin_ms=None):
+        """Durée de sortie et nombre de coupes pour chaque valeur du slider (1-100)
+
+        Calculé en une seule passe vectorisée sur l'enveloppe ; la marge courante
+        est utilisée si margin_ms n'est pas précisée.
+        """
+        if margin_ms is None:
+            margin_ms = self.margin_ms
+        return sweep(envelope, margin_ms / 1000.0, keep_mask=self.keep_mask(envelope),
+                     hysteresis=self.hysteresis)
+        
+    def solve_threshold_for_duration(self, envelope, target_duration, margin_ms=None):
+        """Trouve la valeur du slider qui donne la durée de sortie la plus proche de la cible
+
+        Retourne le couple (valeur, durée obtenue).
+        """
+        value, duration = solve_for_duration(self.sweep_thresholds(envelope, margin_ms), target_duration)
+        logging.info(f"Durée cible {target_duration:.1f}s : seuil {value} ({duration:.1f}s)")
+        return value, duration
+            
+    def export_segments(self, video_path, segments, output_dir, output_filename="video_sans_blancs.mp4",
+                        resumable=False, chunk_duration=60.0, progress_callback=None, cache=None,
+                        audio_filter=None, audio_only=None, draft=False):
+        """Exporte les segments de vidéo sélectionnés
+
+        En mode reprenable, la sortie est encodée par blocs finalisés
+        indépendamment et un nouvel appel identique reprend après le dernier
+        bloc terminé. Avec un cache (ChunkCache), chaque segment est encodé
+        séparément et seuls les segments dont les bornes ont changé depuis un
+        export précédent sont réencodés. Retourne alors le bilan des blocs.
+        audio_filter est appliqué à l'audio exporté (voir normalization_filter).
+        audio_only force (True) ou empêche (False) l'export audio seul ; par
+        défaut il est choisi quand la source n'a pas de piste vidéo.
+        video_path peut aussi être une liste ordonnée de fichiers, segments
+        étant alors la liste des segments de chacun (voir export_clips).
+        Avec draft, la vidéo est rendue en brouillon de relecture (DRAFT_ENCODING) :
+        mêmes coupes, image réduite, encodage bien plus rapide.
+        """
+        if isinstance(video_path, (list, tuple)):
+            return self.export_clips(list(zip(video_path, segments)), output_dir, output_filename,
+                                     resumable=resumable, chunk_duration=chunk_duration,
+                                     progress_callback=progress_callback, cache=cache, audio_filter=audio_filter,
+                                     draft=draft)
         try:
             logging.info("Export de la vidéo sans les blancs :")
             logging.info(f"Vidéo source : {video_path}")
@@ -287,39 +501,45 @@ class AudioAnalyzer:
             
             # Préparer le fichier de sortie
             output_path = os.path.join(output_dir, output_filename)
+            segments = SegmentList.from_tuples(segments)
+            
+            if audio_only is None:
+                audio_only = not probe_media(video_path, self.cancel_event)["has_video"]
+            if audio_only:
+                if draft:
+                    logging.info("Export audio seul : pas de brouillon, l'export est déjà rapide")
+                return export_audio(video_path, segments, output_path, audio_filter=audio_filter,
+                                    cancel_event=self.cancel_event, progress_callback=progress_callback)
+            encoding = dict(DRAFT_ENCODING if draft else DEFAULT_ENCODING)
+            if draft:
+                logging.info("Rendu en brouillon de relecture")
+            
+            if cache is not None:
+                # Un morceau par segment pour que les segments inchangés soient retrouvés
+                return ChunkedExport(video_path, segments, output_path, chunk_duration=0,
+                                     encoding=encoding, cache=cache, cancel_event=self.cancel_event,
+                                     threads=self.threads, audio_filter=audio_filter).run(progress_callback)
+            
+            if resumable:
+                return ChunkedExport(video_path, segments, output_path, chunk_duration,
+                                     encoding=encoding, cancel_event=self.cancel_event,
+                                     threads=self.threads, audio_filter=audio_filter).run(progress_callback)
             
             # Construire le filtre complexe pour FFmpeg
-            filter_parts = []
-            for i, (start, end) in enumerate(segments):
-                # Ajouter les filtres vidéo
-                filter_parts.append(f"[0:v]trim=start={start}:end={end},setpts=PTS-STARTPTS[v{i}];")
-            
-            for i, (start, end) in enumerate(segments):
-                # Ajouter les filtres audio
-                filter_parts.append(f"[0:a]atrim=start={start}:end={end},asetpts=PTS-STARTPTS[a{i}];")
-            
-            # Ajouter la concaténation vidéo
-            concat_video = ''.join(f'[v{i}]' for i in range(len(segments)))
-            filter_parts.append(f"{concat_video}concat=n={len(segments)}:v=1:a=0[outv];")
-            
-            # Ajouter la concaténation audio
-            concat_audio = ''.join(f'[a{i}]' for i in range(len(segments)))
-            filter_parts.append(f"{concat_audio}concat=n={len(segments)}:v=0:a=1[outa]")
-            
-            filter_complex = ''.join(filter_parts)
+            filter_complex = build_filter_complex(segments, audio_filter=audio_filter,
+                                                  video_filter=encoding.get("video_filter"))
             
             # Préparer la commande FFmpeg
             command = [
                 'ffmpeg',
                 '-y',  # Écraser le fichier existant
+                *decoder_arguments(encoding),
                 '-i', video_path,
                 '-filter_complex', filter_complex,
                 '-map', '[outv]',
                 '-map', '[outa]',
-                '-c:v', 'libx264',  # Utiliser le codec H.264 pour la vidéo
-                '-preset', 'fast',   # Préréglage de compression rapide
-                '-c:a', 'aac',       # Utiliser le codec AAC pour l'audio
-                '-b:a', '192k',      # Bitrate audio de 192k
+                *encoding_arguments(encoding),  # H.264 et AAC (voir DEFAULT_ENCODING)
+                *thread_arguments(self.threads),
                 output_path
             ]
             
@@ -328,17 +548,12 @@ class AudioAnalyzer:
             
             # Exécuter FFmpeg
             try:
-                result = subprocess.run(command, 
-                    capture_output=True, 
-                    text=True, 
-                    check=True,
-                    startupinfo=startupinfo)
+                result = run_ffmpeg(command, cancel_event=self.cancel_event)
                 logging.info("Export terminé avec succès")
-                logging.info(f"Sortie FFmpeg : {result.stdout}")
-                if result.stderr:
-                    logging.info(f"Messages FFmpeg : {result.stderr}")
-            except subprocess.CalledProcessError as e:
-                error_msg = f"Erreur FFmpeg : {e.stderr}"
+                if result.stderr_tail:
+                    logging.info(f"Derniers messages FFmpeg : {result.stderr_tail}")
+            except FFmpegError as e:
+                error_msg = f"Erreur FFmpeg : {str(e)}"
                 logging.error(error_msg)
                 raise Exception(error_msg)
             
@@ -347,3 +562,74 @@ class AudioAnalyzer:
             logging.error(error_msg)
             logging.error(traceback.format_exc())
             raise Exception(error_msg)
+            
+    def export_clips(self, clips, output_dir, output_filename="video_sans_blancs.mp4", resumable=False,
+                     chunk_duration=60.0, progress_callback=None, cache=None, audio_filter=None, draft=False):
+        """Exporte les segments de plusieurs clips [(chemin, segments), ...] dans un seul fichier
+
+        Tous les clips sont des entrées d'un même FFmpeg, ramenées à l'image et
+        à la cadence du premier clip, et les segments sont enchaînés en un seul
+        encodage. En mode reprenable ou avec un cache, l'export est fait par
+        blocs, chaque bloc ne lisant qu'un clip.
+        """
+        try:
+            logging.info(f"Export de {len(clips)} clips dans un seul fichier :")
+            for video_path, segments in clips:
+                logging.info(f"- {video_path} : {len(segments)} segments")
+            os.makedirs(output_dir, exist_ok=True)
+            output_path = os.path.join(output_dir, output_filename)
+            clips = [(video_path, SegmentList.from_tuples(segments)) for video_path, segments in clips if len(segments)]
+            if not clips:
+                raise Exception("Aucun segment à exporter")
+            
+            infos = [probe_media(video_path, self.cancel_event) for video_path, _ in clips]
+            for (video_path, _), info in zip(clips, infos):
+                if not info["has_video"] or not info["has_audio"]:
+                    raise Exception(f"Le clip doit avoir une piste vidéo et une piste audio : {video_path}")
+            reference = infos[0]
+            width, height, fps = reference["width"], reference["height"], reference["fps"] or 30.0
+            if draft:
+                # Brouillon : le format commun est lui-même réduit
+                scale = min(1.0, DRAFT_HEIGHT / height)
+                width, height, fps = round(width * scale), round(height * scale), min(fps, DRAFT_FPS)
+            video_filter, audio_format = normalization_filters(width, height, fps)
+            logging.info(f"Format commun : {width}x{height} à {fps:g} i/s")
+            
+            encoding = dict(DRAFT_ENCODING if draft else DEFAULT_ENCODING, video_filter=video_filter,
+                            audio_format=audio_format)
+            
+            if cache is not None or resumable:
+                # Avec un cache, un morceau par segment pour que les segments inchangés soient retrouvés
+                export = ChunkedExport.from_clips(clips, output_path,
+                                                  chunk_duration=0 if cache is not None else chunk_duration,
+                                                  encoding=encoding, cache=cache, cancel_event=self.cancel_event,
+                                                  threads=self.threads, audio_filter=audio_filter)
+                return export.run(progress_callback)
+            
+            command = ['ffmpeg', '-y']
+            for video_path, _ in clips:
+                command += [*decoder_arguments(encoding), '-i', video_path]
+            command += [
+                '-filter_complex', build_clips_filter([segments for _, segments in clips], audio_filter,
+                                                      video_filter, audio_format),
+                '-map', '[outv]',
+                '-map', '[outa]',
+                *encoding_arguments(encoding),
+                *thread_arguments(self.threads),
+                output_path
+            ]
+            logging.info("Lancement de la commande FFmpeg")
+            logging.info(f"Commande : {' '.join(command)}")
+            try:
+                run_ffmpeg(command, cancel_event=self.cancel_event)
+                logging.info("Export terminé avec succès")
+            except FFmpegError as e:
+                error_msg = f"Erreur FFmpeg : {str(e)}"
+                logging.error(error_msg)
+                raise Exception(error_msg)
+            
+        except Exception as e:
+            error_msg = f"Erreur lors de l'export des clips : {str(e)}"
+            logging.error(error_msg)
+            logging.error(traceback.format_exc())
+            raise Exception(error_msg)
@@ -0,0 +1,195 @@
+import os
+import wave
+import logging
+import tempfile
+import traceback
+
+import numpy as np
+
+from video_cutter.ffmpeg_runner import run_ffmpeg
+from video_cutter.media_probe import probe_media
+from video_cutter.segments import SegmentList
+
+# Durée des fondus enchaînés aux points de coupe
+CROSSFADE_DURATION = 0.01
+# Nombre d'images (échantillons multicanaux) écrites d'un coup
+WRITE_BLOCK_FRAMES = 1 << 20
+
+# Encodeur utilisé selon l'extension du fichier de sortie (hors WAV, écrit directement)
+AUDIO_ENCODERS = {
+    '.flac': ['-c:a', 'flac'],
+    '.mp3': ['-c:a', 'libmp3lame', '-b:a', '192k'],
+    '.ogg': ['-c:a', 'libopus', '-b:a', '96k'],
+    '.opus': ['-c:a', 'libopus', '-b:a', '96k'],
+    '.aac': ['-c:a', 'aac', '-b:a', '192k', '-f', 'adts'],
+    '.m4a': ['-c:a', 'aac', '-b:a', '192k'],
+    '.mp4': ['-c:a', 'aac', '-b:a', '192k']
+}
+
+
+def decode_pcm(media_path, pcm_path, sample_rate, channels, cancel_event=None):
+    """Décode l'audio source en PCM 16 bits brut et le projette en mémoire (memmap)
+
+    Le fichier brut n'a pas d'en-tête : il se relit directement comme un
+    tableau (images, canaux) sans être chargé en entier.
+    """
+    command = [
+        'ffmpeg',
+        '-y',
+        '-i', media_path,
+        '-vn',
+        '-f', 's16le',
+        '-acodec', 'pcm_s16le',
+        '-ar', str(sample_rate),
+        '-ac', str(channels),
+        pcm_path
+    ]
+    logging.info(f"Décodage de l'audio source : {' '.join(command)}")
+    run_ffmpeg(command, cancel_event=cancel_event)
+    if os.path.getsize(pcm_path) < 2 * channels:
+        return np.zeros((0, channels), dtype=np.int16)
+    return np.memmap(pcm_path, dtype=np.int16, mode='r').reshape(-1, channels)
+
+
+def segment_frames(segments, sample_rate, total_frames):
+    """Bornes des segments en images, sans segment vide"""
+    starts = np.clip(np.round(segments.starts * sample_rate).astype(np.int64), 0, total_frames)
+    ends = np.clip(np.round(segments.ends * sample_rate).astype(np.int64), 0, total_frames)
+    keep = ends > starts
+    return starts[keep], ends[keep]
+
+
+def crossfades(pcm, starts, ends, length):
+    """Fondus enchaînés à puissance constante entre chaque segment et le suivant
+
+    Les length dernières images de chaque segment sont mélangées aux length
+    premières du suivant, pour tous les raccords à la fois.
+    Retourne un tableau (raccords, length, canaux) en int16.
+    """
+    if length == 0 or len(starts) < 2:
+        return np.zeros((0, length, pcm.shape[1]), dtype=np.int16)
+    offsets = np.arange(length)
+    tails = pcm[(ends[:-1, np.newaxis] - length + offsets)].astype(np.float32)
+    heads = pcm[(starts[1:, np.newaxis] + offsets)].astype(np.float32)
+    position = (offsets + 0.5) / length * (np.pi / 2)
+    fade_out = np.cos(position).astype(np.float32)[np.newaxis, :, np.newaxis]
+    fade_in = np.sin(position).astype(np.float32)[np.newaxis, :, np.newaxis]
+    mixed = tails * fade_out + heads * fade_in
+    return np.clip(np.round(mixed), -32768, 32767).astype(np.int16)
+
+
+def iter_output(pcm, starts, ends, mixed, length, cancel_event=None, progress_callback=None):
+    """Blocs d'octets de l'audio exporté : corps des segments et fondus aux raccords"""
+    count = len(starts)
+    for index in range(count):
+        if cancel_event is not None and cancel_event.is_set():
+            raise Exception("Export annulé")
+        body_start = starts[index] + (length if index > 0 else 0)
+        body_end = ends[index] - (length if index < count - 1 else 0)
+        for block_start in range(body_start, body_end, WRITE_BLOCK_FRAMES):
+            yield np.ascontiguousarray(pcm[block_start:min(block_start + WRITE_BLOCK_FRAMES, body_end)]).tobytes()
+        if index < count - 1 and length:
+            yield mixed[index].tobytes()
+        if progress_callback is not None:
+            progress_callback(index + 1, count)
+
+
+def write_wav(output_path, chunks, sample_rate, channels):
+    """Écrit un WAV 16 bits à partir de blocs d'octets"""
+    temp_path = output_path + ".partial"
+    with wave.open(temp_path, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        for chunk in chunks:
+            wav_file.writeframesraw(chunk)
+    os.replace(temp_path, output_path)
+
+
+def encode_audio(output_path, chunks, sample_rate, channels, audio_filter=None, cancel_event=None):
+    """Envoie les blocs PCM à un seul encodeur FFmpeg"""
+    extension = os.path.splitext(output_path)[1].lower()
+    command = [
+        'ffmpeg',
+        '-y',
+        '-f', 's16le',
+        '-ar', str(sample_rate),
+        '-ac', str(channels),
+        '-i', 'pipe:0'
+    ]
+    if audio_filter:
+        command += ['-af', audio_filter]
+    if extension == '.wav':
+        command += ['-c:a', 'pcm_s16le']
+    else:
+        command += AUDIO_ENCODERS.get(extension, AUDIO_ENCODERS['.m4a'])
+    command.append(output_path)
+    logging.info(f"Commande : {' '.join(command)}")
+    run_ffmpeg(command, cancel_event=cancel_event, input_chunks=chunks)
+
+
+def export_audio(media_path, segments, output_path, crossfade=CROSSFADE_DURATION, audio_filter=None,
+                 cancel_event=None, progress_callback=None):
+    """Exporte uniquement l'audio des segments gardés, sans toucher à la vidéo
+
+    L'audio source est décodé une fois dans son format natif, découpé par
+    indexation NumPy et raccordé par de courts fondus enchaînés. Un WAV est
+    écrit directement ; les autres formats (et la normalisation) passent par
+    un seul encodeur FFmpeg alimenté par un tube.
+    """
+    try:
+        logging.info("Export audio seul :")
+        logging.info(f"Source : {media_path}")
+        logging.info(f"Sortie : {output_path}")
+        segments = SegmentList.from_tuples(segments)
+        info = probe_media(media_path, cancel_event)
+        if not info["has_audio"]:
+            raise Exception("Le fichier ne contient pas de piste audio")
+        sample_rate = info.get("sample_rate") or 48000
+        channels = info.get("channels") or 2
+
+        output_dir = os.path.dirname(output_path)
+        os.makedirs(output_dir or ".", exist_ok=True)
+        handle, pcm_path = tempfile.mkstemp(suffix=".pcm", dir=output_dir or None)
+        os.close(handle)
+        pcm = None
+        chunks = None
+        try:
+            pcm = decode_pcm(media_path, pcm_path, sample_rate, channels, cancel_event)
+            starts, ends = segment_frames(segments, sample_rate, len(pcm))
+            if not len(starts):
+                raise Exception("Aucun segment à exporter")
+
+            # Fondus plus courts que la moitié du plus petit segment
+            length = int(min(round(crossfade * sample_rate), np.min(ends - starts) // 2))
+            mixed = crossfades(pcm, starts, ends, length)
+            chunks = iter_output(pcm, starts, ends, mixed, length, cancel_event, progress_callback)
+
+            if output_path.lower().endswith('.wav') and not audio_filter:
+                write_wav(output_path, chunks, sample_rate, channels)
+            else:
+                encode_audio(output_path, chunks, sample_rate, channels, audio_filter, cancel_event)
+        finally:
+            # Libérer la projection avant de supprimer le fichier (obligatoire sous Windows)
+            chunks = None
+            pcm = None
+            try:
+                os.remove(pcm_path)
+            except OSError as e:
+                logging.warning(f"Impossible de supprimer le fichier temporaire {pcm_path} : {str(e)}")
+
+        frames = int(np.sum(ends - starts)) - length * (len(starts) - 1)
+        summary = {
+            "audio_only": True,
+            "segments": len(starts),
+            "duration": frames / sample_rate,
+            "crossfade": length / sample_rate
+        }
+        logging.info(f"Export audio terminé : {len(starts)} segments, {summary['duration']:.1f}s")
+        return summary
+
+    except Exception as e:
+        error_msg = f"Erreur lors de l'export audio : {str(e)}"
+        logging.error(error_msg)
+        logging.error(traceback.format_exc())
+        raise Exception(error_msg)
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+
+# Taille maximale par défaut du cache (5 Go)
+DEFAULT_MAX_SIZE = 5 * 1024 ** 3
+
+
+def default_cache_dir():
+    """Retourne le dossier par défaut du cache des segments encodés"""
+    return os.path.join(os.path.expanduser("~"), "AutoDerush_cache", "chunks")
+
+
+def source_identity(video_path):
+    """Identifie un fichier source par son chemin, sa taille et sa date de modification"""
+    video_path = os.path.abspath(video_path)
+    stat = os.stat(video_path)
+    return {"path": video_path, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+
+def link_or_copy(source, destination):
+    """Crée un lien physique vers source, ou une copie si le lien est impossible"""
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+class ChunkCache:
+    """Cache sur disque des morceaux encodés, adressé par leur contenu
+
+    La clé d'un morceau dépend de l'identité de la source, des bornes de ses
+    segments et du profil d'encodage. La taille totale est plafonnée avec une
+    éviction des morceaux les moins récemment utilisés.
+    """
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_size = max_size
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.load_index()
+
+    @staticmethod
+    def make_key(identity, segments, encoding):
+        """Calcule la clé d'un morceau"""
+        material = json.dumps({
+            "source": identity,
+            "segments": [[round(float(start), 6), round(float(end), 6)] for start, end in segments],
+            "encoding": encoding
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def load_index(self):
+        """Charge l'index du cache"""
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            self.entries = index.get("entries", {})
+            stats = index.get("stats", {})
+            self.hits = stats.get("hits", 0)
+            self.misses = stats.get("misses", 0)
+            self.evictions = stats.get("evictions", 0)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Index du cache illisible, il sera reconstruit : {str(e)}")
+
+        # Oublier les entrées dont le fichier a disparu
+        for key in [key for key, entry in self.entries.items()
+                    if not os.path.exists(os.path.join(self.cache_dir, entry["file"]))]:
+            del self.entries[key]
+
+    def save(self):
+        """Écrit l'index du cache de manière atomique"""
+        with self.lock:
+            index = {
+                "entries": self.entries,
+                "stats": {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+            }
+            temp_path = self.index_path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+            os.replace(temp_path, self.index_path)
+
+    def get(self, key):
+        """Retourne le chemin du morceau en cache, ou None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                path = os.path.join(self.cache_dir, entry["file"])
+                if os.path.exists(path):
+                    entry["last_used"] = time.time()
+                    self.hits += 1
+                    return path
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, file_path):
+        """Ajoute un morceau encodé au cache et applique l'éviction"""
+        extension = os.path.splitext(file_path)[1]
+        cached_name = key + extension
+        cached_path = os.path.join(self.cache_dir, cached_name)
+        link_or_copy(file_path, cached_path)
+        with self.lock:
+            self.entries[key] = {
+                "file": cached_name,
+                "size": os.path.getsize(cached_path),
+                "last_used": time.time()
+            }
+            self.evict()
+        self.save()
+        return cached_path
+
+    def total_size(self):
+        """Taille totale des morceaux en cache en octets"""
+        return sum(entry["size"] for entry in self.entries.values())
+
+    def evict(self):
+        """Supprime les morceaux les moins récemment utilisés au-delà de la taille maximale"""
+        total = self.total_size()
+        if total <= self.max_size:
+            return
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError as e:
+                logging.warning(f"Impossible de supprimer un morceau du cache : {str(e)}")
+            total -= entry["size"]
+            del self.entries[key]
+            self.evictions += 1
+            logging.info(f"Morceau évincé du cache : {key}")
+
+    def stats(self):
+        """Statistiques d'utilisation du cache"""
+        requests = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "size": self.total_size(),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / requests if requests else 0.0
+        }
+
+    def clear(self):
+        """Vide entièrement le cache"""
+        with self.lock:
+            for entry in self.entries.values():
+                try:
+                    os.remove(os.path.join(self.cache_dir, entry["file"]))
+                except OSError:
+                    pass
+            self.entries = {}
+        self.save()
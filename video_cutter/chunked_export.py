@@ -0,0 +1,402 @@
+import os
+import json
+import shutil
+import logging
+import traceback
+
+from video_cutter.chunk_cache import ChunkCache, source_identity, link_or_copy
+from video_cutter.ffmpeg_runner import run_ffmpeg, FFmpegError
+from video_cutter.segments import SegmentList
+
+MANIFEST_VERSION = 1
+
+# Paramètres d'encodage utilisés par défaut pour l'export
+DEFAULT_ENCODING = {
+    "video_codec": "libx264",
+    "preset": "fast",
+    "audio_codec": "aac",
+    "audio_bitrate": "192k"
+}
+
+# Brouillon de relecture : image réduite, cadence basse, encodage le plus rapide
+DRAFT_HEIGHT = 360
+DRAFT_FPS = 15
+
+
+def draft_filter(height=DRAFT_HEIGHT, fps=DRAFT_FPS):
+    """Filtre vidéo du brouillon : hauteur réduite (jamais agrandie) et cadence basse"""
+    return f"scale=-2:min({height}\\,ih):flags=fast_bilinear,fps={fps}"
+
+
+# Paramètres d'encodage du brouillon. Le décodeur saute aussi le filtre de
+# dégroupage de la source : l'image est un peu moins nette, le décodage bien plus rapide
+DRAFT_ENCODING = {
+    "video_codec": "libx264",
+    "preset": "ultrafast",
+    "crf": 32,
+    "audio_codec": "aac",
+    "audio_bitrate": "64k",
+    "video_filter": draft_filter(),
+    "decoder_options": ["-skip_loop_filter", "all"]
+}
+
+
+def build_concat_filter(parts, audio_filter=None, video_filter=None, audio_format=None):
+    """Construit le filtre complexe FFmpeg qui découpe et concatène des extraits
+
+    parts est une liste ordonnée de (index de l'entrée, début, fin). video_filter
+    et audio_format sont appliqués à chaque extrait (mise au même format
+    d'entrées différentes), audio_filter à l'audio concaténé (normalisation
+    par exemple).
+    """
+    filter_parts = []
+    video_suffix = f",{video_filter}" if video_filter else ""
+    audio_suffix = f",{audio_format}" if audio_format else ""
+    for i, (input_index, start, end) in enumerate(parts):
+        # Ajouter les filtres vidéo
+        filter_parts.append(f"[{input_index}:v]trim=start={start}:end={end},setpts=PTS-STARTPTS{video_suffix}[v{i}];")
+
+    for i, (input_index, start, end) in enumerate(parts):
+        # Ajouter les filtres audio
+        filter_parts.append(f"[{input_index}:a]atrim=start={start}:end={end},asetpts=PTS-STARTPTS{audio_suffix}[a{i}];")
+
+    # Ajouter la concaténation vidéo
+    concat_video = ''.join(f'[v{i}]' for i in range(len(parts)))
+    filter_parts.append(f"{concat_video}concat=n={len(parts)}:v=1:a=0[outv];")
+
+    # Ajouter la concaténation audio
+    concat_audio = ''.join(f'[a{i}]' for i in range(len(parts)))
+    if audio_filter:
+        filter_parts.append(f"{concat_audio}concat=n={len(parts)}:v=0:a=1,{audio_filter}[outa]")
+    else:
+        filter_parts.append(f"{concat_audio}concat=n={len(parts)}:v=0:a=1[outa]")
+
+    return ''.join(filter_parts)
+
+
+def build_filter_complex(segments, offset=0.0, audio_filter=None, input_index=0, video_filter=None,
+                         audio_format=None):
+    """Construit le filtre complexe FFmpeg qui découpe et concatène les segments
+
+    offset est soustrait aux instants des segments, ce qui permet de travailler
+    sur une entrée déjà positionnée avec -ss. audio_filter est appliqué à
+    l'audio concaténé (normalisation par exemple).
+    """
+    parts = [(input_index, start - offset, end - offset) for start, end in segments]
+    return build_concat_filter(parts, audio_filter, video_filter, audio_format)
+
+
+def build_clips_filter(clips, audio_filter=None, video_filter=None, audio_format=None):
+    """Filtre complexe qui enchaîne les segments de plusieurs entrées (une par clip, dans l'ordre)"""
+    parts = [(input_index, start, end) for input_index, segments in enumerate(clips) for start, end in segments]
+    return build_concat_filter(parts, audio_filter, video_filter, audio_format)
+
+
+def normalization_filters(width, height, fps, sample_rate=48000):
+    """Filtres qui ramènent des clips différents à une même image et un même audio
+
+    L'image est mise à l'échelle sans déformation (bandes noires si besoin),
+    la cadence et le format de pixels sont fixés ; l'audio est rééchantillonné
+    en stéréo. Indispensable pour concaténer, ou assembler sans réencodage,
+    des extraits de sources différentes.
+    """
+    # libx264 en yuv420p exige des dimensions paires
+    width -= width % 2
+    height -= height % 2
+    video_filter = (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                    f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps:.10g},format=yuv420p")
+    audio_format = f"aformat=sample_fmts=fltp:sample_rates={sample_rate}:channel_layouts=stereo"
+    return video_filter, audio_format
+
+
+def encoding_arguments(encoding):
+    """Retourne les arguments FFmpeg correspondant aux paramètres d'encodage"""
+    arguments = [
+        '-c:v', encoding["video_codec"],
+        '-preset', encoding["preset"]
+    ]
+    if "crf" in encoding:
+        arguments += ['-crf', str(encoding["crf"])]
+    return arguments + [
+        '-c:a', encoding["audio_codec"],
+        '-b:a', encoding["audio_bitrate"]
+    ]
+
+
+def thread_arguments(threads):
+    """Threads d'encodage et de filtrage d'un FFmpeg (None : choix de FFmpeg, un par cœur)"""
+    if not threads:
+        return []
+    return ['-threads', str(threads), '-filter_complex_threads', str(threads)]
+
+
+def decoder_arguments(encoding):
+    """Options de décodage à placer avant chaque entrée (-i)"""
+    return list(encoding.get("decoder_options", []))
+
+
+def plan_chunks(segments, chunk_duration):
+    """Regroupe les segments consécutifs en blocs d'environ chunk_duration secondes de sortie"""
+    chunks = []
+    current = []
+    current_duration = 0.0
+    for start, end in segments:
+        current.append((start, end))
+        current_duration += end - start
+        if current_duration >= chunk_duration:
+            chunks.append(current)
+            current = []
+            current_duration = 0.0
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class ChunkedExport:
+    """Export découpé en blocs finalisés indépendamment, avec reprise
+
+    Chaque bloc est encodé dans son propre fichier puis renommé une fois
+    terminé ; un manifeste placé à côté de la sortie garde la trace des blocs
+    finalisés. Relancer le même export reprend après le dernier bloc terminé.
+    Avec un cache, les blocs déjà encodés lors d'un export précédent sont
+    réutilisés au lieu d'être réencodés. Construit avec from_clips, l'export
+    enchaîne plusieurs sources ; un bloc ne mélange jamais deux sources.
+    audio_filter (normalisation loudnorm linéaire, soit un gain constant)
+    n'est appliqué qu'à l'assemblage, où seul l'audio est réencodé : les
+    blocs, et donc le cache, ne dépendent pas des mesures de sonie.
+    """
+
+    def __init__(self, video_path, segments, output_path, chunk_duration=60.0, encoding=None, cache=None,
+                 cancel_event=None, threads=None, audio_filter=None):
+        # Sources dans l'ordre de sortie, chacune avec ses segments
+        self.clips = [(os.path.abspath(video_path), SegmentList.from_tuples(segments))]
+        self.output_path = os.path.abspath(output_path)
+        self.chunk_duration = chunk_duration
+        self.encoding = dict(encoding or DEFAULT_ENCODING)
+        self.cache = cache
+        # Vérifié entre deux blocs : l'export s'arrête proprement et pourra être repris
+        self.cancel_event = cancel_event
+        # Threads de chaque FFmpeg (voir ResourceGovernor) ; sans effet sur le contenu des blocs
+        self.threads = threads
+        self.audio_filter = audio_filter
+        self.manifest_path = self.output_path + ".derush.json"
+        self.parts_dir = self.output_path + ".parts"
+
+    @classmethod
+    def from_clips(cls, clips, output_path, **options):
+        """Export de plusieurs sources [(chemin, segments), ...] dans un seul fichier
+
+        Les sources doivent être ramenées au même format par l'encodage
+        (video_filter et audio_format, voir normalization_filters) pour que
+        les blocs s'assemblent sans réencodage.
+        """
+        video_path, segments = clips[0]
+        export = cls(video_path, segments, output_path, **options)
+        export.clips = [(os.path.abspath(path), SegmentList.from_tuples(clip_segments))
+                        for path, clip_segments in clips]
+        return export
+
+    def job_signature(self):
+        """Identifie le travail : une reprise n'est possible que si elle est identique"""
+        sources = []
+        for video_path, segments in self.clips:
+            stat = os.stat(video_path)
+            sources.append({
+                "video_path": video_path,
+                "video_size": stat.st_size,
+                "video_mtime": stat.st_mtime_ns,
+                "segments": [[round(start, 6), round(end, 6)] for start, end in segments]
+            })
+        signature = {"chunk_duration": self.chunk_duration, "encoding": self.encoding}
+        if len(sources) == 1:
+            signature.update(sources[0])
+        else:
+            signature["clips"] = sources
+        return signature
+
+    def load_manifest(self, signature):
+        """Charge le manifeste existant s'il correspond au même travail"""
+        if not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Manifeste illisible, l'export repart de zéro : {str(e)}")
+            return None
+        if manifest.get("version") != MANIFEST_VERSION or manifest.get("job") != signature:
+            logging.info("Manifeste d'un autre travail, l'export repart de zéro")
+            return None
+        return manifest
+
+    def save_manifest(self, manifest):
+        """Écrit le manifeste de manière atomique"""
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def new_manifest(self, signature):
+        """Crée un manifeste vierge et vide le dossier des blocs"""
+        if os.path.isdir(self.parts_dir):
+            shutil.rmtree(self.parts_dir)
+        chunks = []
+        for source, (_, segments) in enumerate(self.clips):
+            for chunk_segments in plan_chunks(segments, self.chunk_duration):
+                index = len(chunks)
+                chunks.append({
+                    "index": index,
+                    "source": source,
+                    "file": f"chunk_{index:05d}.ts",
+                    "segments": [[start, end] for start, end in chunk_segments],
+                    "done": False
+                })
+        return {"version": MANIFEST_VERSION, "job": signature, "chunks": chunks}
+
+    def can_resume(self):
+        """Indique si un export interrompu peut être repris"""
+        try:
+            manifest = self.load_manifest(self.job_signature())
+        except OSError:
+            return False
+        return manifest is not None and any(chunk["done"] for chunk in manifest["chunks"])
+
+    def encode_chunk(self, chunk, chunk_path):
+        """Encode un bloc dans un fichier temporaire puis le finalise par renommage"""
+        segments = [tuple(segment) for segment in chunk["segments"]]
+        chunk_start = segments[0][0]
+        chunk_end = segments[-1][1]
+        temp_path = chunk_path + ".partial"
+        video_path = self.clips[chunk.get("source", 0)][0]
+
+        command = [
+            'ffmpeg',
+            '-y',
+            '-ss', str(chunk_start),  # Recherche côté entrée : pas de décodage depuis le début
+            '-t', str(chunk_end - chunk_start),
+            *decoder_arguments(self.encoding),
+            '-i', video_path,
+            '-filter_complex', build_filter_complex(segments, offset=chunk_start,
+                                                    video_filter=self.encoding.get("video_filter"),
+                                                    audio_format=self.encoding.get("audio_format")),
+            '-map', '[outv]',
+            '-map', '[outa]',
+            *encoding_arguments(self.encoding),
+            *thread_arguments(self.threads),
+            '-f', 'mpegts',
+            temp_path
+        ]
+        logging.info(f"Encodage du bloc {chunk['index']} ({chunk_start:.2f}s - {chunk_end:.2f}s)")
+        logging.info(f"Commande : {' '.join(command)}")
+
+        try:
+            run_ffmpeg(command, cancel_event=self.cancel_event)
+        except FFmpegError as e:
+            error_msg = f"Erreur FFmpeg sur le bloc {chunk['index']} : {str(e)}"
+            logging.error(error_msg)
+            raise Exception(error_msg)
+
+        os.replace(temp_path, chunk_path)
+
+    def concat_chunks(self, manifest):
+        """Assemble les blocs finalisés dans le fichier de sortie sans réencodage"""
+        list_path = os.path.join(self.parts_dir, "concat.txt")
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for chunk in manifest["chunks"]:
+                f.write(f"file '{chunk['file']}'\n")
+
+        command = [
+            'ffmpeg',
+            '-y',
+            '-f', 'concat',
+            '-safe', '0',
+            '-i', list_path
+        ]
+        if self.audio_filter:
+            # Vidéo copiée, audio réencodé une seule fois avec la normalisation
+            command += [
+                '-c:v', 'copy',
+                '-af', self.audio_filter,
+                '-c:a', self.encoding["audio_codec"],
+                '-b:a', self.encoding["audio_bitrate"]
+            ]
+        else:
+            command += ['-c', 'copy']
+            if self.encoding["audio_codec"] == 'aac':
+                command += ['-bsf:a', 'aac_adtstoasc']
+        command.append(self.output_path)
+
+        logging.info("Assemblage des blocs")
+        logging.info(f"Commande : {' '.join(command)}")
+        try:
+            run_ffmpeg(command, cancel_event=self.cancel_event)
+        except FFmpegError as e:
+            error_msg = f"Erreur FFmpeg lors de l'assemblage : {str(e)}"
+            logging.error(error_msg)
+            raise Exception(error_msg)
+
+    def run(self, progress_callback=None):
+        """Exécute (ou reprend) l'export par blocs"""
+        try:
+            os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+            signature = self.job_signature()
+
+            manifest = self.load_manifest(signature)
+            if manifest is None:
+                manifest = self.new_manifest(signature)
+                self.save_manifest(manifest)
+            else:
+                done = sum(1 for chunk in manifest["chunks"] if chunk["done"])
+                logging.info(f"Reprise de l'export : {done}/{len(manifest['chunks'])} blocs déjà finalisés")
+            os.makedirs(self.parts_dir, exist_ok=True)
+
+            identities = [source_identity(path) for path, _ in self.clips] if self.cache is not None else None
+            total = len(manifest["chunks"])
+            summary = {"chunks": total, "resumed": 0, "cached": 0, "encoded": 0}
+            for chunk in manifest["chunks"]:
+                if self.cancel_event is not None and self.cancel_event.is_set():
+                    raise Exception("Export interrompu, il reprendra au bloc suivant")
+                chunk_path = os.path.join(self.parts_dir, chunk["file"])
+                if chunk["done"] and os.path.exists(chunk_path):
+                    logging.info(f"Bloc {chunk['index']} déjà finalisé")
+                    summary["resumed"] += 1
+                else:
+                    cached_path = None
+                    if self.cache is not None:
+                        key = ChunkCache.make_key(identities[chunk.get("source", 0)], chunk["segments"],
+                                                  self.encoding)
+                        cached_path = self.cache.get(key)
+                    if cached_path is not None:
+                        logging.info(f"Bloc {chunk['index']} repris du cache")
+                        link_or_copy(cached_path, chunk_path)
+                        summary["cached"] += 1
+                    else:
+                        self.encode_chunk(chunk, chunk_path)
+                        if self.cache is not None:
+                            self.cache.put(key, chunk_path)
+                        summary["encoded"] += 1
+                    chunk["done"] = True
+                    self.save_manifest(manifest)
+                if progress_callback:
+                    progress_callback(chunk["index"] + 1, total)
+
+            self.concat_chunks(manifest)
+
+            # L'export est complet : le manifeste et les blocs ne servent plus
+            shutil.rmtree(self.parts_dir, ignore_errors=True)
+            os.remove(self.manifest_path)
+            logging.info("Export par blocs terminé avec succès")
+            logging.info(f"Blocs : {summary['encoded']} encodés, {summary['cached']} repris du cache, "
+                         f"{summary['resumed']} repris d'un export interrompu")
+            if self.cache is not None:
+                self.cache.save()
+                stats = self.cache.stats()
+                logging.info(f"Cache : {stats['hits']} succès, {stats['misses']} échecs, "
+                             f"{stats['evictions']} évictions, {stats['size'] / 1024 ** 2:.1f} Mo")
+            return summary
+
+        except Exception as e:
+            error_msg = f"Erreur lors de l'export par blocs : {str(e)}"
+            logging.error(error_msg)
+            logging.error(traceback.format_exc())
+            raise Exception(error_msg)
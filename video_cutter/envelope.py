@@ -0,0 +1,244 @@
+import numpy as np
+
+from video_cutter.segments import SegmentList
+
+# Durée d'une fenêtre d'analyse
+WINDOW_DURATION = 0.05
+# Durée minimale d'un segment de parole brut
+MIN_SEGMENT_DURATION = 0.1
+# Écart en dessous duquel deux segments bruts sont fusionnés
+MIN_GAP = 0.3
+# Nombre maximal de cellules du masque (seuils x fenêtres) traitées d'un coup
+SWEEP_BLOCK_CELLS = 16_000_000
+
+# Hystérésis : seuil de fermeture (fraction du seuil d'ouverture au-dessus de la
+# moyenne), durée minimale au-dessus du seuil pour ouvrir (attaque) et silence
+# maximal comblé avant de fermer (maintien), en secondes
+DEFAULT_HYSTERESIS = {"close_ratio": 1.0, "attack": 0.0, "hangover": 0.0}
+STABLE_HYSTERESIS = {"close_ratio": 0.5, "attack": 0.1, "hangover": 0.25}
+
+
+def threshold_multiplier(value):
+    """Convertit la valeur du slider (1-100) en un multiplicateur (0.1-2.0)"""
+    return 0.1 + (np.asarray(value, dtype=np.float64) / 50.0)
+
+
+class AudioEnvelope:
+    """Énergie moyenne par fenêtre de 50ms et statistiques globales du signal
+
+    C'est tout ce dont la détection a besoin : une fois l'enveloppe calculée,
+    changer le seuil ou la marge ne demande plus de relire l'audio.
+    """
+
+    def __init__(self, window_energy, window_size, sample_rate, total_samples, energy_mean, energy_std):
+        self.window_energy = window_energy
+        self.window_size = window_size
+        self.sample_rate = sample_rate
+        self.total_samples = total_samples
+        self.energy_mean = energy_mean
+        self.energy_std = energy_std
+        # Mesures d'intensité (LoudnessEnvelope), calculées sur demande
+        self.loudness = None
+        # Passages visuellement actifs (SegmentList), calculés sur demande
+        self.visual_activity = None
+
+    @classmethod
+    def from_audio(cls, audio_data, sample_rate):
+        """Calcule l'enveloppe d'un signal mono"""
+        energy = np.abs(audio_data)
+        total_samples = len(energy)
+        window_size = int(sample_rate * WINDOW_DURATION)
+        if total_samples == 0:
+            return cls(np.zeros(0), window_size, sample_rate, 0, 0.0, 0.0)
+        # La dernière fenêtre peut être incomplète
+        window_starts = np.arange(0, total_samples, window_size)
+        window_lengths = np.diff(np.append(window_starts, total_samples))
+        window_energy = np.add.reduceat(energy, window_starts) / window_lengths
+        return cls(window_energy, window_size, sample_rate, total_samples,
+                   float(np.mean(energy)), float(np.std(energy)))
+
+    @property
+    def duration(self):
+        """Durée du signal en secondes"""
+        return self.total_samples / self.sample_rate if self.sample_rate else 0.0
+
+    def window_mask(self, segments):
+        """Fenêtres dont le centre tombe dans l'un des segments"""
+        centers = (np.arange(len(self.window_energy)) * self.window_size + self.window_size / 2) / self.sample_rate
+        return segments.contains(centers)
+
+    def energy_threshold(self, multiplier):
+        """Seuil d'énergie correspondant à un multiplicateur de l'écart-type"""
+        return self.energy_mean + self.energy_std * np.asarray(multiplier, dtype=np.float64)
+
+
+def _runs(flat):
+    """Plages de valeurs identiques d'un masque à plat : (débuts, longueurs, valeurs)"""
+    change = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    starts = np.concatenate(([0], change))
+    lengths = np.diff(np.append(starts, len(flat)))
+    return starts, lengths, flat[starts]
+
+
+def hysteresis_mask(window_energy, open_thresholds, close_thresholds, attack_windows=0, hangover_windows=0):
+    """Masque de parole avec hystérésis, une ligne par couple de seuils
+
+    Une plage au-dessus du seuil de fermeture n'est gardée que si elle
+    contient au moins attack_windows fenêtres consécutives au-dessus du seuil
+    d'ouverture (ouverture morphologique), puis les silences internes de
+    hangover_windows fenêtres au plus sont comblés (fermeture morphologique).
+    Tout est calculé par longueurs de plages sur le masque mis à plat ; une
+    colonne vide sépare les lignes pour qu'aucune plage ne les traverse.
+    """
+    open_thresholds = np.atleast_1d(np.asarray(open_thresholds, dtype=np.float64))
+    close_thresholds = np.minimum(np.atleast_1d(np.asarray(close_thresholds, dtype=np.float64)), open_thresholds)
+    rows, width = len(open_thresholds), len(window_energy)
+
+    padded = np.zeros((rows, width + 1), dtype=bool)
+    padded[:, :width] = window_energy[np.newaxis, :] > open_thresholds[:, np.newaxis]
+    flat_open = padded.ravel().copy()
+
+    # Attaque : les dépassements trop brefs du seuil d'ouverture ne comptent pas
+    if attack_windows > 1:
+        starts, lengths, values = _runs(flat_open)
+        flat_open = np.repeat(values & (lengths >= attack_windows), lengths)
+
+    # Hystérésis : une plage au-dessus du seuil de fermeture est gardée si elle a été ouverte
+    flat = flat_open
+    if np.any(close_thresholds < open_thresholds):
+        padded[:, :width] = window_energy[np.newaxis, :] > close_thresholds[:, np.newaxis]
+        flat_close = padded.ravel()
+        starts, lengths, values = _runs(flat_close)
+        opened = np.add.reduceat(flat_open.astype(np.int64), starts) > 0
+        flat = np.repeat(values & opened, lengths)
+
+    # Maintien : combler les silences courts entre deux plages d'une même ligne
+    if hangover_windows > 0:
+        starts, lengths, values = _runs(flat)
+        separator = np.zeros(len(flat), dtype=np.int64)
+        separator[width::width + 1] = 1
+        interior = (starts > 0) & (np.add.reduceat(separator, starts) == 0)
+        fill = ~values & (lengths <= hangover_windows) & interior
+        flat = np.repeat(values | fill, lengths)
+
+    return flat.reshape(rows, width + 1)[:, :width]
+
+
+def _row_breaks(rows, condition):
+    """Début d'un nouveau groupe : changement de ligne ou condition vraie"""
+    return np.concatenate(([True], (rows[1:] != rows[:-1]) | condition))
+
+
+def batched_segments(envelope, thresholds, margin, keep_mask=None, hysteresis=None):
+    """Détecte les segments pour plusieurs seuils d'énergie à la fois
+
+    Retourne trois tableaux à plat (ligne, début, fin), triés par ligne puis
+    par début ; la ligne est l'indice du seuil dans thresholds. Les fenêtres
+    de keep_mask sont gardées quel que soit le seuil. hysteresis suit le
+    format de DEFAULT_HYSTERESIS ; par défaut, un seul seuil est appliqué.
+    """
+    thresholds = np.atleast_1d(np.asarray(thresholds, dtype=np.float64))
+    window_size = envelope.window_size
+    sample_rate = envelope.sample_rate
+    total_samples = envelope.total_samples
+
+    hysteresis = dict(DEFAULT_HYSTERESIS, **(hysteresis or {}))
+    if hysteresis == DEFAULT_HYSTERESIS:
+        mask = envelope.window_energy[np.newaxis, :] > thresholds[:, np.newaxis]
+    else:
+        window_duration = window_size / sample_rate
+        close_thresholds = envelope.energy_mean + (thresholds - envelope.energy_mean) * hysteresis["close_ratio"]
+        mask = hysteresis_mask(envelope.window_energy, thresholds, close_thresholds,
+                               int(round(hysteresis["attack"] / window_duration)),
+                               int(round(hysteresis["hangover"] / window_duration)))
+    if keep_mask is not None:
+        mask |= keep_mask[np.newaxis, :]
+
+    # Fronts montants et descendants du masque, ligne par ligne
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, start_windows = np.nonzero(edges == 1)
+    _, end_windows = np.nonzero(edges == -1)
+
+    # Ignorer les segments < 100ms (comparaison exacte en échantillons)
+    start_samples = start_windows * window_size
+    end_samples = np.minimum(end_windows * window_size, total_samples)
+    keep = (end_samples - start_samples) > sample_rate * MIN_SEGMENT_DURATION
+    rows = rows[keep]
+    starts = start_samples[keep] / sample_rate
+    ends = end_samples[keep] / sample_rate
+    if len(rows) == 0:
+        return rows, starts, ends
+
+    # Fusionner les segments proches d'une même ligne
+    first = np.flatnonzero(_row_breaks(rows, (starts[1:] - ends[:-1]) >= MIN_GAP))
+    last = np.append(first[1:] - 1, len(rows) - 1)
+    rows, starts, ends = rows[first], starts[first], ends[last]
+
+    # Ajouter les marges en fusionnant les segments qu'elles font se chevaucher
+    padded_starts = starts - margin
+    padded_ends = ends + margin
+    first = np.flatnonzero(_row_breaks(rows, padded_ends[:-1] < padded_starts[1:]))
+    last = np.append(first[1:] - 1, len(rows) - 1)
+    starts = np.maximum(padded_starts[first], 0)
+    ends = np.minimum(padded_ends[last], total_samples / sample_rate)
+    return rows[first], starts, ends
+
+
+def detect_segments(envelope, multiplier, margin, keep_mask=None, hysteresis=None):
+    """Segments pour un multiplicateur de seuil et une marge (en secondes)"""
+    _, starts, ends = batched_segments(envelope, envelope.energy_threshold(multiplier), margin, keep_mask,
+                                       hysteresis)
+    return SegmentList(starts, ends)
+
+
+def sweep(envelope, margin, values=range(1, 101), keep_mask=None, hysteresis=None):
+    """Durée de sortie et nombre de coupes pour chaque valeur du slider
+
+    Toutes les valeurs sont traitées en une passe vectorisée (par blocs pour
+    borner la mémoire) sur la même enveloppe.
+    """
+    values = np.asarray(list(values), dtype=np.float64)
+    durations = np.zeros(len(values))
+    segment_counts = np.zeros(len(values), dtype=np.int64)
+    cut_counts = np.zeros(len(values), dtype=np.int64)
+    total_duration = envelope.duration
+
+    block = max(1, SWEEP_BLOCK_CELLS // max(1, len(envelope.window_energy)))
+    for offset in range(0, len(values), block):
+        block_values = values[offset:offset + block]
+        multipliers = threshold_multiplier(block_values)
+        rows, starts, ends = batched_segments(envelope, envelope.energy_threshold(multipliers), margin,
+                                              keep_mask, hysteresis)
+        n = len(block_values)
+        durations[offset:offset + n] = np.bincount(rows, weights=ends - starts, minlength=n)
+        counts = np.bincount(rows, minlength=n)
+        segment_counts[offset:offset + n] = counts
+
+        # Coupes : les trous entre segments, plus le début et la fin s'ils ne sont pas gardés
+        cuts = np.maximum(counts - 1, 0)
+        if len(rows):
+            first = np.flatnonzero(_row_breaks(rows, np.zeros(len(rows) - 1, dtype=bool)))
+            last = np.append(first[1:] - 1, len(rows) - 1)
+            cuts[rows[first]] += starts[first] > 0
+            cuts[rows[last]] += ends[last] < total_duration
+        cuts[counts == 0] = 1 if total_duration > 0 else 0
+        cut_counts[offset:offset + n] = cuts
+
+    return {
+        "values": values.astype(np.int64),
+        "durations": durations,
+        "segment_counts": segment_counts,
+        "cut_counts": cut_counts
+    }
+
+
+def solve_for_duration(sweep_result, target_duration):
+    """Valeur du slider dont la durée de sortie est la plus proche de la cible
+
+    À écart égal, la valeur la plus faible (détection la plus prudente) est retenue.
+    """
+    errors = np.abs(sweep_result["durations"] - target_duration)
+    index = int(np.argmin(errors))
+    return int(sweep_result["values"][index]), float(sweep_result["durations"][index])
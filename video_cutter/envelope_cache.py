@@ -0,0 +1,51 @@
+import threading
+from collections import OrderedDict
+
+# Nombre d'enveloppes gardées en mémoire
+MAX_CACHED_ENVELOPES = 8
+
+
+class EnvelopeCache:
+    """Enveloppes audio déjà calculées, partagées entre plusieurs analyseurs
+
+    Les plus récemment utilisées sont gardées. Chaque fichier a son propre
+    verrou d'analyse : un analyseur qui demande un fichier en cours d'analyse
+    dans un autre thread (préchargement) attend son résultat au lieu de le
+    recalculer. Ne dépend que de la bibliothèque standard pour pouvoir être
+    créé dès l'ouverture de la fenêtre.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_ENVELOPES):
+        self.max_entries = max_entries
+        self.envelopes = OrderedDict()
+        self.lock = threading.Lock()
+        self.analysis_locks = {}
+
+    def get(self, key):
+        with self.lock:
+            envelope = self.envelopes.get(key)
+            if envelope is not None:
+                self.envelopes.move_to_end(key)
+            return envelope
+
+    def put(self, key, envelope):
+        with self.lock:
+            self.envelopes[key] = envelope
+            self.envelopes.move_to_end(key)
+            while len(self.envelopes) > self.max_entries:
+                evicted, _ = self.envelopes.popitem(last=False)
+                self.analysis_locks.pop(evicted, None)
+
+    def items(self):
+        """Copie des (clé, enveloppe) gardées, des plus anciennes aux plus récentes"""
+        with self.lock:
+            return list(self.envelopes.items())
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.envelopes
+
+    def analysis_lock(self, key):
+        """Verrou à tenir pendant le calcul de l'enveloppe d'un fichier"""
+        with self.lock:
+            return self.analysis_locks.setdefault(key, threading.Lock())
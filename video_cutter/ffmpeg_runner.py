@@ -0,0 +1,285 @@
+import io
+import os
+import signal
+import logging
+import threading
+import subprocess
+import time
+from collections import deque
+
+# Pour masquer la fenêtre de commande sous Windows
+startupinfo = None
+if os.name == 'nt':
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    startupinfo.wShowWindow = subprocess.SW_HIDE
+
+# Nombre de lignes de stderr conservées pour les messages d'erreur
+STDERR_TAIL_LINES = 50
+# Intervalle de vérification de l'annulation et du délai maximal
+POLL_INTERVAL = 0.2
+# Délai laissé au processus pour s'arrêter proprement avant d'être tué
+TERMINATE_GRACE = 3.0
+# Gentillesse (nice) des commandes de basse priorité hors Windows
+LOW_PRIORITY_NICE = 10
+# Taille maximale des blocs lus sur la sortie d'une commande en flux
+STREAM_BLOCK_SIZE = 1 << 16
+
+
+class FFmpegError(Exception):
+    """Échec d'une commande FFmpeg ou FFprobe"""
+
+    def __init__(self, message, returncode=None, stderr_tail=""):
+        super().__init__(message)
+        self.returncode = returncode
+        self.stderr_tail = stderr_tail
+
+
+class FFmpegCancelled(FFmpegError):
+    """La commande a été interrompue à la demande de l'utilisateur"""
+
+
+class FFmpegTimeout(FFmpegError):
+    """La commande a dépassé son délai maximal"""
+
+
+class FFmpegResult:
+    """Résultat d'une commande terminée avec succès"""
+
+    def __init__(self, returncode, stdout, stderr_tail):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr_tail = stderr_tail
+
+
+def kill_process_tree(process):
+    """Arrête le processus et ses enfants
+
+    Le processus est lancé dans son propre groupe : sous Windows taskkill /T
+    arrête tout l'arbre, ailleurs le groupe reçoit SIGTERM puis SIGKILL.
+    """
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == 'nt':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                           startupinfo=startupinfo)
+        else:
+            os.killpg(process.pid, signal.SIGTERM)
+            try:
+                process.wait(TERMINATE_GRACE)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, OSError) as e:
+        logging.warning(f"Impossible d'arrêter le processus {process.pid} : {str(e)}")
+        process.kill()
+    process.wait()
+
+
+def cancel_on_sigterm(cancel_event):
+    """Lève cancel_event au premier SIGTERM pour que le FFmpeg en cours soit arrêté avec son arbre
+
+    L'événement est levé depuis un thread : le signal peut interrompre le
+    thread principal pendant qu'il tient le verrou de l'événement. Le
+    comportement par défaut est ensuite rétabli, un second SIGTERM arrête
+    le processus.
+    """
+    def handler(signum, frame):
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        threading.Thread(target=cancel_event.set, name="sigterm-cancel", daemon=True).start()
+
+    signal.signal(signal.SIGTERM, handler)
+
+
+def _read_lines(stream, tail, log_lines):
+    """Lit un flux ligne par ligne en ne gardant que les dernières lignes"""
+    for line in stream:
+        line = line.rstrip()
+        if not line:
+            continue
+        tail.append(line)
+        if log_lines:
+            logging.debug(line)
+    stream.close()
+
+
+def _write_all(stream, chunks, errors):
+    """Écrit des blocs d'octets sur l'entrée du processus"""
+    try:
+        for chunk in chunks:
+            stream.write(chunk)
+    except (BrokenPipeError, ConnectionResetError):
+        # Le processus s'est arrêté : son code de retour dira pourquoi
+        pass
+    except Exception as e:
+        errors.append(e)
+    finally:
+        try:
+            stream.close()
+        except OSError:
+            pass
+
+
+def _read_all(stream, chunks):
+    """Lit un flux en entier (sorties courtes comme le JSON de FFprobe)"""
+    chunks.append(stream.read())
+    stream.close()
+
+
+def _spawn(command, stdin, stdout, low_priority=False):
+    """Lance la commande dans son propre groupe de processus, stderr sur un tube"""
+    popen_options = {}
+    if os.name == 'nt':
+        popen_options["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+        if low_priority:
+            popen_options["creationflags"] |= subprocess.BELOW_NORMAL_PRIORITY_CLASS
+    else:
+        popen_options["start_new_session"] = True
+
+    process = subprocess.Popen(command,
+        stdin=stdin,
+        stdout=stdout,
+        stderr=subprocess.PIPE,
+        startupinfo=startupinfo,
+        **popen_options)
+    if low_priority and os.name != 'nt':
+        try:
+            os.setpriority(os.PRIO_PROCESS, process.pid, LOW_PRIORITY_NICE)
+        except OSError as e:
+            logging.debug(f"Priorité de {command[0]} inchangée : {str(e)}")
+    return process
+
+
+def run_ffmpeg(command, cancel_event=None, timeout=None, capture_stdout=False,
+               stderr_lines=STDERR_TAIL_LINES, log_output=False, binary_stdout=False, input_chunks=None,
+               low_priority=False):
+    """Exécute une commande FFmpeg/FFprobe en lisant ses sorties au fil de l'eau
+
+    Seules les stderr_lines dernières lignes de stderr sont gardées en mémoire.
+    Si cancel_event (threading.Event ou multiprocessing.Event) est levé ou si
+    timeout (en secondes) est dépassé, l'arbre de processus est arrêté et
+    FFmpegCancelled ou FFmpegTimeout est levée. Un code de retour non nul
+    lève FFmpegError. stdout n'est conservé que si capture_stdout est vrai,
+    en texte ou en octets bruts avec binary_stdout (images, audio PCM).
+    input_chunks est un itérable de blocs d'octets envoyés sur l'entrée
+    standard (par exemple de l'audio PCM pour '-i pipe:0'). Avec low_priority,
+    le processus passe après l'interface et les autres traitements
+    (analyses spéculatives).
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise FFmpegCancelled("Commande annulée avant son lancement")
+
+    process = _spawn(command,
+                     subprocess.PIPE if input_chunks is not None else subprocess.DEVNULL,
+                     subprocess.PIPE if capture_stdout else subprocess.DEVNULL,
+                     low_priority)
+
+    tail = deque(maxlen=stderr_lines)
+    stdout_chunks = []
+    stderr = io.TextIOWrapper(process.stderr, encoding='utf-8', errors='replace')
+    readers = [threading.Thread(target=_read_lines, args=(stderr, tail, log_output), daemon=True)]
+    if capture_stdout:
+        readers.append(threading.Thread(target=_read_all, args=(process.stdout, stdout_chunks), daemon=True))
+    write_errors = []
+    if input_chunks is not None:
+        readers.append(threading.Thread(target=_write_all, args=(process.stdin, input_chunks, write_errors),
+                                        daemon=True))
+    for reader in readers:
+        reader.start()
+
+    deadline = time.monotonic() + timeout if timeout else None
+    stop_error = None
+    try:
+        while True:
+            try:
+                process.wait(POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if cancel_event is not None and cancel_event.is_set():
+                stop_error = FFmpegCancelled
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                stop_error = FFmpegTimeout
+                break
+    finally:
+        # Ne jamais laisser un FFmpeg orphelin, même sur une exception inattendue
+        if process.poll() is None:
+            kill_process_tree(process)
+        for reader in readers:
+            reader.join()
+
+    stderr_tail = "\n".join(tail)
+    if stop_error is FFmpegCancelled:
+        logging.info(f"Commande interrompue : {command[0]} (pid {process.pid})")
+        raise FFmpegCancelled("Commande annulée", process.returncode, stderr_tail)
+    if stop_error is FFmpegTimeout:
+        logging.error(f"Délai dépassé ({timeout}s) : {command[0]} (pid {process.pid})")
+        raise FFmpegTimeout(f"Délai de {timeout}s dépassé", process.returncode, stderr_tail)
+    if write_errors:
+        raise FFmpegError(f"Erreur lors de l'envoi des données à {command[0]} : {str(write_errors[0])}",
+                          process.returncode, stderr_tail)
+    if process.returncode != 0:
+        raise FFmpegError(f"{command[0]} a échoué (code {process.returncode}) :\n{stderr_tail}",
+                          process.returncode, stderr_tail)
+    stdout = b"".join(stdout_chunks)
+    if not binary_stdout:
+        stdout = stdout.decode('utf-8', errors='replace').replace('\r\n', '\n')
+    return FFmpegResult(process.returncode, stdout, stderr_tail)
+
+
+def _watch_cancel(process, cancel_event, finished):
+    """Arrête le processus dès que cancel_event est levé (lecture bloquée sur un flux)"""
+    while not finished.is_set():
+        if cancel_event.wait(POLL_INTERVAL):
+            kill_process_tree(process)
+            return
+
+
+def stream_ffmpeg(command, cancel_event=None, block_size=STREAM_BLOCK_SIZE, stdin=None,
+                  stderr_lines=STDERR_TAIL_LINES, low_priority=False):
+    """Exécute une commande FFmpeg et produit sa sortie standard bloc par bloc
+
+    Pour les entrées sans fin connue (fichier en cours d'écriture, tube) :
+    les blocs sont rendus dès qu'ils arrivent. stdin peut être un fichier
+    ouvert transmis tel quel à FFmpeg (par exemple sys.stdin.buffer pour
+    '-i pipe:0'). L'annulation et la fermeture du générateur arrêtent le
+    processus ; un code de retour non nul lève FFmpegError. low_priority a
+    le même effet que pour run_ffmpeg.
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise FFmpegCancelled("Commande annulée avant son lancement")
+
+    process = _spawn(command, stdin if stdin is not None else subprocess.DEVNULL, subprocess.PIPE, low_priority)
+    tail = deque(maxlen=stderr_lines)
+    stderr = io.TextIOWrapper(process.stderr, encoding='utf-8', errors='replace')
+    threads = [threading.Thread(target=_read_lines, args=(stderr, tail, False), daemon=True)]
+    finished = threading.Event()
+    if cancel_event is not None:
+        threads.append(threading.Thread(target=_watch_cancel, args=(process, cancel_event, finished), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            data = process.stdout.read1(block_size)
+            if not data:
+                break
+            yield data
+        process.wait()
+    finally:
+        finished.set()
+        if process.poll() is None:
+            kill_process_tree(process)
+        process.stdout.close()
+        for thread in threads:
+            thread.join()
+
+    stderr_tail = "\n".join(tail)
+    if cancel_event is not None and cancel_event.is_set():
+        logging.info(f"Commande interrompue : {command[0]} (pid {process.pid})")
+        raise FFmpegCancelled("Commande annulée", process.returncode, stderr_tail)
+    if process.returncode != 0:
+        raise FFmpegError(f"{command[0]} a échoué (code {process.returncode}) :\n{stderr_tail}",
+                          process.returncode, stderr_tail)
@@ -0,0 +1,107 @@
+import os
+import time
+import hashlib
+import logging
+import traceback
+
+import numpy as np
+
+from video_cutter.chunk_cache import source_identity
+from video_cutter.ffmpeg_runner import stream_ffmpeg
+from video_cutter.sharded_extract import ANALYSIS_SAMPLE_RATE
+
+# Aperçu : image réduite, cadence basse, une image clé par seconde pour les recherches
+PROXY_HEIGHT = 360
+PROXY_FPS = 15
+PROXY_ENCODING = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '30', '-g', str(PROXY_FPS),
+                  '-pix_fmt', 'yuv420p']
+
+
+def default_proxy_dir():
+    """Retourne le dossier par défaut des aperçus"""
+    return os.path.join(os.path.expanduser("~"), "AutoDerush_cache", "proxies")
+
+
+def proxy_path(video_path, proxy_dir=None):
+    """Fichier de l'aperçu d'une source ; une source modifiée a un nouvel aperçu"""
+    identity = source_identity(video_path)
+    key = hashlib.sha256(f"{identity['path']}|{identity['size']}|{identity['mtime']}".encode('utf-8')).hexdigest()
+    return os.path.join(proxy_dir or default_proxy_dir(), f"{key[:32]}.mp4")
+
+
+def existing_proxy(video_path, proxy_dir=None):
+    """Aperçu déjà produit pour cette source, ou None"""
+    try:
+        path = proxy_path(video_path, proxy_dir)
+    except OSError:
+        return None
+    return path if os.path.exists(path) else None
+
+
+def ingest_command(video_path, output_proxy, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """Un seul FFmpeg, deux sorties : PCM mono de l'analyse sur la sortie standard et aperçu vidéo"""
+    command = [
+        'ffmpeg',
+        '-v', 'error',
+        '-y',
+        '-i', video_path,
+        '-map', '0:a:0',
+        '-f', 's16le',
+        '-acodec', 'pcm_s16le',
+        '-ar', str(sample_rate),
+        '-ac', '1',
+        'pipe:1'
+    ]
+    if output_proxy is not None:
+        command += [
+            '-map', '0:v:0',
+            '-vf', f"scale=-2:min({PROXY_HEIGHT}\\,ih),fps={PROXY_FPS}",
+            *PROXY_ENCODING,
+            '-an',
+            '-f', 'mp4',
+            output_proxy
+        ]
+    return command
+
+
+def ingest(video_path, with_proxy=True, sample_rate=ANALYSIS_SAMPLE_RATE, proxy_dir=None, cancel_event=None,
+           low_priority=False):
+    """Décode la source une seule fois : audio d'analyse et aperçu de prévisualisation
+
+    Le PCM arrive par un tube pendant que le même FFmpeg encode l'aperçu
+    (PROXY_HEIGHT, PROXY_FPS) dans le dossier des aperçus. L'aperçu est
+    écrit sous un nom temporaire et n'est renommé qu'une fois complet.
+    Retourne (audio mono float32, fréquence, chemin de l'aperçu ou None).
+    """
+    try:
+        started = time.monotonic()
+        output_proxy = None
+        temp_proxy = None
+        if with_proxy:
+            output_proxy = proxy_path(video_path, proxy_dir)
+            os.makedirs(os.path.dirname(output_proxy), exist_ok=True)
+            temp_proxy = output_proxy + ".partial"
+        command = ingest_command(video_path, temp_proxy, sample_rate)
+        logging.info(f"Ingestion en un seul décodage : {video_path}")
+        logging.info(f"Commande : {' '.join(command)}")
+
+        pcm = bytearray()
+        try:
+            for block in stream_ffmpeg(command, cancel_event=cancel_event, low_priority=low_priority):
+                pcm += block
+            if temp_proxy is not None:
+                os.replace(temp_proxy, output_proxy)
+        finally:
+            if temp_proxy is not None and os.path.exists(temp_proxy):
+                os.remove(temp_proxy)
+
+        audio_data = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2).astype(np.float32) / 32768.0
+        del pcm
+        logging.info(f"Ingestion terminée en {time.monotonic() - started:.1f}s : {len(audio_data)} échantillons"
+                     + (f", aperçu {output_proxy}" if output_proxy else ""))
+        return audio_data, sample_rate, output_proxy
+    except Exception as e:
+        error_msg = f"Erreur lors de l'ingestion : {str(e)}"
+        logging.error(error_msg)
+        logging.error(traceback.format_exc())
+        raise Exception(error_msg)
@@ -0,0 +1,675 @@
+import sys
+import os
+import json
+import time
+import uuid
+import logging
+import argparse
+import threading
+import traceback
+import multiprocessing
+from collections import deque, OrderedDict
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+# Ajouter le dossier parent au path pour permettre les imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from video_cutter.ffmpeg_runner import cancel_on_sigterm
+from video_cutter.segments import SegmentList
+from video_cutter.resource_governor import ResourceGovernor, EXPORT
+from video_cutter.shared_envelopes import (SharedEnvelopeStore, DEFAULT_MAX_BYTES, envelope_key, open_block,
+                                           attach_envelope, publish_envelope)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+# Valeur de --workers confiant le parallélisme au gouverneur de ressources
+AUTO_WORKERS = "auto"
+DEFAULT_QUEUE_SIZE = 16
+# Nombre de travaux terminés dont le résultat reste consultable
+MAX_FINISHED_JOBS = 500
+# Délai laissé à un travail annulé pour s'arrêter avant que son processus soit tué
+CANCEL_GRACE = 15.0
+# Intervalle de surveillance des processus de travail
+POLL_INTERVAL = 0.2
+# Taille maximale d'une requête
+MAX_BODY_SIZE = 1024 * 1024
+# Délai laissé au serveur pour adopter les enveloppes publiées par un travail
+ADOPT_TIMEOUT = 10.0
+
+# Statuts d'un travail
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+REQUIRED_KEYS = ("video_path", "threshold", "margin", "output_path")
+
+
+def run_job(input_data, cancel_event, connection, shared_envelopes=None):
+    """Point d'entrée d'un processus de travail : traite une vidéo et renvoie le résultat
+
+    shared_envelopes (None : partage désactivé) décrit les enveloppes déjà
+    calculées, lues sans copie dans la mémoire partagée du serveur. Les
+    enveloppes calculées par ce travail sont publiées dans de nouveaux blocs
+    dont le serveur prend la propriété avant la fin du processus.
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # SIGTERM arrête proprement le FFmpeg en cours au lieu de le laisser orphelin
+    cancel_on_sigterm(cancel_event)
+    attached = {}
+    published = []
+    envelope_cache = None
+    try:
+        from video_cutter.envelope_cache import EnvelopeCache
+        from video_cutter.process_video import process_video
+        envelope_cache = EnvelopeCache()
+        for descriptor in shared_envelopes or []:
+            # Lecture seule : le bloc reste à la charge du serveur
+            memory = open_block(descriptor["name"])
+            envelope = attach_envelope(descriptor, memory)
+            attached[descriptor["key"]] = (envelope, memory)
+            envelope_cache.put(descriptor["key"], envelope)
+        result = process_video(input_data, cancel_event, envelope_cache)
+        if shared_envelopes is not None:
+            for key, envelope in envelope_cache.items():
+                if key not in attached or attached[key][0] is not envelope:
+                    published.append(publish_envelope(key, envelope))
+            result['shared_envelopes'] = [descriptor for _, descriptor in published]
+    except Exception as e:
+        result = {'success': False, 'message': f"Erreur fatale : {str(e)}\n{traceback.format_exc()}"}
+    connection.send(result)
+    if published and not connection.poll(ADOPT_TIMEOUT):
+        # Non adoptés par le serveur : personne d'autre ne les détruira
+        for memory, _ in published:
+            memory.unlink()
+    connection.close()
+    envelope_cache = None
+    for memory in [memory for _, memory in attached.values()] + [memory for memory, _ in published]:
+        try:
+            memory.close()
+        except BufferError:
+            pass
+
+
+class ServerJob:
+    """Un travail soumis au serveur"""
+
+    def __init__(self, input_data, timeout=None):
+        self.id = uuid.uuid4().hex
+        self.input_data = input_data
+        self.timeout = timeout
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.process = None
+        self.connection = None
+        self.cancel_event = None
+        self.cancel_requested_at = None
+        # Processus tué après CANCEL_GRACE sans s'être arrêté
+        self.killed_at = None
+        # Travaux simultanés prévus au démarrage (gouverneur)
+        self.concurrency = None
+        # Enveloppes partagées prêtées au travail
+        self.leases = []
+
+    def timings(self):
+        """Temps d'attente et de traitement (en secondes)"""
+        now = time.time()
+        queued = (self.started_at or self.finished_at or now) - self.submitted_at
+        running = None
+        if self.started_at is not None:
+            running = (self.finished_at or now) - self.started_at
+        return {
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queued_seconds": round(queued, 3),
+            "running_seconds": round(running, 3) if running is not None else None
+        }
+
+    def to_dict(self):
+        info = {
+            "id": self.id,
+            "status": self.status,
+            "video_path": self.input_data.get("video_path") or self.input_data.get("video_paths"),
+            "output_path": self.input_data.get("output_path"),
+            "timings": self.timings()
+        }
+        if self.error:
+            info["error"] = self.error
+        return info
+
+
+class JobManager:
+    """File d'attente bornée alimentant un groupe de processus de travail
+
+    Chaque travail tourne dans son propre processus (jusqu'à max_workers à la
+    fois), avec un événement d'annulation transmis à process_video. Quand la
+    file est pleine, les soumissions sont refusées. Avec un gouverneur
+    (ResourceGovernor), le nombre de travaux simultanés et les threads de
+    chaque FFmpeg sont choisis selon la machine et le débit mesuré. Avec
+    un SharedEnvelopeStore, les enveloppes calculées par un travail sont
+    gardées en mémoire partagée et prêtées aux travaux suivants sur les
+    mêmes fichiers, qui n'ont plus à les recalculer.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_queue=DEFAULT_QUEUE_SIZE, job_timeout=None, governor=None,
+                 shared_envelopes=None):
+        self.max_workers = max_workers
+        self.governor = governor
+        self.shared_envelopes = shared_envelopes
+        self.max_queue = max_queue
+        self.job_timeout = job_timeout
+        # spawn : même comportement sous Windows et ailleurs, pas de fork d'un processus à threads
+        self.context = multiprocessing.get_context("spawn")
+        self.jobs = OrderedDict()
+        self.queue = deque()
+        self.running = {}
+        # Processus de travaux abandonnés en échec, tués s'ils tournent encore après CANCEL_GRACE
+        self.abandoned = []
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.counters = {"submitted": 0, "rejected": 0, SUCCEEDED: 0, FAILED: 0, CANCELLED: 0}
+        self.total_running_seconds = 0.0
+        self.total_queued_seconds = 0.0
+        self.completed_runs = 0
+        self.thread = threading.Thread(target=self.loop, name="job-scheduler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def submit(self, input_data, timeout=None):
+        """Ajoute un travail ; retourne None si la file est pleine"""
+        with self.condition:
+            if len(self.queue) >= self.max_queue:
+                self.counters["rejected"] += 1
+                return None
+            job = ServerJob(input_data, timeout or self.job_timeout)
+            self.jobs[job.id] = job
+            self.queue.append(job)
+            self.counters["submitted"] += 1
+            self.forget_old_jobs()
+            self.condition.notify()
+        logging.info(f"Travail {job.id} soumis : {input_data.get('video_path') or input_data.get('video_paths')}")
+        return job
+
+    def get(self, job_id):
+        with self.condition:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        with self.condition:
+            return [job.to_dict() for job in self.jobs.values()]
+
+    def cancel(self, job_id):
+        """Annule un travail en attente ou en cours"""
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status == QUEUED:
+                self.queue.remove(job)
+                self.finish(job, CANCELLED)
+            elif job.status == RUNNING and job.cancel_requested_at is None:
+                job.cancel_requested_at = time.time()
+                job.cancel_event.set()
+                logging.info(f"Annulation du travail {job.id}")
+            return job
+
+    def forget_old_jobs(self):
+        """Oublie les travaux terminés les plus anciens"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def lease_envelopes(self, job):
+        """Prête au travail les enveloppes partagées de ses fichiers"""
+        input_data = job.input_data
+        paths = (input_data.get('video_paths') or [input_data['video_path']]) + list(input_data.get('angles', []))
+        for path in paths:
+            try:
+                descriptor = self.shared_envelopes.lease(envelope_key(path))
+            except OSError:
+                continue
+            if descriptor is not None:
+                job.leases.append(descriptor)
+        return list(job.leases)
+
+    def adopt_envelopes(self, job, result):
+        """Prend la propriété des enveloppes publiées par le travail, puis le laisse se terminer"""
+        for descriptor in result.pop('shared_envelopes', []):
+            try:
+                self.shared_envelopes.adopt(descriptor)
+            except OSError as e:
+                logging.warning(f"Enveloppe partagée {descriptor['name']} non adoptée : {str(e)}")
+        try:
+            job.connection.send(True)
+        except OSError:
+            pass
+
+    def start_job(self, job, threads=None):
+        # Bidirectionnel : le serveur confirme l'adoption des enveloppes publiées
+        receiver, sender = self.context.Pipe()
+        job.cancel_event = self.context.Event()
+        job.connection = receiver
+        input_data = job.input_data
+        if threads and 'threads' not in input_data:
+            input_data = dict(input_data, threads=threads)
+        shared = self.lease_envelopes(job) if self.shared_envelopes is not None else None
+        job.process = self.context.Process(target=run_job, args=(input_data, job.cancel_event, sender, shared),
+                                           name=f"derush-{job.id[:8]}", daemon=True)
+        job.process.start()
+        sender.close()
+        job.status = RUNNING
+        job.started_at = time.time()
+        self.running[job.id] = job
+        logging.info(f"Travail {job.id} démarré (pid {job.process.pid})")
+
+    def finish(self, job, status, result=None, error=None):
+        job.status = status
+        job.result = result
+        job.error = error or job.error
+        job.finished_at = time.time()
+        self.counters[status] += 1
+        timings = job.timings()
+        self.total_queued_seconds += timings["queued_seconds"]
+        if timings["running_seconds"] is not None:
+            self.total_running_seconds += timings["running_seconds"]
+            self.completed_runs += 1
+        if self.governor is not None and status == SUCCEEDED and job.concurrency:
+            self.governor.record(EXPORT, result.get("duration") or 0.0, timings["running_seconds"], job.concurrency)
+        if job.connection is not None:
+            job.connection.close()
+            job.connection = None
+        for descriptor in job.leases:
+            self.shared_envelopes.release(descriptor)
+        job.leases = []
+        self.running.pop(job.id, None)
+        logging.info(f"Travail {job.id} : {status} ({timings['running_seconds']}s)")
+
+    def check_running(self, job):
+        """Relève le résultat d'un travail terminé, ou applique délai et annulation"""
+        now = time.time()
+        if job.connection.poll():
+            try:
+                result = job.connection.recv()
+            except EOFError:
+                result = None
+            if result is not None and self.shared_envelopes is not None:
+                self.adopt_envelopes(job, result)
+            job.process.join()
+            if result is None:
+                # Processus tué après une annulation restée sans effet : le travail reste annulé
+                cancelled = job.killed_at is not None and not job.error
+                self.finish(job, CANCELLED if cancelled else FAILED,
+                            error="Le processus de travail s'est arrêté sans résultat")
+            elif result.get("cancelled"):
+                # Un travail arrêté pour dépassement du délai est un échec
+                self.finish(job, FAILED if job.error else CANCELLED, result)
+            elif result.get("success"):
+                self.finish(job, SUCCEEDED, result)
+            else:
+                self.finish(job, FAILED, result, result.get("message"))
+            return
+
+        if not job.process.is_alive():
+            cancelled = job.cancel_requested_at is not None and not job.error
+            self.finish(job, CANCELLED if cancelled else FAILED,
+                        error=f"Le processus de travail s'est arrêté (code {job.process.exitcode})")
+            return
+
+        if job.timeout and job.cancel_requested_at is None and now - job.started_at > job.timeout:
+            logging.warning(f"Travail {job.id} : délai de {job.timeout}s dépassé, annulation")
+            job.error = f"Délai de {job.timeout}s dépassé"
+            job.cancel_requested_at = now
+            job.cancel_event.set()
+        elif (job.cancel_requested_at is not None and job.killed_at is None
+              and now - job.cancel_requested_at > CANCEL_GRACE):
+            # L'annulation est restée sans effet (calcul ou lecture bloquée hors de FFmpeg) : un seul
+            # kill, sans attente sous le verrou ; un prochain passage constate la fin du processus
+            logging.warning(f"Travail {job.id} : arrêt forcé du processus {job.process.pid}")
+            job.process.kill()
+            job.killed_at = now
+
+    def fail_job(self, job, action, error):
+        """Marque en échec un travail dont la surveillance ou le démarrage a levé une exception
+
+        L'erreur ne concerne que ce travail : l'ordonnanceur continue avec les autres.
+        """
+        error_msg = f"Erreur lors {action} du travail : {str(error)}"
+        logging.error(f"Travail {job.id} : {error_msg}")
+        logging.error(traceback.format_exc())
+        if job.process is not None and job.process.is_alive():
+            job.cancel_event.set()
+            self.abandoned.append((job.process, time.time() + CANCEL_GRACE))
+        if job.status not in FINISHED_STATUSES:
+            self.finish(job, FAILED, error=error_msg)
+
+    def reap_abandoned(self):
+        """Tue les processus abandonnés encore vivants après CANCEL_GRACE et oublie ceux qui sont arrêtés"""
+        now = time.time()
+        remaining = []
+        for process, deadline in self.abandoned:
+            if not process.is_alive():
+                continue
+            if deadline is not None and now > deadline:
+                logging.warning(f"Arrêt forcé du processus abandonné {process.pid}")
+                process.kill()
+                deadline = None
+            remaining.append((process, deadline))
+        self.abandoned = remaining
+
+    def loop(self):
+        """Démarre les travaux en attente et surveille les travaux en cours"""
+        with self.condition:
+            while not self.stopping:
+                self.reap_abandoned()
+                for job in list(self.running.values()):
+                    try:
+                        self.check_running(job)
+                    except Exception as e:
+                        self.fail_job(job, "de la surveillance", e)
+                if self.governor is not None:
+                    if self.queue:
+                        self.start_governed()
+                else:
+                    while self.queue and len(self.running) < self.max_workers:
+                        self.start_queued()
+                self.condition.wait(POLL_INTERVAL)
+
+    def start_queued(self, concurrency=None, threads=None):
+        """Démarre le prochain travail de la file ; un démarrage raté ne bloque pas les suivants"""
+        job = self.queue.popleft()
+        job.concurrency = concurrency
+        try:
+            self.start_job(job, threads)
+        except Exception as e:
+            self.fail_job(job, "du démarrage", e)
+
+    def start_governed(self):
+        """Démarre autant de travaux que le gouverneur le permet, avec ses threads par FFmpeg"""
+        try:
+            concurrency, threads = self.governor.plan(EXPORT, len(self.running) + len(self.queue))
+        except Exception as e:
+            # Sans décision du gouverneur, les travaux partent au parallélisme par défaut
+            logging.error(f"Erreur du gouverneur de ressources : {str(e)}")
+            logging.error(traceback.format_exc())
+            concurrency, threads = self.max_workers, None
+        while self.queue and len(self.running) < concurrency:
+            self.start_queued(concurrency, threads)
+
+    def metrics(self):
+        with self.condition:
+            finished = sum(self.counters[status] for status in FINISHED_STATUSES)
+            metrics = {
+                "workers": self.max_workers if self.governor is None else AUTO_WORKERS,
+                "busy_workers": len(self.running),
+                "queue_length": len(self.queue),
+                "queue_capacity": self.max_queue,
+                "counters": dict(self.counters),
+                "average_queued_seconds": round(self.total_queued_seconds / finished, 3) if finished else None,
+                "average_running_seconds": round(self.total_running_seconds / self.completed_runs, 3)
+                if self.completed_runs else None
+            }
+            if self.governor is not None:
+                metrics["governor"] = self.governor.summary()
+            if self.shared_envelopes is not None:
+                metrics["shared_envelopes"] = self.shared_envelopes.stats()
+            return metrics
+
+    def shutdown(self):
+        """Annule tous les travaux et arrête les processus"""
+        with self.condition:
+            self.stopping = True
+            for job in list(self.queue):
+                self.finish(job, CANCELLED)
+            self.queue.clear()
+            running = list(self.running.values())
+            for job in running:
+                job.cancel_event.set()
+            processes = [job.process for job in running] + [process for process, _ in self.abandoned]
+            self.condition.notify()
+        deadline = time.time() + CANCEL_GRACE
+        for process in processes:
+            process.join(max(0.0, deadline - time.time()))
+            if process.is_alive():
+                # Annulation sans effet : rien d'autre n'arrêtera le processus
+                logging.warning(f"Arrêt forcé du processus {process.pid}")
+                process.kill()
+                process.join()
+        if self.shared_envelopes is not None:
+            self.shared_envelopes.close()
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """API JSON du serveur de travaux
+
+    POST /jobs                  soumet un travail (paramètres de process_video)
+    GET  /jobs                  liste des travaux
+    GET  /jobs/<id>             statut et temps du travail
+    POST /jobs/<id>/cancel      annule le travail (ou DELETE /jobs/<id>)
+    GET  /jobs/<id>/result      résultat complet d'un travail terminé
+    GET  /jobs/<id>/cuts        segments gardés et coupes
+    GET  /metrics               état de la file et statistiques
+    GET  /health                test de vie
+    """
+    server_version = "AutoDerush"
+
+    @property
+    def manager(self):
+        return self.server.manager
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} - {format % args}")
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        self.send_json(status, {"error": message})
+
+    def path_parts(self):
+        return [part for part in urlparse(self.path).path.split("/") if part]
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length < 0:
+            raise ValueError("Content-Length négatif")
+        if length > MAX_BODY_SIZE:
+            raise ValueError("Requête trop volumineuse")
+        data = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(data, dict):
+            raise ValueError("Un objet JSON est attendu")
+        return data
+
+    def do_GET(self):
+        parts = self.path_parts()
+        if parts == ["health"]:
+            self.send_json(HTTPStatus.OK, {"status": "ok"})
+        elif parts == ["metrics"]:
+            self.send_json(HTTPStatus.OK, self.manager.metrics())
+        elif parts == ["jobs"]:
+            self.send_json(HTTPStatus.OK, {"jobs": self.manager.list_jobs()})
+        elif len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.manager.get(parts[1])
+            if job is None:
+                self.send_error_json(HTTPStatus.NOT_FOUND, "Travail inconnu")
+            elif len(parts) == 2:
+                self.send_json(HTTPStatus.OK, job.to_dict())
+            elif parts[2] == "result":
+                self.send_result(job)
+            elif parts[2] == "cuts":
+                self.send_cuts(job)
+            else:
+                self.send_error_json(HTTPStatus.NOT_FOUND, "Ressource inconnue")
+        else:
+            self.send_error_json(HTTPStatus.NOT_FOUND, "Ressource inconnue")
+
+    def do_POST(self):
+        parts = self.path_parts()
+        if parts == ["jobs"]:
+            self.submit_job()
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+            self.cancel_job(parts[1])
+        else:
+            self.send_error_json(HTTPStatus.NOT_FOUND, "Ressource inconnue")
+
+    def do_DELETE(self):
+        parts = self.path_parts()
+        if len(parts) == 2 and parts[0] == "jobs":
+            self.cancel_job(parts[1])
+        else:
+            self.send_error_json(HTTPStatus.NOT_FOUND, "Ressource inconnue")
+
+    def submit_job(self):
+        try:
+            data = self.read_json()
+        except (ValueError, json.JSONDecodeError) as e:
+            self.send_error_json(HTTPStatus.BAD_REQUEST, f"Requête invalide : {str(e)}")
+            return
+        # video_paths (plusieurs clips enchaînés) remplace video_path
+        missing = [key for key in REQUIRED_KEYS if key not in data
+                   and not (key == "video_path" and data.get("video_paths"))]
+        if missing:
+            self.send_error_json(HTTPStatus.BAD_REQUEST, f"Paramètres manquants : {', '.join(missing)}")
+            return
+        timeout = data.pop("timeout", None)
+        if timeout is not None:
+            try:
+                timeout = float(timeout)
+            except (TypeError, ValueError):
+                timeout = None
+            if timeout is None or not timeout > 0:
+                self.send_error_json(HTTPStatus.BAD_REQUEST, "timeout : nombre de secondes positif attendu")
+                return
+        job = self.manager.submit(data, timeout)
+        if job is None:
+            self.send_json(HTTPStatus.TOO_MANY_REQUESTS, {"error": "File d'attente pleine"},
+                           {"Retry-After": "30"})
+            return
+        self.send_json(HTTPStatus.ACCEPTED, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+
+    def cancel_job(self, job_id):
+        job = self.manager.cancel(job_id)
+        if job is None:
+            self.send_error_json(HTTPStatus.NOT_FOUND, "Travail inconnu")
+        else:
+            self.send_json(HTTPStatus.ACCEPTED, job.to_dict())
+
+    def send_result(self, job):
+        if job.status not in FINISHED_STATUSES:
+            self.send_json(HTTPStatus.CONFLICT, job.to_dict())
+            return
+        data = job.to_dict()
+        data["result"] = job.result
+        self.send_json(HTTPStatus.OK, data)
+
+    def send_cuts(self, job):
+        if job.status != SUCCEEDED:
+            self.send_json(HTTPStatus.CONFLICT, job.to_dict())
+            return
+        if "clips" in job.result:
+            self.send_json(HTTPStatus.OK, {
+                "id": job.id,
+                "duration": job.result.get("duration"),
+                "clips": [dict(clip_cuts(clip.get("segments", []), clip.get("duration")),
+                               video_path=clip.get("video_path"))
+                          for clip in job.result["clips"]]
+            })
+            return
+        self.send_json(HTTPStatus.OK, dict(clip_cuts(job.result.get("segments", []), job.result.get("duration")),
+                                           id=job.id))
+
+
+def clip_cuts(segments, duration):
+    """Segments gardés et coupes d'une source"""
+    segments = SegmentList.from_tuples(segments)
+    return {
+        "duration": duration,
+        "kept_duration": segments.total_duration(),
+        "segments": segments.to_list(),
+        "cuts": segments.complement(0.0, duration).to_list()
+    }
+
+
+def create_server(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=DEFAULT_WORKERS,
+                  queue_size=DEFAULT_QUEUE_SIZE, job_timeout=None, shared_memory=DEFAULT_MAX_BYTES):
+    """Crée le serveur HTTP et son gestionnaire de travaux (non démarrés)
+
+    shared_memory borne la mémoire partagée des enveloppes (0 : pas de partage).
+    """
+    server = ThreadingHTTPServer((host, port), JobRequestHandler)
+    server.daemon_threads = True
+    shared_envelopes = SharedEnvelopeStore(shared_memory) if shared_memory else None
+    if workers == AUTO_WORKERS:
+        server.manager = JobManager(DEFAULT_WORKERS, queue_size, job_timeout, governor=ResourceGovernor(),
+                                    shared_envelopes=shared_envelopes)
+    else:
+        server.manager = JobManager(workers, queue_size, job_timeout, shared_envelopes=shared_envelopes)
+    return server
+
+
+def workers_argument(value):
+    """Nombre de travaux simultanés, ou "auto" pour le gouverneur de ressources"""
+    if value == AUTO_WORKERS:
+        return value
+    try:
+        workers = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"nombre ou \"{AUTO_WORKERS}\" attendu : {value}")
+    if workers < 1:
+        raise argparse.ArgumentTypeError(f"au moins un travail simultané : {value}")
+    return workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur HTTP de dérushage AutoDerush")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="adresse d'écoute")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port d'écoute")
+    parser.add_argument("--workers", type=workers_argument, default=DEFAULT_WORKERS,
+                        help="travaux simultanés, ou auto (selon les cœurs, la mémoire et le débit mesuré)")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="taille de la file d'attente")
+    parser.add_argument("--job-timeout", type=float, help="délai maximal d'un travail (s)")
+    parser.add_argument("--shared-memory", type=int, default=DEFAULT_MAX_BYTES // 1024 ** 2,
+                        help="mémoire partagée des enveloppes entre travaux (Mo, 0 pour désactiver)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    server = create_server(args.host, args.port, args.workers, args.queue_size, args.job_timeout,
+                           args.shared_memory * 1024 ** 2)
+    server.manager.start()
+    logging.info(f"Serveur de travaux à l'écoute sur http://{args.host}:{args.port} "
+                 f"({args.workers} processus, file de {args.queue_size})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Arrêt du serveur")
+    finally:
+        server.server_close()
+        server.manager.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+import sys
+import os
+import time
+import shutil
+import logging
+import argparse
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Ajouter le dossier parent au path pour permettre les imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from video_cutter.envelope import (AudioEnvelope, WINDOW_DURATION, MIN_GAP, DEFAULT_HYSTERESIS, STABLE_HYSTERESIS,
+                                   detect_segments, threshold_multiplier)
+from video_cutter.segments import SegmentList
+from video_cutter.chunked_export import ChunkedExport
+from video_cutter.ffmpeg_runner import stream_ffmpeg, FFmpegCancelled
+from video_cutter.sharded_extract import ANALYSIS_SAMPLE_RATE
+
+# Audio à lire avant d'émettre les premiers segments : le seuil dépend de la
+# moyenne et de l'écart-type du signal, qui doivent d'abord se stabiliser
+LIVE_WARMUP = 30.0
+# Délai laissé à la source après la fin d'un bloc avant de l'encoder
+ENCODE_DELAY = 5.0
+# Attente maximale de nouvelles données d'un fichier en cours d'écriture
+FOLLOW_TIMEOUT = 30.0
+# Durée de sortie par défaut d'un bloc encodé en direct
+LIVE_CHUNK_DURATION = 30.0
+
+
+class IncrementalDetector:
+    """Détection de la parole sur un flux audio, par morceaux
+
+    Les énergies par fenêtre sont calculées au fil de l'eau ; la moyenne et
+    l'écart-type du seuil sont ceux de tout l'audio déjà lu. La détection est
+    relancée sur la fin du flux encore ouverte (la « queue ») et un segment
+    n'est émis que lorsqu'aucune donnée future ne peut plus le modifier : sa
+    fin est suivie d'au moins lookahead secondes sans parole, plus que ce que
+    la fusion des segments proches, les marges et le maintien peuvent combler.
+    Le seuil évoluant avec les statistiques, le résultat approche celui d'une
+    analyse du fichier complet sans lui être identique.
+    """
+
+    def __init__(self, multiplier, margin, sample_rate=ANALYSIS_SAMPLE_RATE, hysteresis=None,
+                 warmup=LIVE_WARMUP):
+        self.multiplier = float(multiplier)
+        self.margin = margin
+        self.sample_rate = sample_rate
+        self.hysteresis = dict(DEFAULT_HYSTERESIS, **(hysteresis or {}))
+        self.warmup = warmup
+        self.window_size = int(sample_rate * WINDOW_DURATION)
+        self.lookahead = (max(MIN_GAP, 2 * margin) + self.hysteresis["hangover"] + self.hysteresis["attack"]
+                          + 2 * WINDOW_DURATION)
+
+        # Énergies par fenêtre complète, depuis le début du flux
+        self.window_energy = np.zeros(0)
+        self.window_count = 0
+        # Échantillons qui ne remplissent pas encore une fenêtre
+        self.remainder = np.zeros(0, dtype=np.float32)
+        # Sommes des échantillons (valeur absolue) et de leurs carrés
+        self.sample_count = 0
+        self.energy_sum = 0.0
+        self.square_sum = 0.0
+        # Première fenêtre de la queue et fin du dernier segment émis (en secondes)
+        self.tail_window = 0
+        self.last_end = 0.0
+
+    @property
+    def duration(self):
+        """Durée de l'audio lu, en secondes"""
+        return (self.sample_count + len(self.remainder)) / self.sample_rate
+
+    def feed(self, samples):
+        """Ajoute des échantillons mono float32 ; retourne les segments devenus définitifs"""
+        samples = np.concatenate((self.remainder, samples)) if len(self.remainder) else np.asarray(samples)
+        full = len(samples) // self.window_size * self.window_size
+        self.remainder = samples[full:].copy()
+        if full:
+            energy = np.abs(samples[:full])
+            self.window_energy = np.concatenate(
+                (self.window_energy, np.add.reduceat(energy, np.arange(0, full, self.window_size)) / self.window_size))
+            self.window_count += full // self.window_size
+            self._accumulate(energy)
+        if self.sample_count / self.sample_rate < self.warmup:
+            return SegmentList()
+        return self._detect(final=False)
+
+    def finish(self):
+        """Fin du flux : la dernière fenêtre incomplète est comptée et tout ce qui reste est émis"""
+        if len(self.remainder):
+            energy = np.abs(self.remainder)
+            self.window_energy = np.append(self.window_energy, np.mean(energy))
+            self.window_count += 1
+            self._accumulate(energy)
+            self.remainder = np.zeros(0, dtype=np.float32)
+        return self._detect(final=True)
+
+    def _accumulate(self, energy):
+        self.sample_count += len(energy)
+        self.energy_sum += float(np.sum(energy, dtype=np.float64))
+        self.square_sum += float(np.sum(np.square(energy, dtype=np.float64)))
+
+    def _tail_envelope(self):
+        """Enveloppe de la queue, avec les statistiques de tout le flux"""
+        offset = self.tail_window - (self.window_count - len(self.window_energy))
+        tail_energy = self.window_energy[offset:]
+        tail_samples = self.sample_count - self.tail_window * self.window_size
+        energy_mean = self.energy_sum / self.sample_count
+        energy_std = float(np.sqrt(max(self.square_sum / self.sample_count - energy_mean ** 2, 0.0)))
+        return AudioEnvelope(tail_energy, self.window_size, self.sample_rate, tail_samples, energy_mean, energy_std)
+
+    def _detect(self, final):
+        if self.sample_count == 0:
+            return SegmentList()
+        envelope = self._tail_envelope()
+        tail_start = self.tail_window * self.window_size / self.sample_rate
+        detected = detect_segments(envelope, self.multiplier, self.margin, hysteresis=self.hysteresis)
+        segments = detected
+        if not final:
+            settled = detected.ends + self.lookahead <= envelope.duration
+            segments = SegmentList(detected.starts[settled], detected.ends[settled])
+        if len(segments):
+            # La marge d'un segment ne revient jamais sur le segment déjà émis
+            emitted = SegmentList(np.maximum(segments.starts + tail_start, self.last_end), segments.ends + tail_start)
+            self.last_end = float(emitted.ends[-1])
+            self.tail_window = int(self.last_end * self.sample_rate) // self.window_size
+        else:
+            emitted = SegmentList()
+            if not len(detected):
+                # Rien en cours : inutile de garder plus que ce qu'un futur segment peut atteindre
+                keep = int(np.ceil((self.lookahead + self.margin) / WINDOW_DURATION))
+                self.tail_window = max(self.tail_window, self.window_count - keep)
+        self._release()
+        return emitted
+
+    def _release(self):
+        """Oublie les énergies des fenêtres passées devant la queue"""
+        dropped = self.tail_window - (self.window_count - len(self.window_energy))
+        if dropped > 0:
+            self.window_energy = self.window_energy[dropped:]
+
+
+class LiveDerush:
+    """Dérushage d'un enregistrement en cours ou d'un flux reçu sur l'entrée standard
+
+    L'audio est décodé en continu par FFmpeg (-follow pour un fichier qui
+    grossit) et passé au détecteur incrémental. Les segments définitifs sont
+    regroupés en blocs, encodés en arrière-plan dès que la source les a
+    dépassés de ENCODE_DELAY secondes. À la fin du flux, il ne reste qu'à
+    encoder le dernier bloc et assembler les blocs. Un flux lu sur l'entrée
+    standard est aussi copié tel quel dans <sortie>.live.ts, d'où les blocs
+    sont encodés ; cette copie est gardée.
+    """
+
+    def __init__(self, source, output_path, threshold=50, margin_ms=100, chunk_duration=LIVE_CHUNK_DURATION,
+                 hysteresis=False, cancel_event=None, follow_timeout=FOLLOW_TIMEOUT):
+        self.source = source
+        self.output_path = os.path.abspath(output_path)
+        self.chunk_duration = chunk_duration
+        self.cancel_event = cancel_event or threading.Event()
+        self.follow_timeout = follow_timeout
+        if isinstance(hysteresis, dict):
+            hysteresis = dict(STABLE_HYSTERESIS, **hysteresis)
+        else:
+            hysteresis = dict(STABLE_HYSTERESIS if hysteresis else DEFAULT_HYSTERESIS)
+        self.detector = IncrementalDetector(threshold_multiplier(threshold), margin_ms / 1000.0,
+                                            hysteresis=hysteresis)
+
+        # Fichier d'où les blocs sont encodés : la source, ou sa copie si elle arrive par un tube
+        self.from_pipe = source == '-'
+        self.media_path = self.output_path + ".live.ts" if self.from_pipe else os.path.abspath(source)
+        self.export = ChunkedExport(self.media_path, [], self.output_path, chunk_duration,
+                                    cancel_event=self.cancel_event)
+        self.segments = []
+        self.chunks = []
+        self.pending_chunk = []
+
+    def decode_command(self):
+        """Commande FFmpeg qui décode l'audio du flux en mono 16 bits sur sa sortie standard"""
+        command = ['ffmpeg', '-v', 'error']
+        if self.from_pipe:
+            command += ['-i', 'pipe:0']
+        else:
+            command += ['-follow', '1', '-rw_timeout', str(int(self.follow_timeout * 1_000_000)),
+                        '-i', f"file:{self.media_path}"]
+        command += [
+            '-map', '0:a:0',
+            '-f', 's16le',
+            '-acodec', 'pcm_s16le',
+            '-ar', str(self.detector.sample_rate),
+            '-ac', '1',
+            'pipe:1'
+        ]
+        if self.from_pipe:
+            command += ['-map', '0', '-c', 'copy', '-f', 'mpegts', '-y', self.media_path]
+        return command
+
+    def add_segments(self, segments):
+        """Range les segments définitifs dans le bloc en cours ; retourne les blocs complets"""
+        complete = []
+        for start, end in segments:
+            self.segments.append((start, end))
+            self.pending_chunk.append([start, end])
+            if sum(e - s for s, e in self.pending_chunk) >= self.chunk_duration:
+                complete.append(self.new_chunk(self.pending_chunk))
+                self.pending_chunk = []
+        return complete
+
+    def new_chunk(self, segments):
+        index = len(self.chunks)
+        chunk = {"index": index, "source": 0, "file": f"chunk_{index:05d}.ts", "segments": segments, "done": False}
+        self.chunks.append(chunk)
+        return chunk
+
+    def encode(self, chunk):
+        self.export.encode_chunk(chunk, os.path.join(self.export.parts_dir, chunk["file"]))
+        chunk["done"] = True
+
+    def run(self):
+        """Dérushe le flux jusqu'à sa fin et retourne un résumé"""
+        try:
+            os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+            if os.path.isdir(self.export.parts_dir):
+                shutil.rmtree(self.export.parts_dir)
+            os.makedirs(self.export.parts_dir)
+            source_name = "l'entrée standard" if self.from_pipe else self.media_path
+            logging.info(f"Dérushage en direct de {source_name}")
+
+            leftover = b''
+            waiting = []
+            futures = []
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                stdin = sys.stdin.buffer if self.from_pipe else None
+                for data in stream_ffmpeg(self.decode_command(), cancel_event=self.cancel_event, stdin=stdin):
+                    data = leftover + data
+                    usable = len(data) // 2 * 2
+                    leftover = data[usable:]
+                    samples = np.frombuffer(data[:usable], dtype=np.int16).astype(np.float32) / 32768.0
+                    segments = self.detector.feed(samples)
+                    if len(segments):
+                        logging.info(f"{len(segments)} segments définitifs jusqu'à {segments.ends[-1]:.1f}s")
+                    waiting += self.add_segments(segments)
+
+                    # Encoder les blocs que la source a suffisamment dépassés
+                    position = self.detector.duration
+                    while waiting and position - waiting[0]["segments"][-1][1] >= ENCODE_DELAY:
+                        futures.append(executor.submit(self.encode, waiting.pop(0)))
+                    for future in futures:
+                        if future.done() and future.exception() is not None:
+                            raise future.exception()
+
+                stream_end = time.monotonic()
+                logging.info(f"Fin du flux après {self.detector.duration:.1f}s d'audio")
+                waiting += self.add_segments(self.detector.finish())
+                if self.pending_chunk:
+                    waiting.append(self.new_chunk(self.pending_chunk))
+                    self.pending_chunk = []
+                futures += [executor.submit(self.encode, chunk) for chunk in waiting]
+                for future in futures:
+                    future.result()
+
+            if not self.chunks:
+                return {'success': False,
+                        'message': "Aucun segment de parole n'a été détecté. Essayez d'ajuster le seuil de détection."}
+            self.export.concat_chunks({"chunks": self.chunks})
+            shutil.rmtree(self.export.parts_dir, ignore_errors=True)
+            latency = time.monotonic() - stream_end
+            logging.info(f"Sortie prête {latency:.1f}s après la fin du flux : {self.output_path}")
+            return {
+                'success': True,
+                'output_path': self.output_path,
+                'segments': [[start, end] for start, end in self.segments],
+                'chunks': len(self.chunks),
+                'duration': self.detector.duration,
+                'latency': latency
+            }
+        except FFmpegCancelled:
+            self.cancel_event.set()
+            raise
+        except Exception as e:
+            self.cancel_event.set()
+            error_msg = f"Erreur lors du dérushage en direct : {str(e)}"
+            logging.error(error_msg)
+            logging.error(traceback.format_exc())
+            raise Exception(error_msg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dérushage en direct d'un enregistrement en cours")
+    parser.add_argument("source", help="fichier en cours d'écriture, ou - pour lire le flux sur l'entrée standard")
+    parser.add_argument("output_path", help="fichier de sortie")
+    parser.add_argument("--threshold", type=int, default=50, help="valeur du slider de seuil (1-100)")
+    parser.add_argument("--margin", type=int, default=100, help="marge autour des segments (ms)")
+    parser.add_argument("--chunk-duration", type=float, default=LIVE_CHUNK_DURATION,
+                        help="durée de sortie d'un bloc encodé (s)")
+    parser.add_argument("--stable", action="store_true", help="détection avec hystérésis")
+    parser.add_argument("--follow-timeout", type=float, default=FOLLOW_TIMEOUT,
+                        help="attente maximale de nouvelles données avant de considérer le fichier terminé (s)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    live = LiveDerush(args.source, args.output_path, args.threshold, args.margin, args.chunk_duration,
+                      args.stable, follow_timeout=args.follow_timeout)
+    try:
+        result = live.run()
+    except KeyboardInterrupt:
+        live.cancel_event.set()
+        logging.info("Dérushage interrompu")
+        return 1
+    if not result['success']:
+        logging.warning(result['message'])
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+
+# Durée des sous-blocs mesurés pendant l'analyse (pas des blocs de 400ms et de 3s)
+SUB_BLOCK_DURATION = 0.1
+# Blocs de l'intensité intégrée (400ms) et de l'intensité court terme (3s), en sous-blocs
+MOMENTARY_SUB_BLOCKS = 4
+SHORT_TERM_SUB_BLOCKS = 30
+# Portes de l'ITU-R BS.1770 et de l'EBU Tech 3342
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+LRA_RELATIVE_GATE = -20.0
+# Longueur retenue pour la réponse impulsionnelle de la pondération K
+IMPULSE_LENGTH = 8192
+# Taille des blocs de la convolution par FFT
+FFT_BLOCK = 1 << 16
+# Suréchantillonnage pour le calcul du niveau crête vrai
+TRUE_PEAK_OVERSAMPLING = 4
+
+# Cibles EBU R128 par défaut
+DEFAULT_TARGET = {"I": -23.0, "TP": -1.0, "LRA": 7.0}
+
+
+def k_weighting_filters(sample_rate):
+    """Coefficients (b, a) des deux biquads de la pondération K pour sample_rate
+
+    Les coefficients sont recalculés à partir des paramètres analogiques du
+    filtre, ce qui reproduit ceux de la norme à 48 kHz.
+    """
+    # Étage 1 : plateau haut (effet de la tête)
+    gain = 3.999843853973347
+    q = 0.7071752369554196
+    fc = 1681.974450955533
+    k = math.tan(math.pi * fc / sample_rate)
+    vh = 10 ** (gain / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = (
+        np.array([(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0]),
+        np.array([1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+    )
+
+    # Étage 2 : passe-haut RLB
+    q = 0.5003270373238773
+    fc = 38.13547087602444
+    k = math.tan(math.pi * fc / sample_rate)
+    a0 = 1 + k / q + k * k
+    highpass = (
+        np.array([1.0, -2.0, 1.0]),
+        np.array([1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+    )
+    return shelf, highpass
+
+
+@lru_cache(maxsize=8)
+def k_weighting_spectrum(sample_rate, fft_size=FFT_BLOCK + IMPULSE_LENGTH):
+    """Spectre de la réponse impulsionnelle tronquée de la pondération K
+
+    La réponse fréquentielle exacte des deux biquads est échantillonnée sur une
+    grille fine, ramenée dans le domaine temporel et tronquée à IMPULSE_LENGTH
+    échantillons (le filtre s'est alors éteint), puis transformée à fft_size.
+    """
+    grid = 1 << 18
+    z = np.exp(-1j * np.linspace(0, np.pi, grid // 2 + 1))
+    response = np.ones_like(z)
+    for b, a in k_weighting_filters(sample_rate):
+        response *= (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+    impulse = np.fft.irfft(response, grid)[:IMPULSE_LENGTH]
+    return np.fft.rfft(impulse, fft_size)
+
+
+@lru_cache(maxsize=1)
+def oversampling_phases(taps_per_phase=12):
+    """Filtres polyphase d'interpolation (sinus cardinal fenêtré) pour le suréchantillonnage x4"""
+    length = taps_per_phase * TRUE_PEAK_OVERSAMPLING
+    n = np.arange(length) - (length - 1) / 2
+    kernel = np.sinc(n / TRUE_PEAK_OVERSAMPLING) * np.hanning(length)
+    return [kernel[phase::TRUE_PEAK_OVERSAMPLING] for phase in range(TRUE_PEAK_OVERSAMPLING)]
+
+
+def true_peaks(audio_data, start, end, block_size, phases):
+    """Niveau crête vrai (linéaire) de chaque bloc de block_size échantillons entre start et end
+
+    Le signal est suréchantillonné x4 par un filtre polyphase, comme le
+    préconise l'annexe 2 de l'ITU-R BS.1770. Les quelques échantillons
+    voisins lus de part et d'autre (nuls au-delà du signal) donnent le même
+    résultat qu'une convolution du signal entier.
+    """
+    count = (end - start) // block_size
+    pad = max(len(phase) for phase in phases)
+    context = np.zeros(end - start + 2 * pad, dtype=np.float32)
+    first = max(0, start - pad)
+    last = min(len(audio_data), end + pad)
+    context[first - (start - pad):last - (start - pad)] = audio_data[first:last]
+    samples = context[pad:pad + end - start]
+    peaks = np.abs(samples).reshape(count, block_size).max(axis=1)
+    for phase in phases:
+        interpolated = np.convolve(context, phase, mode='same')[pad:pad + end - start]
+        peaks = np.maximum(peaks, np.abs(interpolated).reshape(count, block_size).max(axis=1))
+    return peaks
+
+
+def block_measurements(audio_data, sample_rate, block_size):
+    """Puissance pondérée K et niveau crête vrai de chaque bloc de block_size échantillons
+
+    Le signal est parcouru par tranches d'environ FFT_BLOCK échantillons,
+    alignées sur les blocs : la pondération K est une convolution FFT par
+    recouvrement-addition (la queue de chaque tranche est reportée sur la
+    suivante). Seules les mesures par bloc sont gardées, la mémoire utilisée
+    ne dépend pas de la durée du signal.
+    """
+    count = len(audio_data) // block_size
+    total = count * block_size
+    step = max(1, FFT_BLOCK // block_size) * block_size
+    fft_size = max(FFT_BLOCK, step) + IMPULSE_LENGTH
+    spectrum = k_weighting_spectrum(sample_rate, fft_size)
+    phases = [phase.astype(np.float32) for phase in oversampling_phases()]
+    block_power = np.empty(count, dtype=np.float64)
+    block_peak = np.empty(count, dtype=np.float32)
+    tail = np.zeros(IMPULSE_LENGTH, dtype=np.float64)
+    for start in range(0, total, step):
+        end = min(start + step, total)
+        length = end - start
+        first = start // block_size
+        blocks = length // block_size
+        filtered = np.fft.irfft(np.fft.rfft(audio_data[start:end], fft_size) * spectrum, fft_size)
+        filtered[:IMPULSE_LENGTH] += tail
+        tail = filtered[length:length + IMPULSE_LENGTH].copy()
+        weighted = filtered[:length].reshape(blocks, block_size)
+        block_power[first:first + blocks] = np.mean(np.square(weighted), axis=1)
+        block_peak[first:first + blocks] = true_peaks(audio_data, start, end, block_size, phases)
+    return block_power, block_peak
+
+
+class LoudnessEnvelope:
+    """Mesures par sous-bloc de 100ms nécessaires au calcul de l'intensité
+
+    Pour chaque sous-bloc : la moyenne quadratique du signal pondéré K et le
+    niveau crête vrai. L'intensité de n'importe quelle sélection de segments
+    s'en déduit sans relire l'audio.
+    """
+
+    def __init__(self, block_power, block_peak, channel_offset=0.0):
+        self.block_power = block_power
+        self.block_peak = block_peak
+        # Correction (en dB) pour passer du mixage mono analysé aux canaux de la source
+        self.channel_offset = channel_offset
+
+    @classmethod
+    def from_audio(cls, audio_data, sample_rate, channels=1):
+        """Mesure un signal mono issu du mixage des canaux de la source
+
+        Pour une source stéréo, on suppose des canaux corrélés (cas de la voix) :
+        la somme des puissances des deux canaux vaut alors le double de celle
+        du mixage mono, soit +3 dB.
+        """
+        block_size = int(round(sample_rate * SUB_BLOCK_DURATION))
+        block_power, block_peak = block_measurements(audio_data, sample_rate, block_size)
+        channel_offset = 10 * math.log10(channels) if channels > 1 else 0.0
+        return cls(block_power, block_peak, channel_offset)
+
+    def kept_blocks(self, segments):
+        """Masque des sous-blocs dont le centre tombe dans un segment gardé"""
+        centers = (np.arange(len(self.block_power)) + 0.5) * SUB_BLOCK_DURATION
+        return segments.contains(centers)
+
+    def power_to_lufs(self, power):
+        """Convertit une moyenne quadratique pondérée K en LUFS"""
+        with np.errstate(divide='ignore'):
+            return -0.691 + 10 * np.log10(power) + self.channel_offset
+
+    def sliding_power(self, power, length):
+        """Moyenne glissante (pas d'un sous-bloc) sur length sous-blocs"""
+        if len(power) < length:
+            return np.array([np.mean(power)]) if len(power) else np.zeros(0)
+        cumulative = np.concatenate(([0.0], np.cumsum(power)))
+        return (cumulative[length:] - cumulative[:-length]) / length
+
+    def measure(self, segments=None):
+        """Intensité intégrée, crête vraie, LRA et seuil de porte sur les segments gardés
+
+        Les sous-blocs gardés sont mis bout à bout comme dans la vidéo exportée.
+        Sans segments, tous les sous-blocs sont mesurés.
+        """
+        kept = self.kept_blocks(segments) if segments is not None else slice(None)
+        power = self.block_power[kept]
+        if not len(power):
+            raise ValueError("Aucun audio gardé à mesurer")
+
+        # Intensité intégrée : blocs de 400ms recouverts à 75%, porte absolue puis relative
+        blocks = self.sliding_power(power, MOMENTARY_SUB_BLOCKS)
+        loudness = self.power_to_lufs(blocks)
+        gated = blocks[loudness > ABSOLUTE_GATE]
+        if len(gated):
+            threshold = float(self.power_to_lufs(np.mean(gated))) + RELATIVE_GATE
+            gated = blocks[(loudness > ABSOLUTE_GATE) & (loudness > threshold)]
+        else:
+            threshold = ABSOLUTE_GATE
+        integrated = float(self.power_to_lufs(np.mean(gated))) if len(gated) else ABSOLUTE_GATE
+
+        # Plage de variation : blocs de 3s, porte absolue puis relative à -20 LU, percentiles 10-95
+        short_term = self.sliding_power(power, SHORT_TERM_SUB_BLOCKS)
+        short_loudness = self.power_to_lufs(short_term)
+        gated_short = short_term[short_loudness > ABSOLUTE_GATE]
+        lra = 0.0
+        if len(gated_short):
+            lra_threshold = float(self.power_to_lufs(np.mean(gated_short))) + LRA_RELATIVE_GATE
+            selected = short_loudness[(short_loudness > ABSOLUTE_GATE) & (short_loudness > lra_threshold)]
+            if len(selected):
+                low, high = np.percentile(selected, [10, 95])
+                lra = float(high - low)
+
+        peak = float(np.max(self.block_peak[kept]))
+        true_peak = 20 * math.log10(peak) if peak > 0 else -99.0
+
+        return {
+            "input_i": integrated,
+            "input_tp": true_peak,
+            "input_lra": lra,
+            "input_thresh": threshold
+        }
+
+
+def measure_clips(clips):
+    """Intensité des segments gardés de plusieurs clips mis bout à bout
+
+    clips est une liste de (LoudnessEnvelope, segments). La correction de
+    canaux de chaque clip est reportée sur ses puissances avant l'assemblage.
+    """
+    powers = []
+    peaks = []
+    for loudness, segments in clips:
+        kept = loudness.kept_blocks(segments)
+        powers.append(loudness.block_power[kept] * 10 ** (loudness.channel_offset / 10))
+        peaks.append(loudness.block_peak[kept])
+    return LoudnessEnvelope(np.concatenate(powers), np.concatenate(peaks)).measure()
+
+
+def loudnorm_filter(measurement, target=None):
+    """Filtre loudnorm linéaire en une passe à partir des valeurs mesurées
+
+    La cible de LRA est relevée au besoin pour que loudnorm reste en mode
+    linéaire (gain constant) ; aresample ramène la sortie à 48 kHz.
+    """
+    target = dict(DEFAULT_TARGET, **(target or {}))
+    target_lra = min(max(target["LRA"], math.ceil(measurement["input_lra"] * 10) / 10 + 0.1), 50.0)
+    return (
+        f"loudnorm=I={target['I']}:TP={target['TP']}:LRA={target_lra}"
+        f":measured_I={measurement['input_i']:.2f}"
+        f":measured_TP={measurement['input_tp']:.2f}"
+        f":measured_LRA={measurement['input_lra']:.2f}"
+        f":measured_thresh={measurement['input_thresh']:.2f}"
+        f":offset=0.0:linear=true:print_format=summary,aresample=48000"
+    )
@@ -1,9 +1,12 @@
+import time
+START_TIME = time.perf_counter()
+
 import sys
 import shutil
 import os
 import logging
 from PyQt6.QtWidgets import QApplication, QMessageBox
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import QObject, QEvent, QTimer
 
 # Ajouter le dossier parent au path pour permettre les imports
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -13,6 +16,31 @@ if parent_dir not in sys.path:
 
 from video_cutter.ui.main_window import MainWindow
 
+# Si cette variable est définie, l'application affiche le délai avant le
+# premier affichage puis se ferme (utilisé par benchmarks/startup.py)
+STARTUP_BENCHMARK_ENV = "AUTODERUSH_STARTUP_BENCHMARK"
+
+class FirstPaintWatcher(QObject):
+    """Détecte le premier affichage de la fenêtre principale"""
+    
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.painted = False
+        
+    def eventFilter(self, obj, event):
+        if not self.painted and event.type() == QEvent.Type.Paint:
+            self.painted = True
+            elapsed = (time.perf_counter() - START_TIME) * 1000
+            logging.info(f"Premier affichage après {elapsed:.0f} ms")
+            if os.environ.get(STARTUP_BENCHMARK_ENV):
+                print(f"first_paint_ms={elapsed:.1f}", flush=True)
+                QTimer.singleShot(0, QApplication.instance().quit)
+            else:
+                # Laisser l'affichage se terminer avant de charger les modules lourds
+                QTimer.singleShot(0, self.window.start_background_warmup)
+        return False
+
 def show_error(title, message):
     """Affiche une boîte de dialogue d'erreur"""
     msg = QMessageBox()
@@ -45,12 +73,13 @@ def main():
     # Configurer le style
     app.setStyle("Fusion")
     
-    # Vérifier FFmpeg
-    if not check_ffmpeg():
+    # Vérifier FFmpeg (inutile pour mesurer le démarrage)
+    if not os.environ.get(STARTUP_BENCHMARK_ENV) and not check_ffmpeg():
         return
     
     # Créer et afficher la fenêtre principale
     window = MainWindow()
+    window.installEventFilter(FirstPaintWatcher(window))
     window.show()
     window.raise_()
     window.activateWindow()
@@ -0,0 +1,393 @@
+import sys
+import os
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import argparse
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+# Ajouter le dossier parent au path pour permettre les imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from video_cutter.chunk_cache import source_identity
+from video_cutter.envelope import (AudioEnvelope, detect_segments, threshold_multiplier, DEFAULT_HYSTERESIS,
+                                   STABLE_HYSTERESIS)
+from video_cutter.media_probe import probe_media, MEDIA_EXTENSIONS
+
+# Version du schéma de l'index : une autre version est reconstruite
+SCHEMA_VERSION = 1
+# Réglages de détection par défaut de l'index (valeur du slider, marge en ms)
+DEFAULT_PARAMETERS = {"threshold": 50, "margin": 100, "hysteresis": False}
+# Analyses simultanées pendant un parcours
+MAX_PARALLEL_SCANS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    duration REAL,
+    has_video INTEGER,
+    has_audio INTEGER,
+    probe TEXT,
+    window_size INTEGER,
+    sample_rate INTEGER,
+    total_samples INTEGER,
+    energy_mean REAL,
+    energy_std REAL,
+    envelope BLOB,
+    speech_ratio REAL,
+    parameters TEXT,
+    analyzed_at REAL,
+    used_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS media_speech_ratio ON media (speech_ratio);
+"""
+
+
+def default_index_path():
+    """Retourne le fichier par défaut de l'index de la médiathèque"""
+    return os.path.join(os.path.expanduser("~"), "AutoDerush_cache", "media_index.sqlite")
+
+
+def compress_envelope(envelope):
+    """Énergies par fenêtre en float32, compressées avec zlib"""
+    return zlib.compress(np.asarray(envelope.window_energy, dtype=np.float32).tobytes(), 6)
+
+
+def detection_parameters(parameters=None):
+    """Complète des réglages de détection avec DEFAULT_PARAMETERS"""
+    return dict(DEFAULT_PARAMETERS, **(parameters or {}))
+
+
+def hysteresis_settings(hysteresis):
+    """Réglages d'hystérésis au format de DEFAULT_HYSTERESIS (voir AudioAnalyzer.set_hysteresis)"""
+    if isinstance(hysteresis, dict):
+        return dict(STABLE_HYSTERESIS, **hysteresis)
+    return dict(STABLE_HYSTERESIS if hysteresis else DEFAULT_HYSTERESIS)
+
+
+def kept_duration(envelope, parameters):
+    """Durée gardée par la détection avec ces réglages"""
+    parameters = detection_parameters(parameters)
+    segments = detect_segments(envelope, threshold_multiplier(parameters["threshold"]),
+                               parameters["margin"] / 1000.0, hysteresis=hysteresis_settings(parameters["hysteresis"]))
+    return segments.total_duration()
+
+
+def media_files(roots):
+    """Fichiers média des dossiers (récursivement) ou fichiers donnés, en chemins absolus"""
+    for root in roots:
+        if os.path.isfile(root):
+            yield os.path.abspath(root)
+            continue
+        for folder, _, names in os.walk(root):
+            for name in sorted(names):
+                if os.path.splitext(name)[1].lower() in MEDIA_EXTENSIONS:
+                    yield os.path.abspath(os.path.join(folder, name))
+
+
+class MediaIndex:
+    """Index SQLite des fichiers analysés d'une médiathèque
+
+    Pour chaque fichier : caractéristiques FFprobe, enveloppe d'énergie
+    compressée, part de parole et derniers réglages utilisés. Un fichier est
+    reconnu par son chemin, sa taille et sa date de modification
+    (source_identity) : un nouveau parcours ne décode que les fichiers
+    nouveaux ou modifiés. Les requêtes (silence, gain estimé pour un seuil)
+    lisent les enveloppes de l'index sans relire les médias.
+    """
+
+    def __init__(self, index_path=None):
+        self.index_path = index_path or default_index_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        # Une connexion partagée entre threads, protégée par un verrou
+        self.connection = sqlite3.connect(self.index_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        self.create_schema()
+
+    def create_schema(self):
+        with self.lock, self.connection:
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            if version not in (0, SCHEMA_VERSION):
+                logging.info(f"Index de version {version}, reconstruit")
+                self.connection.execute("DROP TABLE IF EXISTS media")
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def entry(self, video_path):
+        """Ligne de l'index d'un fichier, ou None"""
+        with self.lock:
+            return self.connection.execute("SELECT * FROM media WHERE path = ?",
+                                           (os.path.abspath(video_path),)).fetchone()
+
+    def is_current(self, identity):
+        """Indique si le fichier est indexé, analysé et inchangé depuis"""
+        with self.lock:
+            row = self.connection.execute("SELECT size, mtime, envelope FROM media WHERE path = ?",
+                                          (identity["path"],)).fetchone()
+        return (row is not None and row["envelope"] is not None and row["size"] == identity["size"]
+                and row["mtime"] == identity["mtime"])
+
+    def load_envelope(self, video_path):
+        """Enveloppe indexée d'un fichier, ou None s'il est absent ou a changé depuis"""
+        identity = source_identity(video_path)
+        row = self.entry(video_path)
+        if row is None or row["envelope"] is None or row["size"] != identity["size"] \
+                or row["mtime"] != identity["mtime"]:
+            return None
+        return self.envelope_from_row(row)
+
+    @staticmethod
+    def envelope_from_row(row):
+        window_energy = np.frombuffer(zlib.decompress(row["envelope"]), dtype=np.float32).astype(np.float64)
+        return AudioEnvelope(window_energy, row["window_size"], row["sample_rate"], row["total_samples"],
+                             row["energy_mean"], row["energy_std"])
+
+    def update(self, video_path, envelope, info=None, parameters=None):
+        """Enregistre l'analyse d'un fichier et la part de parole avec ces réglages"""
+        identity = source_identity(video_path)
+        parameters = detection_parameters(parameters)
+        duration = envelope.duration
+        speech_ratio = kept_duration(envelope, parameters) / duration if duration else 0.0
+        now = time.time()
+        info = info or {}
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO media (path, size, mtime, duration, has_video, has_audio, probe, "
+                "window_size, sample_rate, total_samples, energy_mean, energy_std, envelope, speech_ratio, "
+                "parameters, analyzed_at, used_at, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, NULL)",
+                (identity["path"], identity["size"], identity["mtime"], info.get("duration") or duration,
+                 info.get("has_video"), info.get("has_audio"), json.dumps(info), envelope.window_size,
+                 envelope.sample_rate, envelope.total_samples, envelope.energy_mean, envelope.energy_std,
+                 compress_envelope(envelope), speech_ratio, json.dumps(parameters), now, now))
+
+    def record_parameters(self, video_path, parameters, envelope=None):
+        """Retient les derniers réglages utilisés sur un fichier (et sa part de parole avec ces réglages)"""
+        parameters = detection_parameters(parameters)
+        if envelope is None:
+            envelope = self.load_envelope(video_path)
+        if envelope is None:
+            return
+        duration = envelope.duration
+        speech_ratio = kept_duration(envelope, parameters) / duration if duration else 0.0
+        with self.lock, self.connection:
+            self.connection.execute("UPDATE media SET parameters = ?, speech_ratio = ?, used_at = ? WHERE path = ?",
+                                    (json.dumps(parameters), speech_ratio, time.time(),
+                                     os.path.abspath(video_path)))
+
+    def record_error(self, identity, message):
+        """Garde la trace d'un fichier illisible pour ne pas le redécoder à chaque parcours"""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO media (path, size, mtime, analyzed_at, error) VALUES (?, ?, ?, ?, ?)",
+                (identity["path"], identity["size"], identity["mtime"], time.time(), message))
+
+    def is_failed(self, identity):
+        with self.lock:
+            row = self.connection.execute("SELECT size, mtime, error FROM media WHERE path = ?",
+                                          (identity["path"],)).fetchone()
+        return (row is not None and row["error"] is not None and row["size"] == identity["size"]
+                and row["mtime"] == identity["mtime"])
+
+    def forget_missing(self, roots):
+        """Retire de l'index les fichiers disparus sous les dossiers donnés"""
+        prefixes = [os.path.join(os.path.abspath(root), "") for root in roots if os.path.isdir(root)]
+        with self.lock:
+            paths = [row["path"] for row in self.connection.execute("SELECT path FROM media")]
+        missing = [path for path in paths
+                   if any(path.startswith(prefix) for prefix in prefixes) and not os.path.exists(path)]
+        if missing:
+            with self.lock, self.connection:
+                self.connection.executemany("DELETE FROM media WHERE path = ?", [(path,) for path in missing])
+            logging.info(f"{len(missing)} fichiers disparus retirés de l'index")
+        return missing
+
+    def scan(self, roots, parameters=None, analyzer=None, max_workers=MAX_PARALLEL_SCANS, retry_failed=False):
+        """Parcourt les dossiers et analyse les seuls fichiers nouveaux ou modifiés
+
+        Retourne le bilan {"indexed", "unchanged", "failed", "removed"}.
+        """
+        try:
+            if analyzer is None:
+                from video_cutter.audio_analyzer import AudioAnalyzer
+                analyzer = AudioAnalyzer()
+                analyzer.low_priority = True
+            removed = self.forget_missing(roots)
+            pending = []
+            unchanged = 0
+            for video_path in media_files(roots):
+                try:
+                    identity = source_identity(video_path)
+                except OSError:
+                    continue
+                if self.is_current(identity) or (self.is_failed(identity) and not retry_failed):
+                    unchanged += 1
+                else:
+                    pending.append(identity)
+            logging.info(f"Index : {len(pending)} fichiers à analyser, {unchanged} inchangés")
+
+            indexed = 0
+            failed = []
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending) or 1))) as executor:
+                futures = {executor.submit(self.analyze_file, analyzer, identity["path"]): identity
+                           for identity in pending}
+                for future in as_completed(futures):
+                    identity = futures[future]
+                    analyzer.check_cancelled()
+                    try:
+                        envelope, info = future.result()
+                    except Exception as e:
+                        logging.warning(f"Fichier non indexé : {identity['path']} ({str(e)})")
+                        self.record_error(identity, str(e))
+                        failed.append(identity["path"])
+                        continue
+                    self.update(identity["path"], envelope, info, parameters)
+                    indexed += 1
+                    logging.info(f"Indexé ({indexed}/{len(pending)}) : {identity['path']}")
+            return {"indexed": indexed, "unchanged": unchanged, "failed": failed, "removed": removed}
+        except Exception as e:
+            error_msg = f"Erreur lors du parcours de la médiathèque : {str(e)}"
+            logging.error(error_msg)
+            logging.error(traceback.format_exc())
+            raise Exception(error_msg)
+
+    @staticmethod
+    def analyze_file(analyzer, video_path):
+        info = probe_media(video_path, analyzer.cancel_event)
+        if not info["has_audio"]:
+            raise Exception("pas de piste audio")
+        return analyzer.analyze(video_path), info
+
+    def files(self):
+        """Fichiers indexés et analysés"""
+        with self.lock:
+            return self.connection.execute("SELECT * FROM media WHERE envelope IS NOT NULL ORDER BY path").fetchall()
+
+    def silent_files(self, min_silence):
+        """Fichiers dont la part de silence (avec leurs derniers réglages) dépasse min_silence (0-1)"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT path, duration, speech_ratio, parameters FROM media "
+                "WHERE envelope IS NOT NULL AND 1.0 - speech_ratio > ? ORDER BY speech_ratio", (min_silence,))
+            return [{"path": row["path"], "duration": row["duration"],
+                     "silence": round(1.0 - row["speech_ratio"], 4),
+                     "parameters": json.loads(row["parameters"] or "{}")} for row in rows]
+
+    def estimate_savings(self, threshold, margin=None, hysteresis=None):
+        """Durée retirée de chaque fichier indexé avec ce seuil (valeur du slider), sans relire les médias"""
+        parameters = {"threshold": threshold}
+        if margin is not None:
+            parameters["margin"] = margin
+        if hysteresis is not None:
+            parameters["hysteresis"] = hysteresis
+        parameters = detection_parameters(parameters)
+        files = []
+        for row in self.files():
+            envelope = self.envelope_from_row(row)
+            duration = envelope.duration
+            kept = kept_duration(envelope, parameters)
+            files.append({"path": row["path"], "duration": duration, "kept": kept, "saved": duration - kept})
+        total = sum(entry["duration"] for entry in files)
+        saved = sum(entry["saved"] for entry in files)
+        return {
+            "parameters": parameters,
+            "files": len(files),
+            "duration": total,
+            "kept": total - saved,
+            "saved": saved,
+            "saved_ratio": saved / total if total else 0.0,
+            "details": files
+        }
+
+    def stats(self):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT COUNT(envelope) AS files, COUNT(error) AS failed, SUM(duration) AS duration, "
+                "SUM(duration * (1.0 - speech_ratio)) AS silence, SUM(LENGTH(envelope)) AS envelope_bytes "
+                "FROM media").fetchone()
+        return {key: row[key] or 0 for key in row.keys()}
+
+
+def format_duration(seconds):
+    hours, rest = divmod(int(round(seconds)), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index des fichiers analysés d'une médiathèque")
+    parser.add_argument("--index", help="fichier de l'index (par défaut ~/AutoDerush_cache/media_index.sqlite)")
+    parser.add_argument("--json", action="store_true", help="résultat au format JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="analyse les fichiers nouveaux ou modifiés des dossiers")
+    scan.add_argument("roots", nargs="+", help="dossiers ou fichiers")
+    scan.add_argument("--threshold", type=int, default=DEFAULT_PARAMETERS["threshold"],
+                      help="valeur du slider de seuil (1-100) pour la part de parole")
+    scan.add_argument("--margin", type=int, default=DEFAULT_PARAMETERS["margin"], help="marge (ms)")
+    scan.add_argument("--stable", action="store_true", help="détection stable (hystérésis)")
+    scan.add_argument("--retry-failed", action="store_true", help="réessaie les fichiers illisibles")
+
+    silence = commands.add_parser("silence", help="fichiers dont la part de silence dépasse un pourcentage")
+    silence.add_argument("--min", type=float, default=40.0, help="part de silence minimale (%%)")
+
+    savings = commands.add_parser("savings", help="durée retirée estimée pour un seuil")
+    savings.add_argument("--threshold", type=int, required=True, help="valeur du slider de seuil (1-100)")
+    savings.add_argument("--margin", type=int, help="marge (ms)")
+    savings.add_argument("--stable", action="store_true", help="détection stable (hystérésis)")
+
+    commands.add_parser("stats", help="bilan de l'index")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stderr)]
+    )
+    with MediaIndex(args.index) as index:
+        if args.command == "scan":
+            result = index.scan(args.roots, {"threshold": args.threshold, "margin": args.margin,
+                                             "hysteresis": args.stable}, retry_failed=args.retry_failed)
+            text = (f"{result['indexed']} fichiers indexés, {result['unchanged']} inchangés, "
+                    f"{len(result['failed'])} en erreur, {len(result['removed'])} retirés")
+        elif args.command == "silence":
+            result = index.silent_files(args.min / 100.0)
+            text = "\n".join(f"{entry['silence'] * 100:5.1f}%  {format_duration(entry['duration'])}  {entry['path']}"
+                             for entry in result) or "Aucun fichier"
+        elif args.command == "savings":
+            result = index.estimate_savings(args.threshold, args.margin, args.stable or None)
+            text = (f"{result['files']} fichiers, {format_duration(result['duration'])} au total : "
+                    f"{format_duration(result['saved'])} retirées ({result['saved_ratio'] * 100:.1f}%), "
+                    f"{format_duration(result['kept'])} gardées")
+        else:
+            result = index.stats()
+            text = (f"{result['files']} fichiers indexés ({result['failed']} en erreur), "
+                    f"{format_duration(result['duration'])} dont {format_duration(result['silence'])} de silence, "
+                    f"enveloppes : {result['envelope_bytes'] / 1024 ** 2:.1f} Mo")
+    print(json.dumps(result, indent=2) if args.json else text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
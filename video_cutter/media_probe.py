@@ -0,0 +1,70 @@
+import os
+import json
+import logging
+
+from video_cutter.ffmpeg_runner import run_ffmpeg, FFmpegError
+
+# Délai maximal de lecture des caractéristiques d'un fichier
+PROBE_TIMEOUT = 60
+# Extensions reconnues comme fichiers audio
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.mp3', '.m4a', '.aac', '.ogg', '.opus')
+# Extensions des fichiers média reconnus (vidéo et audio)
+MEDIA_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov') + AUDIO_EXTENSIONS
+
+
+def is_audio_file(path):
+    """Indique, d'après l'extension, si le fichier est un fichier audio"""
+    return os.path.splitext(path)[1].lower() in AUDIO_EXTENSIONS
+
+
+def parse_rate(rate):
+    """Convertit une fréquence FFprobe de la forme '30000/1001' en nombre"""
+    try:
+        numerator, _, denominator = rate.partition('/')
+        return float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError, AttributeError):
+        return 0.0
+
+
+def probe_media(video_path, cancel_event=None):
+    """Lit les caractéristiques d'un fichier média avec FFprobe
+
+    Retourne un dictionnaire avec la durée, la présence de pistes vidéo et
+    audio, et les paramètres principaux de ces pistes.
+    """
+    command = [
+        'ffprobe',
+        '-v', 'error',
+        '-print_format', 'json',
+        '-show_format',
+        '-show_streams',
+        video_path
+    ]
+    try:
+        result = run_ffmpeg(command, cancel_event=cancel_event, timeout=PROBE_TIMEOUT, capture_stdout=True)
+    except FFmpegError as e:
+        error_msg = f"Erreur FFprobe : {str(e)}"
+        logging.error(error_msg)
+        raise Exception(error_msg)
+
+    data = json.loads(result.stdout or '{}')
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"
+                  and not s.get("disposition", {}).get("attached_pic")), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+
+    info = {
+        "duration": float(data.get("format", {}).get("duration", 0) or 0),
+        "has_video": video is not None,
+        "has_audio": audio is not None
+    }
+    if video is not None:
+        info["width"] = int(video.get("width", 0))
+        info["height"] = int(video.get("height", 0))
+        info["fps"] = parse_rate(video.get("avg_frame_rate") or video.get("r_frame_rate"))
+        info["video_codec"] = video.get("codec_name")
+    if audio is not None:
+        info["channels"] = int(audio.get("channels", 0))
+        info["sample_rate"] = int(audio.get("sample_rate", 0) or 0)
+        info["audio_codec"] = audio.get("codec_name")
+    return info
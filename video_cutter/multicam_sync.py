@@ -0,0 +1,292 @@
+import sys
+import os
+import json
+import hashlib
+import logging
+import argparse
+import threading
+import traceback
+
+import numpy as np
+
+# Ajouter le dossier parent au path pour permettre les imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from video_cutter.envelope import WINDOW_DURATION
+from video_cutter.segments import SegmentList
+from video_cutter.chunk_cache import source_identity
+from video_cutter.sharded_extract import decode_shard
+
+# Facteur de décimation de l'enveloppe pour la recherche grossière (fenêtres de 0,5s)
+COARSE_FACTOR = 10
+# Chevauchement minimal entre deux enregistrements pour qu'un décalage soit retenu
+MIN_OVERLAP = 10.0
+# Corrélation en dessous de laquelle la synchronisation est signalée comme douteuse
+MIN_CONFIDENCE = 0.3
+# Taux d'échantillonnage et durée de l'extrait décodé pour l'affinage final
+FINE_SAMPLE_RATE = 8000
+FINE_EXCERPT = 20.0
+
+
+def default_offsets_path():
+    """Retourne le fichier par défaut du cache des décalages"""
+    return os.path.join(os.path.expanduser("~"), "AutoDerush_cache", "multicam_offsets.json")
+
+
+def normalized_envelope(window_energy):
+    """Enveloppe en décibels centrée réduite : deux micros à des distances différentes restent comparables"""
+    levels = np.log10(np.asarray(window_energy, dtype=np.float64) + 1e-6)
+    std = np.std(levels)
+    return (levels - np.mean(levels)) / std if std > 0 else np.zeros(len(levels))
+
+
+def decimate(values, factor):
+    """Moyenne par blocs de factor valeurs (le dernier bloc peut être incomplet)"""
+    if factor <= 1 or not len(values):
+        return values
+    starts = np.arange(0, len(values), factor)
+    lengths = np.diff(np.append(starts, len(values)))
+    return np.add.reduceat(values, starts) / lengths
+
+
+def overlap_lengths(lags, reference_length, other_length):
+    """Nombre de valeurs communes quand other commence au décalage lag de reference"""
+    return np.minimum(reference_length, other_length + lags) - np.maximum(0, lags)
+
+
+def cross_correlate(reference, other, min_overlap=1):
+    """Corrélation croisée par FFT, normalisée par le chevauchement
+
+    Retourne (décalages, scores) : au décalage lag, other[i] est comparé à
+    reference[i + lag]. Les décalages dont le chevauchement est inférieur à
+    min_overlap valeurs ont un score de -inf.
+    """
+    size = len(reference) + len(other) - 1
+    fft_size = 1 << (size - 1).bit_length()
+    spectrum = np.fft.rfft(reference, fft_size) * np.conj(np.fft.rfft(other, fft_size))
+    circular = np.fft.irfft(spectrum, fft_size)
+    # Décalages négatifs en fin de tableau circulaire
+    lags = np.arange(-(len(other) - 1), len(reference))
+    values = np.concatenate((circular[fft_size - (len(other) - 1):], circular[:len(reference)]))
+    overlaps = overlap_lengths(lags, len(reference), len(other))
+    scores = np.full(len(lags), -np.inf)
+    valid = overlaps >= max(1, min_overlap)
+    scores[valid] = values[valid] / overlaps[valid]
+    return lags, scores
+
+
+def refine_lag(reference, other, lag, radius):
+    """Meilleur décalage dans [lag - radius, lag + radius], par produits scalaires directs"""
+    best_lag, best_score = lag, -np.inf
+    for candidate in range(lag - radius, lag + radius + 1):
+        start = max(0, candidate)
+        end = min(len(reference), len(other) + candidate)
+        if end - start < 1:
+            continue
+        score = float(np.dot(reference[start:end], other[start - candidate:end - candidate])) / (end - start)
+        if score > best_score:
+            best_lag, best_score = candidate, score
+    return best_lag, best_score
+
+
+def loudest_excerpt(window_energy, duration):
+    """Début (en fenêtres) du passage de duration secondes le plus énergique"""
+    length = max(1, int(duration / WINDOW_DURATION))
+    if len(window_energy) <= length:
+        return 0
+    sums = np.convolve(window_energy, np.ones(length), mode='valid')
+    return int(np.argmax(sums))
+
+
+def phase_correlation_lag(reference, other, max_lag):
+    """Décalage de other dans reference par corrélation à transformée de phase (GCC-PHAT)
+
+    La pondération par la phase rend le pic net même quand les micros ont
+    des timbres différents. Seuls les décalages de 0 à max_lag sont cherchés.
+    """
+    fft_size = 1 << (len(reference) + len(other) - 1).bit_length()
+    spectrum = np.fft.rfft(reference, fft_size) * np.conj(np.fft.rfft(other, fft_size))
+    spectrum /= np.maximum(np.abs(spectrum), 1e-12)
+    correlation = np.fft.irfft(spectrum, fft_size)[:max_lag + 1]
+    return int(np.argmax(correlation))
+
+
+def common_range(offsets, durations):
+    """Plage du temps de référence couverte par tous les angles"""
+    start = max(offsets)
+    end = min(offset + duration for offset, duration in zip(offsets, durations))
+    return start, max(start, end)
+
+
+def shared_segments(segments, offsets, durations):
+    """Applique une même liste de segments (temps de référence) à tous les angles
+
+    Les segments sont d'abord ramenés à la plage couverte par tous les
+    angles, pour que les sorties aient la même durée et restent
+    synchronisées, puis décalés dans le temps de chaque angle.
+    """
+    start, end = common_range(offsets, durations)
+    if end <= start:
+        return [SegmentList() for _ in offsets]
+    common = SegmentList.from_tuples(segments).intersection(SegmentList([start], [end]))
+    return [common.shift(-offset) for offset in offsets]
+
+
+class MulticamSync:
+    """Synchronisation de plusieurs enregistrements d'une même scène par leur son
+
+    Le décalage entre deux fichiers est trouvé en trois temps : corrélation
+    croisée par FFT des enveloppes décimées (fenêtres de 0,5s) sur toute leur
+    durée, affinage sur les enveloppes de 50ms autour du pic, puis corrélation
+    de phase sur un court extrait décodé à 8kHz. Une heure d'enregistrement ne
+    demande ainsi qu'une FFT de quelques milliers de points. Les enveloppes
+    viennent de l'analyseur (et de son cache) ; les décalages sont gardés dans
+    un fichier JSON par paire de fichiers.
+    """
+
+    def __init__(self, analyzer=None, cache_path=None):
+        if analyzer is None:
+            from video_cutter.audio_analyzer import AudioAnalyzer
+            analyzer = AudioAnalyzer()
+        self.analyzer = analyzer
+        self.cache_path = cache_path or default_offsets_path()
+        self.lock = threading.Lock()
+        self.offsets = self.load_cache()
+
+    def load_cache(self):
+        """Charge les décalages déjà calculés"""
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Cache des décalages illisible, il sera reconstruit : {str(e)}")
+            return {}
+
+    def save_cache(self):
+        """Écrit le cache des décalages de manière atomique"""
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        temp_path = self.cache_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.offsets, f, indent=2)
+        os.replace(temp_path, self.cache_path)
+
+    @staticmethod
+    def pair_key(reference_path, other_path):
+        """Clé d'une paire de fichiers : change si l'un d'eux est modifié"""
+        material = json.dumps([source_identity(reference_path), source_identity(other_path)], sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def offset(self, reference_path, other_path):
+        """Décalage de other_path dans reference_path
+
+        Retourne {"offset", "confidence"} : l'instant t de other_path
+        correspond à l'instant t + offset de reference_path.
+        """
+        key = self.pair_key(reference_path, other_path)
+        with self.lock:
+            cached = self.offsets.get(key)
+        if cached is not None:
+            logging.info(f"Décalage repris du cache : {other_path} ({cached['offset']:+.3f}s)")
+            return cached
+
+        try:
+            reference_envelope = self.analyzer.analyze(reference_path)
+            other_envelope = self.analyzer.analyze(other_path)
+            result = self.compute_offset(reference_path, other_path, reference_envelope, other_envelope)
+        except Exception as e:
+            error_msg = f"Erreur lors de la synchronisation de {other_path} : {str(e)}"
+            logging.error(error_msg)
+            logging.error(traceback.format_exc())
+            raise Exception(error_msg)
+
+        with self.lock:
+            self.offsets[key] = dict(result, reference=os.path.abspath(reference_path),
+                                     other=os.path.abspath(other_path))
+            self.save_cache()
+        return self.offsets[key]
+
+    def compute_offset(self, reference_path, other_path, reference_envelope, other_envelope):
+        """Recherche grossière, affinage sur l'enveloppe puis sur un extrait décodé"""
+        reference = normalized_envelope(reference_envelope.window_energy)
+        other = normalized_envelope(other_envelope.window_energy)
+
+        # 1. Enveloppes décimées, tous les décalages d'un coup par FFT
+        coarse_reference = decimate(reference, COARSE_FACTOR)
+        coarse_other = decimate(other, COARSE_FACTOR)
+        min_overlap = int(min(MIN_OVERLAP / (WINDOW_DURATION * COARSE_FACTOR),
+                              len(coarse_reference), len(coarse_other)))
+        lags, scores = cross_correlate(coarse_reference, coarse_other, min_overlap)
+        coarse_lag = int(lags[np.argmax(scores)])
+
+        # 2. Enveloppes de 50ms autour du pic grossier
+        lag, confidence = refine_lag(reference, other, coarse_lag * COARSE_FACTOR, COARSE_FACTOR)
+        offset = lag * WINDOW_DURATION
+        logging.info(f"Décalage de {other_path} : {offset:+.2f}s (corrélation {confidence:.2f})")
+        if confidence < MIN_CONFIDENCE:
+            logging.warning(f"Synchronisation douteuse pour {other_path} : corrélation {confidence:.2f}")
+
+        # 3. Extrait le plus énergique de other, cherché à ±2 fenêtres dans reference
+        try:
+            offset = self.fine_offset(reference_path, other_path, other_envelope, offset,
+                                      reference_envelope.duration)
+        except Exception as e:
+            logging.warning(f"Affinage impossible, décalage gardé à 50ms près : {str(e)}")
+        return {"offset": round(float(offset), 6), "confidence": round(float(confidence), 4)}
+
+    def fine_offset(self, reference_path, other_path, other_envelope, offset, reference_duration):
+        """Affine le décalage à l'échantillon près (8kHz) sur un court extrait décodé"""
+        radius = 2 * WINDOW_DURATION
+        # Extrait de other pris dans la partie commune aux deux fichiers
+        first = max(0.0, -offset + radius)
+        last = min(other_envelope.duration, reference_duration - offset - radius)
+        if last - first <= 1.0:
+            return offset
+        first_window = int(first / WINDOW_DURATION)
+        last_window = int(last / WINDOW_DURATION)
+        excerpt_start = first + loudest_excerpt(other_envelope.window_energy[first_window:last_window],
+                                                min(FINE_EXCERPT, last - first)) * WINDOW_DURATION
+        excerpt_duration = min(FINE_EXCERPT, last - excerpt_start)
+
+        rate = FINE_SAMPLE_RATE
+        other_start = int(excerpt_start * rate)
+        other_audio = decode_shard(other_path, other_start, other_start + int(excerpt_duration * rate), rate,
+                                   self.analyzer.cancel_event)
+        reference_start = int(round((excerpt_start + offset - radius) * rate))
+        reference_audio = decode_shard(reference_path, reference_start,
+                                       reference_start + int((excerpt_duration + 2 * radius) * rate), rate,
+                                       self.analyzer.cancel_event)
+        lag = phase_correlation_lag(reference_audio - np.mean(reference_audio), other_audio - np.mean(other_audio),
+                                    int(2 * radius * rate))
+        return (reference_start + lag - other_start) / rate
+
+    def sync(self, reference_path, other_paths):
+        """Décalages de plusieurs angles par rapport à la référence (qui a un décalage nul)"""
+        return [{"video_path": reference_path, "offset": 0.0, "confidence": 1.0}] + [
+            dict(self.offset(reference_path, other_path), video_path=other_path) for other_path in other_paths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synchronisation de plusieurs caméras par leur son")
+    parser.add_argument("reference", help="enregistrement de référence (en général celui du meilleur micro)")
+    parser.add_argument("others", nargs="+", help="autres angles à caler sur la référence")
+    parser.add_argument("--cache", help="fichier du cache des décalages")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stderr)]
+    )
+    results = MulticamSync(cache_path=args.cache).sync(args.reference, args.others)
+    print(json.dumps([{"video_path": result["video_path"], "offset": result["offset"],
+                       "confidence": result["confidence"]} for result in results], indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
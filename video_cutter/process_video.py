@@ -1,10 +1,27 @@
 import sys
 import os
 import json
-from audio_analyzer import AudioAnalyzer
 import logging
+import threading
 import traceback
 
+# Ajouter le dossier parent au path pour permettre les imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from video_cutter.audio_analyzer import AudioAnalyzer
+from video_cutter.chunk_cache import ChunkCache, DEFAULT_MAX_SIZE
+from video_cutter.ffmpeg_runner import cancel_on_sigterm
+from video_cutter.loudness import loudnorm_filter, measure_clips
+from video_cutter.media_index import MediaIndex
+from video_cutter.media_probe import probe_media
+from video_cutter.multicam_sync import MulticamSync, shared_segments
+from video_cutter.retakes import detect_retakes, drop_retakes
+from video_cutter.segments import SegmentList
+from video_cutter.time_map import TimeMap, retime_subtitle_file
+
 def setup_logging():
     """Configure le logging pour le processus de traitement"""
     logging.basicConfig(
@@ -15,38 +32,133 @@ def setup_logging():
         ]
     )
 
-def process_video(input_data):
-    """Traite la vidéo avec les paramètres donnés"""
+def process_video(input_data, cancel_event=None, envelope_cache=None):
+    """Traite la vidéo avec les paramètres donnés
+
+    Si cancel_event est levé, le FFmpeg en cours est arrêté et le traitement
+    s'interrompt ; un export reprenable repartira du dernier bloc terminé.
+    envelope_cache (EnvelopeCache) peut apporter des enveloppes déjà
+    calculées et recueille celles de ce traitement.
+    """
+    analyzer = None
     try:
         logging.info("Début du traitement de la vidéo")
         logging.info(f"Données d'entrée : {input_data}")
         
         # Extraire les paramètres
-        video_path = input_data['video_path']
+        # video_paths : plusieurs clips, dans l'ordre, enchaînés dans une seule sortie
+        video_paths = input_data.get('video_paths') or [input_data['video_path']]
+        video_path = video_paths[0]
         threshold = input_data['threshold']
         margin = input_data['margin']
         output_path = input_data['output_path']
+        resumable = input_data.get('resumable', False)
+        chunk_duration = input_data.get('chunk_duration', 60.0)
+        use_cache = input_data.get('use_cache', False)
+        normalize_loudness = input_data.get('normalize_loudness', False)
+        keep_visual_activity = input_data.get('keep_visual_activity', False)
+        # True pour les réglages stables par défaut, ou un dictionnaire de réglages
+        hysteresis = input_data.get('hysteresis', False)
+        # None : export audio seul si la source n'a pas de vidéo
+        audio_only = input_data.get('audio_only')
+        # Nombre de tranches décodées en parallèle (absent : automatique, 1 : désactivé)
+        shards = input_data.get('shards')
+        # Fichiers .srt/.vtt de la source à recaler sur la vidéo exportée
+        subtitles = input_data.get('subtitles', [])
+        # Autres caméras de la même scène, calées sur video_path par leur son
+        angles = input_data.get('angles', [])
+        # Prises recommencées : "report" pour les signaler, "drop" pour retirer la première
+        retakes_mode = input_data.get('retakes')
+        # Brouillon de relecture : image réduite et encodage rapide, mêmes coupes
+        draft = input_data.get('draft', False)
+        # Segments déjà détectés (résultat d'un brouillon) : le rendu final les reprend tels quels
+        given_segments = input_data.get('segments')
+        # Threads de chaque FFmpeg d'export (absent : un par cœur ; fixé par le gouverneur du serveur)
+        threads = input_data.get('threads')
+        # Index de la médiathèque (chemin, ou True pour l'index par défaut) : enveloppe reprise et réglages retenus
+        media_index = input_data.get('media_index')
         
-        logging.info(f"Chemin de la vidéo : {video_path}")
+        logging.info(f"Chemin de la vidéo : {', '.join(video_paths)}")
         logging.info(f"Seuil : {threshold}")
         logging.info(f"Marge : {margin}")
         logging.info(f"Chemin de sortie : {output_path}")
+        logging.info(f"Export reprenable : {resumable}")
+        logging.info(f"Cache des segments : {use_cache}")
+        logging.info(f"Normalisation de l'intensité : {normalize_loudness}")
+        logging.info(f"Activité visuelle : {keep_visual_activity}")
+        logging.info(f"Hystérésis : {hysteresis}")
+        logging.info(f"Prises recommencées : {retakes_mode}")
+        logging.info(f"Brouillon : {draft}")
         
         # Initialiser l'analyseur
         logging.info("Initialisation de l'analyseur audio")
-        analyzer = AudioAnalyzer()
+        analyzer = AudioAnalyzer(envelope_cache)
+        if cancel_event is not None:
+            analyzer.cancel_event = cancel_event
         analyzer.set_threshold(threshold)
         analyzer.set_margin(margin)
+        analyzer.set_keep_visual_activity(keep_visual_activity)
+        analyzer.set_sharding(shards)
+        analyzer.set_threads(threads)
+        if isinstance(hysteresis, dict):
+            analyzer.set_hysteresis(True, **hysteresis)
+        else:
+            analyzer.set_hysteresis(bool(hysteresis))
         
-        # Extraire l'audio
-        logging.info("Extraction de l'audio")
-        audio_data, sample_rate = analyzer.extract_audio(video_path)
-        logging.info(f"Audio extrait : {len(audio_data)} échantillons, {sample_rate}Hz")
+        if angles:
+            return process_angles(analyzer, video_path, angles, input_data)
+        if len(video_paths) > 1:
+            return process_clips(analyzer, video_paths, input_data)
         
-        # Détecter les segments
-        logging.info("Détection des segments")
-        segments = analyzer.detect_speech_segments(audio_data, sample_rate)
-        logging.info(f"Segments détectés : {len(segments) if segments else 0}")
+        retakes = None
+        if given_segments is not None:
+            # Segments d'un rendu précédent (brouillon) : ni analyse ni détection
+            segments = SegmentList.from_tuples(given_segments)
+            logging.info(f"Segments fournis : {len(segments)}")
+            envelope = None
+            if normalize_loudness:
+                envelope = analyzer.analyze(video_path, with_loudness=True)
+            duration = envelope.duration if envelope else probe_media(video_path, analyzer.cancel_event)["duration"]
+        else:
+            index = MediaIndex(None if media_index is True else media_index) if media_index else None
+            try:
+                indexed = None
+                if index is not None:
+                    indexed = index.load_envelope(video_path)
+                    if indexed is not None:
+                        logging.info("Enveloppe audio reprise de l'index de la médiathèque")
+                        analyzer.cache_envelope(video_path, indexed)
+                
+                # Extraire et analyser l'audio
+                logging.info("Extraction de l'audio")
+                envelope = analyzer.analyze(video_path, with_loudness=normalize_loudness,
+                                            with_visual=keep_visual_activity)
+                logging.info(f"Audio analysé : {envelope.total_samples} échantillons, {envelope.sample_rate}Hz")
+            
+                # Détecter les segments
+                logging.info("Détection des segments")
+                segments = analyzer.segments_from_envelope(envelope)
+                logging.info(f"Segments détectés : {len(segments) if segments else 0}")
+                
+                if index is not None:
+                    parameters = {"threshold": threshold, "margin": margin, "hysteresis": hysteresis}
+                    if indexed is not None:
+                        index.record_parameters(video_path, parameters, envelope)
+                    else:
+                        index.update(video_path, envelope, probe_media(video_path, analyzer.cancel_event),
+                                     parameters)
+            finally:
+                # Connexion SQLite refermée même si l'analyse échoue (processus de travail du serveur)
+                if index is not None:
+                    index.close()
+        
+            if retakes_mode and segments:
+                logging.info("Recherche des prises recommencées")
+                retakes = detect_retakes(video_path, segments, analyzer.cancel_event)
+                if retakes_mode == "drop" and retakes:
+                    segments = drop_retakes(segments, retakes)
+                    logging.info(f"{len(retakes)} premières prises retirées")
+            duration = envelope.duration
         
         if not segments:
             logging.warning("Aucun segment détecté")
@@ -62,15 +174,60 @@ def process_video(input_data):
         logging.info(f"Dossier de sortie : {output_dir}")
         logging.info(f"Nom du fichier : {output_name}")
         
-        analyzer.export_segments(video_path, segments, output_dir, output_name)
+        audio_filter = None
+        loudness = None
+        if normalize_loudness:
+            logging.info("Mesure de l'intensité des segments gardés")
+            loudness = analyzer.measure_loudness(envelope, segments)
+            audio_filter = loudnorm_filter(loudness, input_data.get('loudness_target'))
+        
+        cache = None
+        if use_cache:
+            cache = ChunkCache(input_data.get('cache_dir'), input_data.get('cache_max_size', DEFAULT_MAX_SIZE))
+        
+        summary = analyzer.export_segments(video_path, segments, output_dir, output_name,
+                                           resumable=resumable, chunk_duration=chunk_duration,
+                                           cache=cache, audio_filter=audio_filter, audio_only=audio_only,
+                                           draft=draft)
         logging.info("Export terminé avec succès")
         
-        return {
+        result = {
             'success': True,
-            'message': f"Traitement terminé avec succès !\nLa vidéo sans les blancs a été enregistrée sous :\n{output_path}"
+            'message': f"Traitement terminé avec succès !\nLa vidéo sans les blancs a été enregistrée sous :\n{output_path}",
+            'output_path': output_path,
+            'duration': duration,
+            'segments': segments.to_list()
         }
+        if summary and summary.get('audio_only'):
+            result['audio'] = summary
+        elif summary:
+            result['chunks'] = summary
+        if subtitles:
+            overlap = summary.get('crossfade', 0.0) if summary and summary.get('audio_only') else 0.0
+            time_map = TimeMap(segments, overlap)
+            output_base = os.path.splitext(output_path)[0]
+            result['subtitles'] = []
+            for subtitle_path in subtitles:
+                subtitle_name, extension = os.path.splitext(os.path.basename(subtitle_path))
+                retimed_path = f"{output_base}_{subtitle_name}{extension.lower()}"
+                logging.info(f"Recalage des sous-titres : {subtitle_path} -> {retimed_path}")
+                result['subtitles'].append(retime_subtitle_file(subtitle_path, retimed_path, time_map))
+        if cache is not None:
+            result['cache'] = cache.stats()
+        if loudness is not None:
+            result['loudness'] = loudness
+        if retakes is not None:
+            result['retakes'] = retakes
+        return result
         
     except Exception as e:
+        if analyzer is not None and analyzer.cancel_event.is_set():
+            logging.info("Traitement annulé")
+            return {
+                'success': False,
+                'cancelled': True,
+                'message': "Traitement annulé"
+            }
         error_msg = f"Erreur lors du traitement : {str(e)}\n{traceback.format_exc()}"
         logging.error(error_msg)
         return {
@@ -78,6 +235,137 @@ def process_video(input_data):
             'message': error_msg
         }
 
+def process_clips(analyzer, video_paths, input_data):
+    """Analyse plusieurs clips en parallèle puis les exporte dans un seul fichier
+
+    Chaque clip garde ses propres segments ; le résultat les détaille clip par clip.
+    """
+    output_path = input_data['output_path']
+    normalize_loudness = input_data.get('normalize_loudness', False)
+    if input_data.get('subtitles'):
+        logging.warning("Les sous-titres ne sont recalés que pour un clip seul, ils sont ignorés")
+    
+    logging.info(f"Analyse de {len(video_paths)} clips")
+    envelopes = analyzer.analyze_many(video_paths, with_loudness=normalize_loudness,
+                                      with_visual=input_data.get('keep_visual_activity', False))
+    clips = []
+    for video_path, envelope in zip(video_paths, envelopes):
+        segments = analyzer.segments_from_envelope(envelope)
+        logging.info(f"{video_path} : {len(segments)} segments")
+        clips.append((video_path, segments))
+    
+    if not any(segments for _, segments in clips):
+        logging.warning("Aucun segment détecté")
+        return {
+            'success': False,
+            'message': "Aucun segment de parole n'a été détecté. Essayez d'ajuster le seuil de détection."
+        }
+    
+    audio_filter = None
+    loudness = None
+    if normalize_loudness:
+        logging.info("Mesure de l'intensité des segments gardés")
+        loudness = measure_clips([(envelope.loudness, segments) for envelope, (_, segments) in zip(envelopes, clips)])
+        audio_filter = loudnorm_filter(loudness, input_data.get('loudness_target'))
+    
+    cache = None
+    if input_data.get('use_cache', False):
+        cache = ChunkCache(input_data.get('cache_dir'), input_data.get('cache_max_size', DEFAULT_MAX_SIZE))
+    
+    summary = analyzer.export_clips(clips, os.path.dirname(output_path), os.path.basename(output_path),
+                                    resumable=input_data.get('resumable', False),
+                                    chunk_duration=input_data.get('chunk_duration', 60.0),
+                                    cache=cache, audio_filter=audio_filter,
+                                    draft=input_data.get('draft', False))
+    logging.info("Export terminé avec succès")
+    
+    result = {
+        'success': True,
+        'message': f"Traitement terminé avec succès !\nLes {len(clips)} clips sans les blancs ont été enregistrés sous :\n{output_path}",
+        'output_path': output_path,
+        'duration': sum(envelope.duration for envelope in envelopes),
+        'clips': [{
+            'video_path': video_path,
+            'duration': envelope.duration,
+            'segments': segments.to_list()
+        } for (video_path, segments), envelope in zip(clips, envelopes)]
+    }
+    if summary:
+        result['chunks'] = summary
+    if cache is not None:
+        result['cache'] = cache.stats()
+    if loudness is not None:
+        result['loudness'] = loudness
+    return result
+
+def process_angles(analyzer, video_path, angle_paths, input_data):
+    """Synchronise plusieurs caméras sur la référence puis les exporte avec les mêmes coupes
+
+    Les segments sont détectés sur le son de la référence (video_path) et
+    ramenés à la plage filmée par tous les angles. Chaque angle est exporté
+    à côté de la sortie, son nom en suffixe, avec la même durée.
+    """
+    output_path = input_data['output_path']
+    normalize_loudness = input_data.get('normalize_loudness', False)
+    if input_data.get('subtitles'):
+        logging.warning("Les sous-titres ne sont pas recalés en multicaméra, ils sont ignorés")
+    
+    video_paths = [video_path] + list(angle_paths)
+    logging.info(f"Analyse de {len(video_paths)} angles")
+    envelopes = analyzer.analyze_many(video_paths, with_loudness=normalize_loudness,
+                                      with_visual=input_data.get('keep_visual_activity', False))
+    
+    logging.info("Synchronisation des angles")
+    angles = MulticamSync(analyzer, input_data.get('offsets_cache')).sync(video_path, angle_paths)
+    segments = analyzer.segments_from_envelope(envelopes[0])
+    angle_segments = shared_segments(segments, [angle['offset'] for angle in angles],
+                                     [envelope.duration for envelope in envelopes])
+    logging.info(f"Segments communs aux {len(angles)} angles : {len(angle_segments[0])}")
+    
+    if not angle_segments[0]:
+        logging.warning("Aucun segment détecté")
+        return {
+            'success': False,
+            'message': "Aucun segment de parole n'a été détecté dans la plage filmée par tous les angles."
+        }
+    
+    cache = None
+    if input_data.get('use_cache', False):
+        cache = ChunkCache(input_data.get('cache_dir'), input_data.get('cache_max_size', DEFAULT_MAX_SIZE))
+    
+    output_dir = os.path.dirname(output_path)
+    output_base, extension = os.path.splitext(os.path.basename(output_path))
+    for index, (angle, segments, envelope) in enumerate(zip(angles, angle_segments, envelopes)):
+        if index == 0:
+            output_name = os.path.basename(output_path)
+        else:
+            angle_name = os.path.splitext(os.path.basename(angle['video_path']))[0]
+            output_name = f"{output_base}_{angle_name}{extension}"
+        audio_filter = None
+        if normalize_loudness:
+            audio_filter = loudnorm_filter(analyzer.measure_loudness(envelope, segments),
+                                           input_data.get('loudness_target'))
+        logging.info(f"Export de l'angle {angle['video_path']} (décalage {angle['offset']:+.3f}s)")
+        analyzer.export_segments(angle['video_path'], segments, output_dir, output_name,
+                                 resumable=input_data.get('resumable', False),
+                                 chunk_duration=input_data.get('chunk_duration', 60.0),
+                                 cache=cache, audio_filter=audio_filter, draft=input_data.get('draft', False))
+        angle['output_path'] = os.path.join(output_dir, output_name)
+        angle['segments'] = segments.to_list()
+    logging.info("Export terminé avec succès")
+    
+    result = {
+        'success': True,
+        'message': f"Traitement terminé avec succès !\nLes {len(angles)} angles synchronisés ont été enregistrés à côté de :\n{output_path}",
+        'output_path': output_path,
+        'duration': envelopes[0].duration,
+        'segments': angle_segments[0].to_list(),
+        'angles': angles
+    }
+    if cache is not None:
+        result['cache'] = cache.stats()
+    return result
+
 if __name__ == '__main__':
     # Configurer le logging
     setup_logging()
@@ -92,8 +380,12 @@ if __name__ == '__main__':
         input_data = json.loads(input_text)
         logging.info("Données JSON décodées avec succès")
         
+        # SIGTERM arrête proprement le FFmpeg en cours au lieu de le laisser orphelin
+        cancel_event = threading.Event()
+        cancel_on_sigterm(cancel_event)
+        
         # Traiter la vidéo
-        result = process_video(input_data)
+        result = process_video(input_data, cancel_event)
         logging.info(f"Résultat du traitement : {result}")
         
         # Écrire le résultat sur stdout
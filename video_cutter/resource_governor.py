@@ -0,0 +1,189 @@
+import os
+import json
+import ctypes
+import logging
+import threading
+
+# Types de travaux gouvernés
+EXPORT = "export"
+ANALYSIS = "analysis"
+# Mémoire à prévoir par travail : encodeur x264 et ses tampons, ou audio décodé d'une longue analyse
+JOB_MEMORY = {EXPORT: 768 * 1024 ** 2, ANALYSIS: 1024 ** 3}
+# Threads par FFmpeg au départ : au-delà, un encodeur gagne peu à chaque thread supplémentaire
+INITIAL_THREADS = {EXPORT: 4, ANALYSIS: 2}
+# Part de la mémoire disponible laissée aux travaux
+MEMORY_SHARE = 0.8
+# Poids d'une nouvelle mesure dans la moyenne glissante du débit
+THROUGHPUT_SMOOTHING = 0.3
+# Mesures nécessaires à un niveau de parallélisme avant d'en essayer un autre
+MIN_SAMPLES = 2
+# Écart relatif de débit en dessous duquel deux niveaux sont considérés comme équivalents
+THROUGHPUT_TOLERANCE = 0.05
+
+
+def default_history_path():
+    """Retourne le fichier par défaut de l'historique des débits"""
+    return os.path.join(os.path.expanduser("~"), "AutoDerush_cache", "governor.json")
+
+
+class _MemoryStatus(ctypes.Structure):
+    _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+
+def available_memory():
+    """Mémoire vive disponible en octets, ou None si elle ne peut pas être lue"""
+    try:
+        if os.name == 'nt':
+            status = _MemoryStatus()
+            status.dwLength = ctypes.sizeof(_MemoryStatus)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return int(status.ullAvailPhys)
+            return None
+        if os.path.exists("/proc/meminfo"):
+            with open("/proc/meminfo", 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) * 1024
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class ResourceGovernor:
+    """Décide combien de travaux tournent en même temps et combien de threads reçoit chaque FFmpeg
+
+    Chaque FFmpeg prend par défaut autant de threads que de cœurs : plusieurs
+    exports simultanés surchargent la machine. Le gouverneur partage les
+    cœurs entre les travaux (threads = cœurs / travaux simultanés) et borne
+    leur nombre par la mémoire disponible. Le niveau de parallélisme part
+    d'une estimation puis s'ajuste au débit mesuré (secondes de média
+    traitées par seconde, tous travaux confondus) : les niveaux voisins sont
+    essayés et le meilleur est gardé. L'historique est conservé d'une
+    session à l'autre.
+    """
+
+    def __init__(self, history_path=None, cores=None):
+        self.cores = cores or os.cpu_count() or 1
+        self.history_path = history_path or default_history_path()
+        self.lock = threading.Lock()
+        self.history = self.load_history()
+        # Dernière décision journalisée, par type de travail
+        self.decisions = {}
+
+    def load_history(self):
+        """Charge les débits mesurés lors des sessions précédentes sur cette machine"""
+        if not os.path.exists(self.history_path):
+            return {}
+        try:
+            with open(self.history_path, 'r', encoding='utf-8') as f:
+                history = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Historique des débits illisible, il sera reconstruit : {str(e)}")
+            return {}
+        if history.get("cores") != self.cores:
+            logging.info("Historique des débits d'une autre machine, ignoré")
+            return {}
+        return history
+
+    def save_history(self):
+        """Écrit l'historique de manière atomique"""
+        self.history["cores"] = self.cores
+        try:
+            os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
+            temp_path = self.history_path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.history, f, indent=2)
+            os.replace(temp_path, self.history_path)
+        except OSError as e:
+            logging.warning(f"Historique des débits non enregistré : {str(e)}")
+
+    def levels(self, kind):
+        """Débits mesurés par niveau de parallélisme : {niveau: {"throughput", "samples"}}"""
+        return self.history.setdefault(kind, {"level": None, "levels": {}})
+
+    def limit(self, kind):
+        """Nombre maximal de travaux simultanés permis par les cœurs et la mémoire"""
+        limit = self.cores
+        memory = available_memory()
+        if memory is not None:
+            limit = min(limit, max(1, int(memory * MEMORY_SHARE // JOB_MEMORY[kind])))
+        return max(1, limit)
+
+    def threads(self, concurrency):
+        """Threads par FFmpeg pour que les travaux simultanés se partagent les cœurs"""
+        return max(1, self.cores // max(1, concurrency))
+
+    def plan(self, kind, pending=None):
+        """Retourne (travaux simultanés, threads par FFmpeg) pour pending travaux à lancer"""
+        with self.lock:
+            state = self.levels(kind)
+            limit = self.limit(kind)
+            level = state["level"] or max(1, self.cores // INITIAL_THREADS[kind])
+            level = min(level, limit)
+            state["level"] = level
+            concurrency = max(1, min(level, pending)) if pending is not None else level
+            threads = self.threads(concurrency)
+            decision = (concurrency, threads, limit)
+            if self.decisions.get(kind) != decision:
+                self.decisions[kind] = decision
+                logging.info(f"Gouverneur ({kind}) : {concurrency} travaux simultanés, {threads} threads chacun "
+                             f"({self.cores} cœurs, au plus {limit} travaux selon la mémoire)")
+            return concurrency, threads
+
+    def record(self, kind, media_seconds, wall_seconds, concurrency):
+        """Enregistre le débit d'un travail terminé et ajuste le niveau de parallélisme
+
+        Le débit total d'un niveau est estimé par le débit du travail
+        multiplié par le nombre de travaux qui tournaient avec lui.
+        """
+        if wall_seconds <= 0 or media_seconds <= 0:
+            return
+        with self.lock:
+            state = self.levels(kind)
+            throughput = media_seconds / wall_seconds * concurrency
+            entry = state["levels"].setdefault(str(concurrency), {"throughput": throughput, "samples": 0})
+            if entry["samples"]:
+                entry["throughput"] += THROUGHPUT_SMOOTHING * (throughput - entry["throughput"])
+            entry["samples"] += 1
+            logging.info(f"Gouverneur ({kind}) : {media_seconds:.0f}s de média en {wall_seconds:.1f}s, "
+                         f"débit total estimé x{throughput:.2f} à {concurrency} travaux "
+                         f"(moyenne x{entry['throughput']:.2f} sur {entry['samples']} mesures)")
+            if state["level"] is not None and concurrency == state["level"]:
+                self.adapt(kind, state)
+            self.save_history()
+
+    def adapt(self, kind, state):
+        """Essaie les niveaux voisins encore inconnus, sinon va vers le meilleur débit"""
+        level = state["level"]
+        measured = state["levels"]
+        if measured.get(str(level), {}).get("samples", 0) < MIN_SAMPLES:
+            return
+        limit = self.limit(kind)
+        neighbours = [candidate for candidate in (level + 1, level - 1) if 1 <= candidate <= limit]
+        unexplored = [candidate for candidate in neighbours if str(candidate) not in measured]
+        if unexplored:
+            new_level = unexplored[0]
+            reason = "essai"
+        else:
+            best = max([level] + neighbours, key=lambda candidate: measured[str(candidate)]["throughput"])
+            current = measured[str(level)]["throughput"]
+            if measured[str(best)]["throughput"] <= current * (1 + THROUGHPUT_TOLERANCE):
+                return
+            new_level = best
+            reason = "meilleur débit"
+        state["level"] = new_level
+        logging.info(f"Gouverneur ({kind}) : {level} -> {new_level} travaux simultanés ({reason}, "
+                     f"{self.threads(new_level)} threads chacun)")
+
+    def summary(self):
+        """État du gouverneur pour les métriques"""
+        with self.lock:
+            return {
+                "cores": self.cores,
+                "available_memory": available_memory(),
+                "levels": {kind: dict(state) for kind, state in self.history.items() if kind != "cores"}
+            }
@@ -0,0 +1,244 @@
+import sys
+import os
+import json
+import time
+import logging
+import argparse
+import traceback
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Ajouter le dossier parent au path pour permettre les imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from video_cutter.segments import SegmentList
+from video_cutter.sharded_extract import decode_shard
+
+# Audio décodé pour les empreintes : la voix tient sous 4kHz
+FINGERPRINT_SAMPLE_RATE = 8000
+# Trames du spectrogramme (128ms, pas de 32ms)
+FRAME_SIZE = 1024
+HOP_SIZE = 256
+# Bande de fréquences où les pics sont cherchés (Hz)
+MIN_FREQUENCY = 200
+MAX_FREQUENCY = 3500
+# Pics gardés par trame et nombre de pics suivants associés à chacun
+PEAKS_PER_FRAME = 5
+FAN_OUT = 8
+# Écart maximal (en trames) entre les deux pics d'une empreinte (6 bits)
+MAX_PAIR_FRAMES = 63
+# Trames transformées d'un coup (borne la mémoire)
+SPECTRUM_BLOCK_FRAMES = 8192
+# Occurrences d'une même empreinte associées entre elles au plus (bruit de fond, voyelles tenues)
+MAX_HASH_OCCURRENCES = 24
+# Tolérance (en trames) sur le décalage entre deux prises
+DELTA_TOLERANCE = 2
+# Correspondances minimales et part des empreintes de la première prise retrouvées dans la seconde
+MIN_MATCHES = 12
+MIN_COVERAGE = 0.25
+# Écart maximal entre deux prises d'une même phrase (s)
+MAX_RETAKE_DISTANCE = 300.0
+
+
+def spectral_peaks(audio_data, sample_rate=FINGERPRINT_SAMPLE_RATE):
+    """Pics du spectrogramme : (trames, bandes de fréquence), triés par trame
+
+    Les FFT sont faites par blocs de trames. Dans chaque trame, les maxima
+    locaux de la bande vocale sont classés et les PEAKS_PER_FRAME plus forts
+    gardés s'ils dépassent nettement le niveau moyen de la trame.
+    """
+    if len(audio_data) < FRAME_SIZE:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    frames = sliding_window_view(audio_data, FRAME_SIZE)[::HOP_SIZE]
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    low = int(MIN_FREQUENCY * FRAME_SIZE / sample_rate)
+    high = int(MAX_FREQUENCY * FRAME_SIZE / sample_rate)
+
+    peak_frames = []
+    peak_bins = []
+    for offset in range(0, len(frames), SPECTRUM_BLOCK_FRAMES):
+        block = frames[offset:offset + SPECTRUM_BLOCK_FRAMES] * window
+        magnitude = np.log(np.abs(np.fft.rfft(block, axis=1))[:, low - 1:high + 1] + 1e-9)
+        band = magnitude[:, 1:-1]
+        local_max = (band > magnitude[:, :-2]) & (band >= magnitude[:, 2:])
+        # Au moins 10 dB au-dessus du niveau moyen de la trame
+        local_max &= band > np.mean(band, axis=1, keepdims=True) + np.log(10 ** 0.5)
+        scores = np.where(local_max, band, -np.inf)
+        count = min(PEAKS_PER_FRAME, scores.shape[1])
+        top = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+        rows = np.repeat(np.arange(len(block)), count)
+        top = top.ravel()
+        valid = np.isfinite(scores[rows, top])
+        peak_frames.append(rows[valid] + offset)
+        peak_bins.append(top[valid] + low)
+    return np.concatenate(peak_frames), np.concatenate(peak_bins)
+
+
+def fingerprint(audio_data, sample_rate=FINGERPRINT_SAMPLE_RATE):
+    """Empreintes de l'audio : (hachages, trame du premier pic)
+
+    Chaque pic est associé aux FAN_OUT pics suivants ; une empreinte code
+    les deux fréquences et leur écart en trames, indépendamment du volume.
+    """
+    frames, bins = spectral_peaks(audio_data, sample_rate)
+    hashes = []
+    anchors = []
+    for step in range(1, FAN_OUT + 1):
+        delta = frames[step:] - frames[:-step]
+        valid = (delta > 0) & (delta <= MAX_PAIR_FRAMES)
+        hashes.append((bins[:-step][valid] << 15) | (bins[step:][valid] << 6) | delta[valid])
+        anchors.append(frames[:-step][valid])
+    if not hashes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(hashes), np.concatenate(anchors)
+
+
+def find_retakes(hashes, anchors, segments, sample_rate=FINGERPRINT_SAMPLE_RATE,
+                 max_distance=MAX_RETAKE_DISTANCE, min_matches=MIN_MATCHES, min_coverage=MIN_COVERAGE):
+    """Repère les segments répétés plus loin (prises recommencées)
+
+    Les empreintes de chaque segment sont rangées par valeur de hachage
+    (tri) : seules les empreintes identiques sont comparées, en temps
+    quasi linéaire. Deux segments sont deux prises d'une même phrase quand
+    beaucoup de leurs empreintes communes ont le même décalage dans le
+    temps. Retourne une liste de propositions, triée par segment à retirer :
+    {"drop", "keep" (indices), "drop_segment", "keep_segment", "matches",
+    "coverage", "offset" (s)}.
+    """
+    segments = SegmentList.from_tuples(segments)
+    if not len(segments) or not len(hashes):
+        return []
+    frame_duration = HOP_SIZE / sample_rate
+    times = anchors * frame_duration
+
+    # Segment de chaque empreinte (celles hors segments sont écartées)
+    owners = np.searchsorted(segments.starts, times, side='right') - 1
+    inside = (owners >= 0) & (times < segments.ends[np.maximum(owners, 0)])
+    hashes, anchors, owners = hashes[inside], anchors[inside], owners[inside]
+
+    # Index : empreintes triées par hachage puis dans l'ordre du temps. Les
+    # empreintes identiques sont voisines ; seules celles à moins de
+    # max_distance l'une de l'autre sont associées
+    order = np.lexsort((anchors, hashes))
+    hashes, anchors, owners = hashes[order], anchors[order], owners[order]
+    # Un son tenu répète la même empreinte trame après trame : une seule est gardée
+    repeated = np.concatenate(([False], (hashes[1:] == hashes[:-1]) & (owners[1:] == owners[:-1])
+                               & (anchors[1:] - anchors[:-1] <= DELTA_TOLERANCE * 2)))
+    hashes, anchors, owners = hashes[~repeated], anchors[~repeated], owners[~repeated]
+    hash_counts = np.bincount(owners, minlength=len(segments))
+    max_frames = (max_distance + segments.durations().max()) / frame_duration
+    first_entry = []
+    second_owner = []
+    deltas = []
+    for step in range(1, min(MAX_HASH_OCCURRENCES, len(hashes))):
+        delta = anchors[step:] - anchors[:-step]
+        same = (hashes[step:] == hashes[:-step]) & (delta <= max_frames)
+        if not np.any(same):
+            break
+        pair = same & (owners[step:] != owners[:-step])
+        first_entry.append(np.flatnonzero(pair))
+        second_owner.append(owners[step:][pair])
+        deltas.append(delta[pair])
+    if not first_entry:
+        return []
+    first_entry = np.concatenate(first_entry)
+    first_owner = owners[first_entry]
+    second_owner = np.concatenate(second_owner)
+    deltas = np.concatenate(deltas)
+
+    # Deux prises éloignées de plus de max_distance ne sont pas comparées
+    close = segments.starts[second_owner] - segments.ends[first_owner] <= max_distance
+    first_entry, first_owner, second_owner, deltas = (first_entry[close], first_owner[close], second_owner[close],
+                                                      deltas[close])
+    if not len(deltas):
+        return []
+
+    # Votes par couple de segments et par décalage, à DELTA_TOLERANCE trames
+    # près : chaque empreinte de la première prise vote une fois par classe,
+    # et chaque classe reçoit aussi les votes de la suivante
+    bins = np.floor_divide(deltas, DELTA_TOLERANCE)
+    keys = (first_owner << 40) | ((second_owner - first_owner) << 24) | bins
+    order = np.lexsort((first_entry, keys))
+    keys, first_entry = keys[order], first_entry[order]
+    duplicate = np.concatenate(([False], (keys[1:] == keys[:-1]) & (first_entry[1:] == first_entry[:-1])))
+    keys, votes = np.unique(keys[~duplicate], return_counts=True)
+    following = np.zeros(len(votes), dtype=np.int64)
+    neighbour = keys[1:] == keys[:-1] + 1
+    following[:-1][neighbour] = votes[1:][neighbour]
+    votes = np.minimum(votes + following, hash_counts[keys >> 40])
+    retakes = {}
+    for key, count in zip(keys.tolist(), votes.tolist()):
+        first = key >> 40
+        second = first + ((key >> 24) & 0xFFFF)
+        delta_bin = key & 0xFFFFFF
+        coverage = count / max(1, hash_counts[first])
+        if count < min_matches or coverage < min_coverage:
+            continue
+        best = retakes.get(first)
+        if best is None or count > best["matches"]:
+            retakes[first] = {
+                "drop": int(first),
+                "keep": int(second),
+                "drop_segment": list(segments[first]),
+                "keep_segment": list(segments[second]),
+                "matches": int(count),
+                "coverage": round(float(coverage), 3),
+                "offset": round(float((delta_bin + 1) * DELTA_TOLERANCE * frame_duration), 3)
+            }
+    return [retakes[index] for index in sorted(retakes)]
+
+
+def drop_retakes(segments, retakes):
+    """Segments sans les premières prises proposées par find_retakes"""
+    segments = SegmentList.from_tuples(segments)
+    keep = np.ones(len(segments), dtype=bool)
+    keep[[retake["drop"] for retake in retakes]] = False
+    return SegmentList(segments.starts[keep], segments.ends[keep])
+
+
+def detect_retakes(video_path, segments, cancel_event=None, low_priority=False):
+    """Décode l'audio à 8kHz, calcule ses empreintes et repère les prises recommencées"""
+    try:
+        started = time.monotonic()
+        audio_data = decode_shard(video_path, 0, None, FINGERPRINT_SAMPLE_RATE, cancel_event, low_priority)
+        hashes, anchors = fingerprint(audio_data)
+        del audio_data
+        retakes = find_retakes(hashes, anchors, segments)
+        logging.info(f"Prises recommencées : {len(retakes)} sur {len(segments)} segments "
+                     f"({len(hashes)} empreintes, {time.monotonic() - started:.1f}s)")
+        return retakes
+    except Exception as e:
+        error_msg = f"Erreur lors de la recherche des prises recommencées : {str(e)}"
+        logging.error(error_msg)
+        logging.error(traceback.format_exc())
+        raise Exception(error_msg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Repère les phrases recommencées après une erreur")
+    parser.add_argument("video_path", help="fichier audio ou vidéo")
+    parser.add_argument("--threshold", type=int, default=50, help="valeur du slider de seuil (1-100)")
+    parser.add_argument("--margin", type=int, default=100, help="marge autour des segments (ms)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stderr)]
+    )
+    from video_cutter.audio_analyzer import AudioAnalyzer
+    analyzer = AudioAnalyzer()
+    analyzer.set_threshold(args.threshold)
+    analyzer.set_margin(args.margin)
+    segments = analyzer.segments_from_envelope(analyzer.analyze(args.video_path))
+    retakes = detect_retakes(args.video_path, segments)
+    print(json.dumps(retakes, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import json
+import struct
+
+import numpy as np
+
+# En-tête de la sérialisation binaire : signature, version, nombre de segments
+BINARY_MAGIC = b'ADSL'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sBQ')
+
+
+def _merge_sorted(starts, ends, gap, inclusive):
+    """Fusionne des segments triés par début dont l'écart est inférieur à gap
+
+    Avec inclusive, un écart exactement égal à gap fusionne aussi. Les segments
+    qui se chevauchent (écart négatif) sont toujours fusionnés.
+    """
+    if len(starts) == 0:
+        return starts, ends
+    reach = np.maximum.accumulate(ends)
+    gaps = starts[1:] - reach[:-1]
+    breaks = gaps > gap if inclusive else gaps >= gap
+    first = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+    last = np.concatenate((first[1:] - 1, [len(starts) - 1]))
+    return starts[first], reach[last]
+
+
+class SegmentList:
+    """Liste compacte de segments (début, fin) en secondes
+
+    Les bornes sont stockées dans deux tableaux NumPy contigus, triés et sans
+    chevauchement ; toutes les opérations sont vectorisées. L'itération produit
+    des tuples (début, fin), ce qui la rend utilisable partout où une liste de
+    tuples était attendue.
+    """
+
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self, starts=None, ends=None):
+        self.starts = np.ascontiguousarray(starts if starts is not None else [], dtype=np.float64)
+        self.ends = np.ascontiguousarray(ends if ends is not None else [], dtype=np.float64)
+        if self.starts.shape != self.ends.shape or self.starts.ndim != 1:
+            raise ValueError("Les tableaux de début et de fin doivent avoir la même taille")
+
+    @classmethod
+    def from_tuples(cls, segments):
+        """Construit une liste à partir de tuples (début, fin) ou d'une autre SegmentList"""
+        if isinstance(segments, cls):
+            return cls(segments.starts.copy(), segments.ends.copy())
+        pairs = np.asarray(list(segments), dtype=np.float64).reshape(-1, 2)
+        return cls(pairs[:, 0], pairs[:, 1])
+
+    @classmethod
+    def from_mask(cls, mask, window_size, sample_rate, total_samples=None):
+        """Construit les segments correspondant aux fenêtres actives d'un masque
+
+        Un segment commence au début de sa première fenêtre active et se termine
+        au début de la première fenêtre inactive qui suit ; un segment encore
+        ouvert en fin de masque se termine à total_samples.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        if total_samples is None:
+            total_samples = len(mask) * window_size
+        edges = np.diff(mask.astype(np.int8), prepend=0, append=0)
+        start_windows = np.flatnonzero(edges == 1)
+        end_windows = np.flatnonzero(edges == -1)
+        start_samples = start_windows * window_size
+        end_samples = np.minimum(end_windows * window_size, total_samples)
+        return cls(start_samples / sample_rate, end_samples / sample_rate)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __bool__(self):
+        return len(self.starts) > 0
+
+    def __iter__(self):
+        return zip(self.starts.tolist(), self.ends.tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return SegmentList(self.starts[index], self.ends[index])
+        return float(self.starts[index]), float(self.ends[index])
+
+    def __eq__(self, other):
+        if not isinstance(other, SegmentList):
+            return NotImplemented
+        return np.array_equal(self.starts, other.starts) and np.array_equal(self.ends, other.ends)
+
+    def __repr__(self):
+        return f"SegmentList({len(self)} segments, {self.total_duration():.3f}s)"
+
+    def to_list(self):
+        """Retourne les segments sous forme de liste de tuples"""
+        return list(self)
+
+    def durations(self):
+        """Durée de chaque segment"""
+        return self.ends - self.starts
+
+    def total_duration(self):
+        """Durée cumulée des segments"""
+        return float(np.sum(self.ends - self.starts))
+
+    def contains(self, times):
+        """Indique pour chaque instant s'il tombe dans un segment"""
+        times = np.asarray(times, dtype=np.float64)
+        index = np.searchsorted(self.starts, times, side='right') - 1
+        valid = index >= 0
+        inside = np.zeros(times.shape, dtype=bool)
+        inside[valid] = times[valid] < self.ends[index[valid]]
+        return inside
+
+    def filter_min_length(self, min_length, strict=True):
+        """Ne garde que les segments plus longs que min_length"""
+        durations = self.durations()
+        keep = durations > min_length if strict else durations >= min_length
+        return SegmentList(self.starts[keep], self.ends[keep])
+
+    def merge_gaps(self, min_gap, inclusive=False):
+        """Fusionne les segments séparés par un écart inférieur à min_gap"""
+        return SegmentList(*_merge_sorted(self.starts, self.ends, min_gap, inclusive))
+
+    def pad(self, margin, lower=0.0, upper=None):
+        """Étend chaque segment de margin de part et d'autre, borné à [lower, upper]
+
+        Les segments que la marge fait se toucher ou se chevaucher sont fusionnés.
+        """
+        if not len(self):
+            return SegmentList()
+        padded_ends = self.ends + margin
+        padded_starts = self.starts - margin
+        breaks = padded_ends[:-1] < padded_starts[1:]
+        first = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+        last = np.concatenate((first[1:] - 1, [len(self) - 1]))
+        starts = np.maximum(padded_starts[first], lower)
+        ends = padded_ends[last]
+        if upper is not None:
+            ends = np.minimum(ends, upper)
+        return SegmentList(starts, ends)
+
+    def complement(self, lower=0.0, upper=None):
+        """Retourne les zones non couvertes (les coupes) entre lower et upper"""
+        if upper is None:
+            upper = float(self.ends[-1]) if len(self) else lower
+        starts = np.concatenate(([lower], self.ends))
+        ends = np.concatenate((self.starts, [upper]))
+        starts = np.clip(starts, lower, upper)
+        ends = np.clip(ends, lower, upper)
+        keep = ends > starts
+        return SegmentList(starts[keep], ends[keep])
+
+    def union(self, other):
+        """Réunion de deux listes de segments"""
+        starts = np.concatenate((self.starts, other.starts))
+        ends = np.concatenate((self.ends, other.ends))
+        order = np.argsort(starts, kind='stable')
+        return SegmentList(*_merge_sorted(starts[order], ends[order], 0.0, True))
+
+    def intersection(self, other):
+        """Intersection de deux listes de segments"""
+        if not len(self) or not len(other):
+            return SegmentList()
+        lower = min(self.starts[0], other.starts[0])
+        upper = max(self.ends[-1], other.ends[-1])
+        cuts = self.complement(lower, upper).union(other.complement(lower, upper))
+        return cuts.complement(lower, upper)
+
+    def scale(self, factor):
+        """Multiplie toutes les bornes par factor (conversion d'unités)"""
+        return SegmentList(self.starts * factor, self.ends * factor)
+
+    def shift(self, offset):
+        """Décale tous les segments de offset secondes"""
+        return SegmentList(self.starts + offset, self.ends + offset)
+
+    def to_bytes(self):
+        """Sérialisation binaire compacte (float64 little-endian)"""
+        header = BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(self))
+        return header + self.starts.astype('<f8').tobytes() + self.ends.astype('<f8').tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Relit une liste produite par to_bytes"""
+        magic, version, count = BINARY_HEADER.unpack_from(data)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError("Données de segments invalides")
+        values = np.frombuffer(data, dtype='<f8', count=2 * count, offset=BINARY_HEADER.size)
+        return cls(values[:count].astype(np.float64), values[count:].astype(np.float64))
+
+    def to_json(self):
+        """Sérialisation JSON en colonnes"""
+        return json.dumps({"starts": self.starts.tolist(), "ends": self.ends.tolist()})
+
+    @classmethod
+    def from_json(cls, text):
+        """Relit une liste produite par to_json (ou une liste de paires [début, fin])"""
+        data = json.loads(text) if isinstance(text, str) else text
+        if isinstance(data, dict):
+            return cls(data["starts"], data["ends"])
+        return cls.from_tuples(data)
@@ -0,0 +1,188 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+import numpy as np
+
+from video_cutter.envelope import AudioEnvelope, WINDOW_DURATION, detect_segments, threshold_multiplier
+from video_cutter.ffmpeg_runner import run_ffmpeg, FFmpegCancelled
+
+# Taux d'échantillonnage de l'audio analysé (mono)
+ANALYSIS_SAMPLE_RATE = 44100
+# Durée en dessous de laquelle un fichier est décodé d'un seul tenant
+MIN_SHARDED_DURATION = 20 * 60
+# Durée minimale d'une tranche : au-delà du lancement de FFmpeg, chaque tranche doit avoir du travail
+MIN_SHARD_DURATION = 5 * 60
+# Nombre maximal de tranches décodées en parallèle
+MAX_SHARDS = 16
+# Audio décodé en plus à la fin de chaque tranche, pour ne jamais en manquer après la recherche
+SHARD_OVERRUN = 1.0
+# Intervalle de vérification de l'annulation pendant le décodage
+POLL_INTERVAL = 0.2
+
+
+def shard_count(duration, requested=None):
+    """Nombre de tranches pour une durée : requested si précisé, sinon selon la durée et les cœurs"""
+    if requested:
+        return max(1, int(requested))
+    if duration < MIN_SHARDED_DURATION:
+        return 1
+    return max(1, min(os.cpu_count() or 1, MAX_SHARDS, int(duration // MIN_SHARD_DURATION)))
+
+
+def plan_shards(duration, shards, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """Bornes des tranches en échantillons, alignées sur les fenêtres d'analyse
+
+    Aucune fenêtre ne chevauche deux tranches : les énergies par fenêtre se
+    recollent telles quelles. La dernière tranche va jusqu'à la fin du
+    fichier (fin à None), sa longueur exacte n'étant connue qu'au décodage.
+    """
+    window_size = int(sample_rate * WINDOW_DURATION)
+    total_windows = int(np.ceil(duration * sample_rate / window_size))
+    edges = np.linspace(0, total_windows, shards + 1).astype(np.int64) * window_size
+    edges = np.unique(edges)
+    bounds = [(int(start), int(end)) for start, end in zip(edges[:-1], edges[1:])]
+    if not bounds:
+        return [(0, None)]
+    bounds[-1] = (bounds[-1][0], None)
+    return bounds
+
+
+def decode_shard(video_path, start, end, sample_rate, cancel_event=None, low_priority=False):
+    """Décode une tranche [start, end[ (en échantillons) en mono float32
+
+    La recherche se fait côté entrée (-ss avant -i) : FFmpeg ne décode que la
+    tranche. Un peu plus que nécessaire est demandé puis l'audio est ramené
+    exactement à end - start échantillons.
+    """
+    command = [
+        'ffmpeg',
+        '-v', 'error',
+        '-ss', f"{start / sample_rate:.6f}"
+    ]
+    if end is not None:
+        command += ['-t', f"{(end - start) / sample_rate + SHARD_OVERRUN:.6f}"]
+    command += [
+        '-i', video_path,
+        '-vn',
+        '-f', 's16le',
+        '-acodec', 'pcm_s16le',
+        '-ar', str(sample_rate),
+        '-ac', '1',
+        'pipe:1'
+    ]
+    result = run_ffmpeg(command, cancel_event=cancel_event, capture_stdout=True, binary_stdout=True,
+                        low_priority=low_priority)
+    samples = np.frombuffer(result.stdout, dtype=np.int16, count=len(result.stdout) // 2)
+    if end is not None:
+        expected = end - start
+        if len(samples) < expected:
+            logging.warning(f"Tranche {start / sample_rate:.1f}s : {expected - len(samples)} échantillons "
+                            f"manquants complétés par du silence")
+            samples = np.concatenate((samples, np.zeros(expected - len(samples), dtype=np.int16)))
+        samples = samples[:expected]
+    return samples.astype(np.float32) / 32768.0
+
+
+def shard_statistics(audio_data, window_size):
+    """Énergie par fenêtre et sommes nécessaires aux statistiques globales d'une tranche"""
+    energy = np.abs(audio_data)
+    if not len(energy):
+        return np.zeros(0), 0, 0.0, 0.0
+    window_starts = np.arange(0, len(energy), window_size)
+    window_lengths = np.diff(np.append(window_starts, len(energy)))
+    window_energy = np.add.reduceat(energy, window_starts) / window_lengths
+    return (window_energy, len(energy), float(np.sum(energy, dtype=np.float64)),
+            float(np.sum(np.square(energy, dtype=np.float64))))
+
+
+def extract_envelope_sharded(video_path, duration, shards, cancel_event=None, keep_audio=False,
+                             low_priority=False, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """Calcule l'enveloppe d'un long fichier en décodant ses tranches en parallèle
+
+    Chaque tranche est décodée par son propre FFmpeg et ses énergies par
+    fenêtre sont calculées dans son thread. Les tranches étant alignées sur
+    les fenêtres, l'enveloppe recollée a les mêmes fenêtres qu'un décodage
+    d'un seul tenant ; la moyenne et l'écart-type globaux sont recombinés à
+    partir des sommes de chaque tranche. Les segments sont détectés ensuite
+    sur l'enveloppe complète, donc sans coupure aux bords des tranches.
+
+    Retourne (enveloppe, audio) ; l'audio complet n'est gardé qu'avec
+    keep_audio (mesure d'intensité), sinon None.
+    """
+    window_size = int(sample_rate * WINDOW_DURATION)
+    bounds = plan_shards(duration, shards, sample_rate)
+    logging.info(f"Décodage en {len(bounds)} tranches parallèles")
+
+    # Une tranche en échec arrête les autres
+    abort = threading.Event()
+
+    def process(bounds_index):
+        start, end = bounds[bounds_index]
+        audio_data = decode_shard(video_path, start, end, sample_rate, abort, low_priority)
+        return shard_statistics(audio_data, window_size), audio_data if keep_audio else None
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(bounds)) as executor:
+        futures = [executor.submit(process, index) for index in range(len(bounds))]
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_EXCEPTION)
+            if any(future.exception() is not None for future in done):
+                break
+            if cancel_event is not None and cancel_event.is_set():
+                break
+        if pending:
+            abort.set()
+        errors = [future.exception() for future in futures if future.exception() is not None]
+    if cancel_event is not None and cancel_event.is_set():
+        raise FFmpegCancelled("Décodage annulé")
+    if errors:
+        # L'erreur d'origine plutôt que l'arrêt qu'elle a provoqué dans les autres tranches
+        raise next((error for error in errors if not isinstance(error, FFmpegCancelled)), errors[0])
+    results = [future.result() for future in futures]
+    logging.info(f"Tranches décodées en {time.monotonic() - started:.1f}s")
+
+    window_energy = np.concatenate([statistics[0] for statistics, _ in results])
+    total_samples = sum(statistics[1] for statistics, _ in results)
+    if total_samples == 0:
+        envelope = AudioEnvelope(np.zeros(0), window_size, sample_rate, 0, 0.0, 0.0)
+    else:
+        energy_sum = sum(statistics[2] for statistics, _ in results)
+        square_sum = sum(statistics[3] for statistics, _ in results)
+        energy_mean = energy_sum / total_samples
+        energy_std = float(np.sqrt(max(square_sum / total_samples - energy_mean ** 2, 0.0)))
+        envelope = AudioEnvelope(window_energy, window_size, sample_rate, total_samples, energy_mean, energy_std)
+
+    audio_data = np.concatenate([audio for _, audio in results]) if keep_audio else None
+    return envelope, audio_data
+
+
+def compare_envelopes(reference, sharded, value=50, margin=0.1):
+    """Écarts entre l'enveloppe d'un décodage d'un seul tenant et celle d'un décodage par tranches
+
+    Compare le nombre de fenêtres, les énergies par fenêtre, les statistiques
+    globales et les segments détectés avec le même réglage (valeur du
+    slider et marge en secondes).
+    """
+    threshold = float(threshold_multiplier(value))
+    count = min(len(reference.window_energy), len(sharded.window_energy))
+    window_diff = np.abs(reference.window_energy[:count] - sharded.window_energy[:count])
+    reference_segments = detect_segments(reference, threshold, margin)
+    sharded_segments = detect_segments(sharded, threshold, margin)
+    report = {
+        "windows": [len(reference.window_energy), len(sharded.window_energy)],
+        "samples": [reference.total_samples, sharded.total_samples],
+        "max_window_diff": float(np.max(window_diff)) if count else 0.0,
+        "mean_window_diff": float(np.mean(window_diff)) if count else 0.0,
+        "mean_diff": abs(reference.energy_mean - sharded.energy_mean),
+        "std_diff": abs(reference.energy_std - sharded.energy_std),
+        "segments": [len(reference_segments), len(sharded_segments)],
+        "segments_equal": reference_segments == sharded_segments
+    }
+    if len(reference_segments) == len(sharded_segments) and len(reference_segments):
+        report["max_boundary_shift"] = float(max(np.max(np.abs(reference_segments.starts - sharded_segments.starts)),
+                                                 np.max(np.abs(reference_segments.ends - sharded_segments.ends))))
+    return report
@@ -0,0 +1,192 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from video_cutter.chunk_cache import source_identity
+from video_cutter.envelope import AudioEnvelope
+
+# Mémoire partagée maximale gardée par le propriétaire des blocs (512 Mo)
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+
+
+def envelope_key(video_path):
+    """Clé d'une enveloppe : celle de l'EnvelopeCache (identité de la source)"""
+    return json.dumps(source_identity(video_path), sort_keys=True)
+
+
+def open_block(name):
+    """Ouvre un bloc existant
+
+    Les processus de travail sont lancés par le propriétaire des blocs
+    (spawn) et partagent son suivi des ressources : ouvrir ou fermer un bloc
+    ne le détruit pas, seul unlink le fait.
+    """
+    return shared_memory.SharedMemory(name=name)
+
+
+def publish_envelope(key, envelope):
+    """Copie les énergies d'une enveloppe dans un nouveau bloc de mémoire partagée
+
+    Retourne (bloc, descripteur). Le descripteur est un petit dictionnaire
+    sérialisable (nom du bloc, forme, statistiques) transmis aux autres
+    processus à la place des données.
+    """
+    window_energy = np.ascontiguousarray(envelope.window_energy, dtype=np.float64)
+    memory = shared_memory.SharedMemory(create=True, size=max(1, window_energy.nbytes))
+    np.ndarray(window_energy.shape, dtype=np.float64, buffer=memory.buf)[:] = window_energy
+    descriptor = {
+        "name": memory.name,
+        "key": key,
+        "length": len(window_energy),
+        "size": window_energy.nbytes,
+        "window_size": envelope.window_size,
+        "sample_rate": envelope.sample_rate,
+        "total_samples": envelope.total_samples,
+        "energy_mean": envelope.energy_mean,
+        "energy_std": envelope.energy_std
+    }
+    return memory, descriptor
+
+
+def attach_envelope(descriptor, memory):
+    """Enveloppe dont les énergies sont lues directement dans le bloc (sans copie, en lecture seule)
+
+    Le bloc doit rester ouvert tant que l'enveloppe est utilisée.
+    """
+    window_energy = np.ndarray((descriptor["length"],), dtype=np.float64, buffer=memory.buf)
+    window_energy.flags.writeable = False
+    return AudioEnvelope(window_energy, descriptor["window_size"], descriptor["sample_rate"],
+                         descriptor["total_samples"], descriptor["energy_mean"], descriptor["energy_std"])
+
+
+def is_current(descriptor):
+    """Indique si la source du descripteur n'a pas changé depuis l'analyse"""
+    try:
+        path = json.loads(descriptor["key"])["path"]
+        return envelope_key(path) == descriptor["key"]
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+class SharedEnvelopeStore:
+    """Blocs de mémoire partagée des enveloppes, détenus par un processus et comptés par référence
+
+    Le propriétaire (le serveur de travaux) garde une référence sur chaque
+    bloc et en prête d'autres aux sessions qui l'utilisent (lease/release).
+    Un bloc n'est détruit que lorsque plus personne ne le référence : à
+    l'éviction (au-delà de max_bytes, les moins récemment utilisés et non
+    prêtés d'abord), quand une nouvelle analyse le remplace, ou à la
+    fermeture. Les autres processus ne reçoivent que des descripteurs.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        # Blocs remplacés ou évincés mais encore prêtés, par nom
+        self.orphans = {}
+        self.lock = threading.Lock()
+
+    def adopt(self, descriptor):
+        """Prend la propriété d'un bloc créé par un autre processus (avant que celui-ci ne se termine)"""
+        memory = open_block(descriptor["name"])
+        with self.lock:
+            previous = self.entries.pop(descriptor["key"], None)
+            self.entries[descriptor["key"]] = {"descriptor": descriptor, "memory": memory, "references": 1}
+            if previous is not None:
+                self._release_entry(previous)
+            self._evict()
+        logging.info(f"Enveloppe partagée : {descriptor['name']} ({descriptor['size'] / 1024:.0f} Ko)")
+
+    def publish(self, key, envelope):
+        """Publie une enveloppe de ce processus ; retourne son descripteur"""
+        memory, descriptor = publish_envelope(key, envelope)
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            self.entries[key] = {"descriptor": descriptor, "memory": memory, "references": 1}
+            if previous is not None:
+                self._release_entry(previous)
+            self._evict()
+        return descriptor
+
+    def lease(self, key):
+        """Prête le bloc d'une enveloppe à une session ; retourne son descripteur, ou None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if not is_current(entry["descriptor"]):
+                # Source modifiée depuis l'analyse
+                del self.entries[key]
+                self._release_entry(entry)
+                return None
+            entry["references"] += 1
+            self.entries.move_to_end(key)
+            return entry["descriptor"]
+
+    def release(self, descriptor):
+        """Rend un bloc prêté par lease"""
+        with self.lock:
+            entry = self.entries.get(descriptor["key"])
+            if entry is not None and entry["descriptor"]["name"] == descriptor["name"]:
+                entry["references"] -= 1
+                if entry["references"] <= 0:
+                    del self.entries[descriptor["key"]]
+                    self._unlink(entry)
+                return
+            # Bloc déjà remplacé : la dernière référence est rendue par la session
+            self._release_entry(self.orphans.pop(descriptor["name"], None))
+
+    def _release_entry(self, entry):
+        """Retire la référence du propriétaire ; le bloc survit tant qu'il est prêté"""
+        if entry is None:
+            return
+        entry["references"] -= 1
+        if entry["references"] <= 0:
+            self.orphans.pop(entry["descriptor"]["name"], None)
+            self._unlink(entry)
+        else:
+            self.orphans[entry["descriptor"]["name"]] = entry
+
+    @staticmethod
+    def _unlink(entry):
+        memory = entry["memory"]
+        try:
+            memory.close()
+            memory.unlink()
+        except (FileNotFoundError, BufferError) as e:
+            logging.warning(f"Bloc {memory.name} non libéré : {str(e)}")
+
+    def _evict(self):
+        """Libère les blocs non prêtés les moins récemment utilisés au-delà de max_bytes"""
+        total = sum(entry["descriptor"]["size"] for entry in self.entries.values())
+        for key in list(self.entries):
+            if total <= self.max_bytes:
+                break
+            entry = self.entries[key]
+            if entry["references"] > 1:
+                continue
+            del self.entries[key]
+            total -= entry["descriptor"]["size"]
+            self._release_entry(entry)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "envelopes": len(self.entries),
+                "bytes": sum(entry["descriptor"]["size"] for entry in self.entries.values()),
+                "leased": sum(entry["references"] - 1 for entry in self.entries.values()),
+                "orphans": len(self.orphans)
+            }
+
+    def close(self):
+        """Détruit tous les blocs (fermeture de la session propriétaire)"""
+        with self.lock:
+            entries = list(self.entries.values()) + list(self.orphans.values())
+            self.entries.clear()
+            self.orphans.clear()
+        for entry in entries:
+            self._unlink(entry)
@@ -0,0 +1,185 @@
+import os
+import re
+import logging
+import traceback
+
+import numpy as np
+
+from video_cutter.segments import SegmentList
+
+# Horodatage SRT (00:01:02,345) ou VTT (01:02.345 ou 00:01:02.345)
+TIMESTAMP_PATTERN = r"(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{3})"
+# Ligne de minutage d'une réplique, avec les réglages VTT éventuels après la fin
+CUE_TIMING = re.compile(rf"^[ \t]*{TIMESTAMP_PATTERN}[ \t]+-->[ \t]+{TIMESTAMP_PATTERN}([^\n]*)$", re.MULTILINE)
+# Séparation des blocs (répliques, en-tête, notes) par une ligne vide
+BLOCK_SEPARATOR = re.compile(r"\n[ \t]*\n")
+
+SUBTITLE_EXTENSIONS = ('.srt', '.vtt')
+
+
+class TimeMap:
+    """Correspondance entre les instants de la source et ceux de la vidéo exportée
+
+    Les segments gardés sont mis bout à bout : output_starts[i] est l'instant
+    de sortie où commence le segment i (somme cumulée des durées précédentes).
+    Chaque conversion est une recherche dichotomique (np.searchsorted) et
+    accepte un tableau d'instants. overlap retire la durée des fondus
+    enchaînés à chaque raccord (export audio seul).
+    """
+
+    def __init__(self, segments, overlap=0.0):
+        segments = SegmentList.from_tuples(segments)
+        self.starts = segments.starts
+        self.durations = segments.durations()
+        self.overlap = float(overlap)
+        self.output_starts = np.concatenate(([0.0], np.cumsum(self.durations)[:-1])) if len(segments) else np.zeros(0)
+        self.output_starts -= np.arange(len(segments)) * self.overlap
+        self.segments = segments
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def output_duration(self):
+        """Durée de la vidéo exportée"""
+        if not len(self):
+            return 0.0
+        return float(self.output_starts[-1] + self.durations[-1])
+
+    def to_output(self, times):
+        """Convertit des instants de la source en instants de sortie
+
+        Un instant coupé est ramené au raccord qui remplace la coupe : le
+        début de la coupe et sa fin tombent au même instant de sortie.
+        """
+        scalar = np.ndim(times) == 0
+        times = np.asarray(times, dtype=np.float64)
+        if not len(self):
+            result = np.zeros(times.shape)
+        else:
+            index = np.searchsorted(self.starts, times, side='right') - 1
+            before = index < 0
+            index = np.maximum(index, 0)
+            offset = np.clip(times - self.starts[index], 0.0, self.durations[index])
+            result = np.where(before, 0.0, self.output_starts[index] + offset)
+        return float(result) if scalar else result
+
+    def to_source(self, times):
+        """Convertit des instants de sortie en instants de la source
+
+        Un instant qui tombe exactement sur un raccord donne le début du
+        segment qui suit, c'est-à-dire l'image affichée à cet instant.
+        """
+        scalar = np.ndim(times) == 0
+        times = np.asarray(times, dtype=np.float64)
+        if not len(self):
+            result = np.zeros(times.shape)
+        else:
+            index = np.clip(np.searchsorted(self.output_starts, times, side='right') - 1, 0, len(self) - 1)
+            offset = np.clip(times - self.output_starts[index], 0.0, self.durations[index])
+            result = self.starts[index] + offset
+        return float(result) if scalar else result
+
+    def is_kept(self, times):
+        """Indique pour chaque instant de la source s'il est gardé"""
+        return self.segments.contains(times)
+
+    def remap_intervals(self, starts, ends):
+        """Convertit des intervalles de la source (répliques, notes, chapitres)
+
+        Retourne les bornes de sortie et un masque des intervalles qui gardent
+        une durée non nulle ; un intervalle entièrement coupé disparaît.
+        """
+        output_starts = self.to_output(np.asarray(starts, dtype=np.float64))
+        output_ends = self.to_output(np.asarray(ends, dtype=np.float64))
+        return output_starts, output_ends, output_ends > output_starts
+
+
+def parse_timestamps(groups):
+    """Convertit les groupes (heures, minutes, secondes, millisecondes) en secondes"""
+    if not len(groups):
+        return np.zeros((0, 0))
+    values = np.array([[value or 0 for value in row] for row in groups], dtype=np.int64)
+    hours, minutes, seconds, millis = values[:, 0::4], values[:, 1::4], values[:, 2::4], values[:, 3::4]
+    return hours * 3600 + minutes * 60 + seconds + millis / 1000.0
+
+
+def format_timestamps(times, separator):
+    """Horodatages HH:MM:SS,mmm (SRT) ou HH:MM:SS.mmm (VTT)"""
+    millis = np.round(np.asarray(times) * 1000).astype(np.int64)
+    seconds, millis = np.divmod(millis, 1000)
+    minutes, seconds = np.divmod(seconds, 60)
+    hours, minutes = np.divmod(minutes, 60)
+    return [f"{h:02d}:{m:02d}:{s:02d}{separator}{ms:03d}"
+            for h, m, s, ms in zip(hours.tolist(), minutes.tolist(), seconds.tolist(), millis.tolist())]
+
+
+def retime_subtitles(text, time_map, vtt=False):
+    """Recale toutes les répliques d'un fichier SRT ou VTT sur la vidéo exportée
+
+    Les minutages sont lus, convertis et réécrits en un seul passage vectorisé.
+    Les répliques entièrement coupées sont supprimées ; celles d'un SRT sont
+    renumérotées. Les blocs sans minutage (en-tête WEBVTT, NOTE, STYLE) sont
+    conservés tels quels.
+    """
+    text = text.lstrip('\ufeff').replace('\r\n', '\n')
+    blocks = [block.strip('\n') for block in BLOCK_SEPARATOR.split(text)]
+    blocks = [block for block in blocks if block.strip()]
+    matches = [CUE_TIMING.search(block) for block in blocks]
+    cue_indices = [index for index, match in enumerate(matches) if match is not None]
+
+    times = parse_timestamps([matches[index].groups()[:8] for index in cue_indices])
+    if len(cue_indices):
+        starts, ends, keep = time_map.remap_intervals(times[:, 0], times[:, 1])
+    else:
+        starts, ends, keep = np.zeros(0), np.zeros(0), np.zeros(0, dtype=bool)
+    separator = '.' if vtt else ','
+    formatted_starts = format_timestamps(starts, separator)
+    formatted_ends = format_timestamps(ends, separator)
+
+    retimed = {}
+    for position, index in enumerate(cue_indices):
+        if not keep[position]:
+            continue
+        match = matches[index]
+        block = blocks[index]
+        timing = f"{formatted_starts[position]} --> {formatted_ends[position]}{match.group(9)}"
+        lines = (block[:match.start()] + timing + block[match.end():]).split('\n')
+        if not vtt and lines and lines[0].strip().isdigit() and not CUE_TIMING.match(lines[0]):
+            # Numéro de réplique SRT, recalculé après suppression des répliques coupées
+            lines = lines[1:]
+        retimed[index] = lines
+
+    output = []
+    number = 0
+    for index, block in enumerate(blocks):
+        if index in retimed:
+            lines = retimed[index]
+            if not vtt:
+                number += 1
+                lines = [str(number)] + lines
+            output.append('\n'.join(lines))
+        elif matches[index] is None:
+            output.append(block)
+    logging.info(f"Sous-titres recalés : {int(np.sum(keep))} répliques gardées sur {len(cue_indices)}")
+    return '\n\n'.join(output) + '\n'
+
+
+def retime_subtitle_file(input_path, output_path, time_map):
+    """Recale un fichier .srt ou .vtt et l'écrit sous output_path"""
+    try:
+        extension = os.path.splitext(input_path)[1].lower()
+        if extension not in SUBTITLE_EXTENSIONS:
+            raise Exception(f"Format de sous-titres non pris en charge : {extension}")
+        with open(input_path, 'r', encoding='utf-8-sig', errors='replace') as f:
+            text = f.read()
+        retimed = retime_subtitles(text, time_map, vtt=extension == '.vtt')
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(retimed)
+        return output_path
+
+    except Exception as e:
+        error_msg = f"Erreur lors du recalage des sous-titres {input_path} : {str(e)}"
+        logging.error(error_msg)
+        logging.error(traceback.format_exc())
+        raise Exception(error_msg)
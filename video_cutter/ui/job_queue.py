@@ -0,0 +1,501 @@
+import os
+import time
+import logging
+from itertools import count
+from PyQt6.QtWidgets import (QGroupBox, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
+                             QTableWidget, QTableWidgetItem, QProgressBar, QComboBox,
+                             QSpinBox, QFileDialog, QHeaderView, QAbstractItemView)
+from PyQt6.QtCore import Qt, QObject, pyqtSignal
+
+from video_cutter.media_probe import MEDIA_EXTENSIONS, is_audio_file
+from video_cutter.resource_governor import ResourceGovernor, EXPORT
+
+# Statuts d'un travail
+WAITING = "En attente"
+RUNNING = "En cours"
+PAUSED = "En pause"
+DONE = "Terminé"
+FAILED = "Erreur"
+CANCELLED = "Annulé"
+
+# Nombre de travaux simultanés par défaut
+DEFAULT_MAX_CONCURRENT = 2
+# Valeur de max_concurrent confiant le parallélisme au gouverneur de ressources
+AUTO_CONCURRENT = 0
+
+_job_ids = count(1)
+
+
+class Job:
+    """Une vidéo de la file d'attente avec ses propres paramètres"""
+
+    def __init__(self, video_path, preset_name, threshold, margin, output_path, options=None):
+        self.id = next(_job_ids)
+        self.video_path = video_path
+        self.preset_name = preset_name
+        self.threshold = threshold
+        self.margin = margin
+        self.output_path = output_path
+        # Options d'export partagées avec la fenêtre principale (cache, normalisation...)
+        self.options = dict(options or {})
+        self.status = WAITING
+        self.progress = 0
+        self.message = ""
+        self.thread = None
+        # Ce que l'arrêt en cours doit produire : PAUSED ou CANCELLED
+        self.stop_status = None
+        # Démarrage et travaux simultanés prévus (débit mesuré en mode automatique)
+        self.started_at = None
+        self.concurrency = None
+
+
+class JobScheduler(QObject):
+    """Lance les travaux de la file dans l'ordre, jusqu'à max_concurrent à la fois
+
+    Chaque travail tourne dans son propre ProcessThread. L'export se fait
+    toujours par blocs reprenables : une pause interrompt le travail entre
+    deux blocs et la reprise repart du dernier bloc terminé. Avec
+    max_concurrent à AUTO_CONCURRENT, un ResourceGovernor choisit le nombre
+    de travaux simultanés et les threads de chaque FFmpeg.
+    """
+    job_changed = pyqtSignal(int)  # Identifiant du travail
+    queue_changed = pyqtSignal()
+    all_finished = pyqtSignal()
+
+    def __init__(self, worker_class, cache_provider=None, max_concurrent=DEFAULT_MAX_CONCURRENT, parent=None):
+        super().__init__(parent)
+        self.worker_class = worker_class
+        # Fonction retournant le ChunkCache partagé (ou None)
+        self.cache_provider = cache_provider
+        self.max_concurrent = max_concurrent
+        self.governor = None
+        self.jobs = []
+        self.running = False
+
+    def job(self, job_id):
+        """Retourne le travail d'identifiant job_id"""
+        return next((job for job in self.jobs if job.id == job_id), None)
+
+    def active_jobs(self):
+        """Travaux en cours d'exécution"""
+        return [job for job in self.jobs if job.thread is not None]
+
+    def add_job(self, job):
+        """Ajoute un travail en fin de file"""
+        self.jobs.append(job)
+        logging.info(f"Travail ajouté à la file : {job.video_path} -> {job.output_path}")
+        self.queue_changed.emit()
+        self.schedule()
+
+    def remove_job(self, job_id):
+        """Retire un travail qui n'est pas en cours"""
+        job = self.job(job_id)
+        if job is None or job.thread is not None:
+            return False
+        self.jobs.remove(job)
+        self.queue_changed.emit()
+        return True
+
+    def move_job(self, job_id, offset):
+        """Déplace un travail de offset positions dans la file"""
+        job = self.job(job_id)
+        if job is None:
+            return False
+        index = self.jobs.index(job)
+        new_index = min(max(index + offset, 0), len(self.jobs) - 1)
+        if new_index == index:
+            return False
+        self.jobs.insert(new_index, self.jobs.pop(index))
+        self.queue_changed.emit()
+        return True
+
+    def set_max_concurrent(self, value):
+        """Modifie le nombre de travaux simultanés (AUTO_CONCURRENT : choisi par le gouverneur)"""
+        self.max_concurrent = max(AUTO_CONCURRENT, int(value))
+        if self.max_concurrent == AUTO_CONCURRENT and self.governor is None:
+            self.governor = ResourceGovernor()
+        self.schedule()
+
+    def is_auto(self):
+        return self.max_concurrent == AUTO_CONCURRENT
+
+    def concurrency(self):
+        """Travaux simultanés permis et threads de chaque FFmpeg (None : un par cœur)"""
+        if not self.is_auto():
+            return self.max_concurrent, None
+        pending = sum(1 for job in self.jobs if job.thread is not None or job.status == WAITING)
+        return self.governor.plan(EXPORT, pending)
+
+    def start(self):
+        """Démarre le traitement de la file"""
+        self.running = True
+        logging.info(f"Démarrage de la file d'attente "
+                     f"({'automatique' if self.is_auto() else self.max_concurrent} travaux simultanés)")
+        self.schedule()
+
+    def stop(self):
+        """N'ouvre plus de nouveaux travaux ; ceux en cours se terminent"""
+        self.running = False
+
+    def schedule(self):
+        """Démarre les travaux en attente tant qu'il reste de la place"""
+        if not self.running:
+            return
+        max_concurrent, threads = self.concurrency()
+        for job in self.jobs:
+            if len(self.active_jobs()) >= max_concurrent:
+                break
+            if job.status == WAITING and job.thread is None:
+                job.concurrency = max_concurrent
+                self.start_job(job, threads)
+        if not self.active_jobs() and not any(job.status == WAITING for job in self.jobs):
+            self.running = False
+            self.all_finished.emit()
+
+    def start_job(self, job, threads=None):
+        """Crée et lance le thread d'un travail"""
+        cache = None
+        if job.options.get("use_cache") and self.cache_provider is not None:
+            cache = self.cache_provider()
+        job.thread = self.worker_class(
+            job.video_path,
+            job.threshold,
+            job.margin,
+            job.output_path,
+            resumable=True,
+            cache=cache,
+            normalize=job.options.get("normalize", False),
+            keep_visual=job.options.get("keep_visual", False),
+            stable_detection=job.options.get("stable_detection", False),
+            drop_retakes=job.options.get("drop_retakes", False),
+            threads=threads
+        )
+        job.started_at = time.monotonic()
+        job.status = RUNNING
+        job.stop_status = None
+        job.message = "Préparation..."
+        job.thread.progress.connect(lambda message, percent, job_id=job.id: self.on_progress(job_id, message, percent))
+        job.thread.finished.connect(lambda success, message, job_id=job.id: self.on_finished(job_id, success, message))
+        job.thread.start()
+        logging.info(f"Travail {job.id} démarré : {job.video_path}")
+        self.job_changed.emit(job.id)
+
+    def on_progress(self, job_id, message, percent):
+        job = self.job(job_id)
+        if job is not None:
+            job.progress = percent
+            job.message = message
+            self.job_changed.emit(job_id)
+
+    def on_finished(self, job_id, success, message):
+        job = self.job(job_id)
+        if job is None:
+            return
+        job.thread.wait()
+        if success and self.is_auto() and job.thread.media_duration:
+            self.governor.record(EXPORT, job.thread.media_duration, time.monotonic() - job.started_at,
+                                 job.concurrency)
+        job.thread = None
+        job.message = message
+        if success:
+            job.status = DONE
+            job.progress = 100
+        elif job.stop_status is not None:
+            job.status = job.stop_status
+        else:
+            job.status = FAILED
+        logging.info(f"Travail {job.id} : {job.status}")
+        self.job_changed.emit(job_id)
+        self.schedule()
+
+    def pause_job(self, job_id):
+        """Met un travail en pause (il s'arrête au prochain bloc s'il tourne)"""
+        job = self.job(job_id)
+        if job is None:
+            return
+        if job.thread is not None:
+            job.stop_status = PAUSED
+            job.message = "Mise en pause..."
+            job.thread.cancel()
+        elif job.status == WAITING:
+            job.status = PAUSED
+        self.job_changed.emit(job_id)
+
+    def resume_job(self, job_id):
+        """Remet en attente un travail en pause, annulé ou en erreur"""
+        job = self.job(job_id)
+        if job is None or job.thread is not None or job.status not in (PAUSED, CANCELLED, FAILED):
+            return
+        job.status = WAITING
+        job.message = ""
+        self.job_changed.emit(job_id)
+        self.schedule()
+
+    def cancel_job(self, job_id):
+        """Annule un travail"""
+        job = self.job(job_id)
+        if job is None:
+            return
+        if job.thread is not None:
+            job.stop_status = CANCELLED
+            job.message = "Annulation..."
+            job.thread.cancel()
+        elif job.status in (WAITING, PAUSED):
+            job.status = CANCELLED
+        self.job_changed.emit(job_id)
+
+    def cancel_all(self, wait=False):
+        """Annule tous les travaux en cours (à la fermeture de l'application)"""
+        self.running = False
+        for job in self.active_jobs():
+            job.stop_status = CANCELLED
+            job.thread.cancel()
+        if wait:
+            for job in self.active_jobs():
+                job.thread.wait()
+
+
+class JobQueuePanel(QGroupBox):
+    """File d'attente de vidéos traitées les unes après les autres, ou en parallèle"""
+    COLUMNS = ["Fichier", "Préréglage", "Sortie", "Statut", "Progression"]
+
+    def __init__(self, presets, options_provider, worker_class, cache_provider=None, parent=None):
+        super().__init__("File d'attente", parent)
+        self.presets = presets
+        # Fonction retournant les options d'export courantes de la fenêtre principale
+        self.options_provider = options_provider
+        self.scheduler = JobScheduler(worker_class, cache_provider, parent=self)
+        self.scheduler.job_changed.connect(self.update_job_row)
+        self.scheduler.queue_changed.connect(self.refresh_table)
+        self.scheduler.all_finished.connect(self.on_all_finished)
+        self.updating = False
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setMinimumHeight(140)
+        self.table.itemChanged.connect(self.on_item_changed)
+        self.table.itemSelectionChanged.connect(self.update_buttons)
+        layout.addWidget(self.table)
+
+        buttons_layout = QHBoxLayout()
+        add_button = QPushButton("Ajouter des vidéos")
+        add_button.setToolTip("Ajoute une ou plusieurs vidéos avec le préréglage sélectionné")
+        add_button.clicked.connect(self.add_videos)
+        buttons_layout.addWidget(add_button)
+
+        self.up_button = QPushButton("Monter")
+        self.up_button.clicked.connect(lambda: self.move_selected(-1))
+        buttons_layout.addWidget(self.up_button)
+        self.down_button = QPushButton("Descendre")
+        self.down_button.clicked.connect(lambda: self.move_selected(1))
+        buttons_layout.addWidget(self.down_button)
+
+        self.pause_button = QPushButton("Pause")
+        self.pause_button.setToolTip("Interrompt le travail au prochain bloc ; la reprise repart de là")
+        self.pause_button.clicked.connect(self.toggle_pause)
+        buttons_layout.addWidget(self.pause_button)
+        self.cancel_button = QPushButton("Annuler")
+        self.cancel_button.clicked.connect(self.cancel_selected)
+        buttons_layout.addWidget(self.cancel_button)
+        self.remove_button = QPushButton("Retirer")
+        self.remove_button.clicked.connect(self.remove_selected)
+        buttons_layout.addWidget(self.remove_button)
+
+        buttons_layout.addStretch(1)
+        buttons_layout.addWidget(QLabel("Travaux simultanés :"))
+        self.concurrent_spinbox = QSpinBox()
+        # Au minimum : automatique (selon les cœurs, la mémoire et le débit mesuré)
+        self.concurrent_spinbox.setMinimum(AUTO_CONCURRENT)
+        self.concurrent_spinbox.setSpecialValueText("Auto")
+        self.concurrent_spinbox.setMaximum(max(1, os.cpu_count() or 1))
+        self.concurrent_spinbox.setValue(min(DEFAULT_MAX_CONCURRENT, self.concurrent_spinbox.maximum()))
+        self.concurrent_spinbox.valueChanged.connect(self.scheduler.set_max_concurrent)
+        self.scheduler.set_max_concurrent(self.concurrent_spinbox.value())
+        buttons_layout.addWidget(self.concurrent_spinbox)
+
+        self.start_button = QPushButton("Démarrer la file")
+        self.start_button.setStyleSheet("QPushButton { font-weight: bold; }")
+        self.start_button.clicked.connect(self.toggle_running)
+        buttons_layout.addWidget(self.start_button)
+        layout.addLayout(buttons_layout)
+
+        self.update_buttons()
+
+    def set_presets(self, presets):
+        """Met à jour la liste des préréglages proposés"""
+        self.presets = presets
+        self.refresh_table()
+
+    def add_videos(self):
+        """Ajoute des vidéos ou des fichiers audio à la file avec le préréglage et les options courants"""
+        patterns = ' '.join(f"*{extension}" for extension in MEDIA_EXTENSIONS)
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self,
+            "Ajouter des vidéos",
+            "",
+            f"Fichiers vidéo et audio ({patterns});;Tous les fichiers (*.*)"
+        )
+        options = self.options_provider()
+        preset_name = options.get("preset") or next(iter(self.presets), "")
+        preset = self.presets.get(preset_name, {"threshold": options["threshold"], "margin": options["margin"]})
+        for file_path in file_paths:
+            output_dir = options.get("output_dir") or os.path.dirname(file_path)
+            base_name, extension = os.path.splitext(os.path.basename(file_path))
+            # Audio seul : export dans le même format (voir MainWindow.select_video)
+            extension = extension.lower() if is_audio_file(file_path) else '.mp4'
+            output_path = os.path.join(output_dir, f"{base_name}_sans_blancs{extension}")
+            self.scheduler.add_job(Job(file_path, preset_name, preset["threshold"], preset["margin"],
+                                       output_path, options))
+
+    def selected_job(self):
+        """Travail de la ligne sélectionnée"""
+        rows = self.table.selectionModel().selectedRows()
+        if not rows:
+            return None
+        item = self.table.item(rows[0].row(), 0)
+        return self.scheduler.job(item.data(Qt.ItemDataRole.UserRole)) if item else None
+
+    def select_job(self, job_id):
+        for row, job in enumerate(self.scheduler.jobs):
+            if job.id == job_id:
+                self.table.selectRow(row)
+
+    def move_selected(self, offset):
+        job = self.selected_job()
+        if job is not None and self.scheduler.move_job(job.id, offset):
+            self.select_job(job.id)
+
+    def toggle_pause(self):
+        job = self.selected_job()
+        if job is None:
+            return
+        if job.status in (PAUSED, CANCELLED, FAILED):
+            self.scheduler.resume_job(job.id)
+        else:
+            self.scheduler.pause_job(job.id)
+
+    def cancel_selected(self):
+        job = self.selected_job()
+        if job is not None:
+            self.scheduler.cancel_job(job.id)
+
+    def remove_selected(self):
+        job = self.selected_job()
+        if job is not None:
+            self.scheduler.remove_job(job.id)
+
+    def toggle_running(self):
+        if self.scheduler.running:
+            self.scheduler.stop()
+        else:
+            self.scheduler.start()
+        self.update_buttons()
+
+    def on_all_finished(self):
+        logging.info("File d'attente terminée")
+        self.update_buttons()
+
+    def refresh_table(self):
+        """Reconstruit le tableau à partir de la file"""
+        self.updating = True
+        selected = self.selected_job()
+        self.table.setRowCount(len(self.scheduler.jobs))
+        for row, job in enumerate(self.scheduler.jobs):
+            name_item = QTableWidgetItem(os.path.basename(job.video_path))
+            name_item.setData(Qt.ItemDataRole.UserRole, job.id)
+            name_item.setToolTip(job.video_path)
+            name_item.setFlags(name_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+            self.table.setItem(row, 0, name_item)
+
+            preset_combo = QComboBox()
+            preset_combo.addItems(self.presets.keys())
+            preset_combo.setCurrentText(job.preset_name)
+            preset_combo.currentTextChanged.connect(
+                lambda name, job_id=job.id: self.on_preset_changed(job_id, name))
+            self.table.setCellWidget(row, 1, preset_combo)
+
+            self.table.setItem(row, 2, QTableWidgetItem(os.path.basename(job.output_path)))
+            self.table.setItem(row, 3, QTableWidgetItem())
+            self.table.item(row, 3).setFlags(Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable)
+
+            progress_bar = QProgressBar()
+            progress_bar.setTextVisible(True)
+            self.table.setCellWidget(row, 4, progress_bar)
+            self.fill_row(row, job)
+        self.updating = False
+        if selected is not None:
+            self.select_job(selected.id)
+        self.update_buttons()
+
+    def fill_row(self, row, job):
+        """Met à jour le statut et la progression d'une ligne"""
+        status_item = self.table.item(row, 3)
+        status_item.setText(job.status)
+        status_item.setToolTip(job.message)
+        self.table.cellWidget(row, 4).setValue(job.progress)
+        # Les paramètres d'un travail lancé ne peuvent plus changer
+        editable = job.thread is None and job.status != DONE
+        self.table.cellWidget(row, 1).setEnabled(editable)
+        output_item = self.table.item(row, 2)
+        if editable:
+            output_item.setFlags(output_item.flags() | Qt.ItemFlag.ItemIsEditable)
+        else:
+            output_item.setFlags(output_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+
+    def update_job_row(self, job_id):
+        for row, job in enumerate(self.scheduler.jobs):
+            if job.id == job_id:
+                self.updating = True
+                self.fill_row(row, job)
+                self.updating = False
+        self.update_buttons()
+
+    def on_preset_changed(self, job_id, preset_name):
+        job = self.scheduler.job(job_id)
+        if job is not None and preset_name in self.presets:
+            job.preset_name = preset_name
+            job.threshold = self.presets[preset_name]["threshold"]
+            job.margin = self.presets[preset_name]["margin"]
+
+    def on_item_changed(self, item):
+        """Renomme la sortie d'un travail"""
+        if self.updating or item.column() != 2:
+            return
+        job = self.scheduler.job(self.table.item(item.row(), 0).data(Qt.ItemDataRole.UserRole))
+        name = item.text().strip()
+        if job is None or not name:
+            return
+        extension = os.path.splitext(job.output_path)[1] or '.mp4'
+        if not name.lower().endswith(extension.lower()):
+            name += extension
+        job.output_path = os.path.join(os.path.dirname(job.output_path), name)
+        self.updating = True
+        item.setText(name)
+        self.updating = False
+
+    def update_buttons(self):
+        job = self.selected_job()
+        has_job = job is not None
+        self.up_button.setEnabled(has_job)
+        self.down_button.setEnabled(has_job)
+        self.cancel_button.setEnabled(has_job and job.status in (WAITING, RUNNING, PAUSED))
+        self.remove_button.setEnabled(has_job and job.thread is None)
+        self.pause_button.setEnabled(has_job and job.status != DONE)
+        self.pause_button.setText("Reprendre" if has_job and job.status in (PAUSED, CANCELLED, FAILED) else "Pause")
+        self.start_button.setText("Arrêter la file" if self.scheduler.running else "Démarrer la file")
+
+    def has_running_jobs(self):
+        return bool(self.scheduler.active_jobs())
+
+    def shutdown(self):
+        """Annule les travaux en cours et attend la fin de leurs threads"""
+        self.scheduler.cancel_all(wait=True)
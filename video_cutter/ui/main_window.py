@@ -3,13 +3,12 @@ import sys
 import json
 import logging
 import subprocess
-import cv2
 from datetime import datetime, timedelta
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                           QPushButton, QLabel, QFileDialog, QSlider, QSpinBox,
                           QProgressBar, QMessageBox, QLineEdit, QComboBox,
-                          QInputDialog, QGroupBox)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer
+                          QInputDialog, QGroupBox, QCheckBox, QTimeEdit)
+from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer, QTime
 from PyQt6.QtGui import QImage, QPixmap
 
 def format_duration(seconds):
@@ -22,7 +21,15 @@ parent_dir = os.path.dirname(os.path.dirname(current_dir))
 if parent_dir not in sys.path:
     sys.path.append(parent_dir)
 
-from video_cutter.audio_analyzer import AudioAnalyzer
+# cv2, NumPy et l'analyseur sont importés à la première utilisation (ou en
+# arrière-plan après le premier affichage) pour que la fenêtre apparaisse vite
+from video_cutter.media_probe import is_audio_file
+from video_cutter.chunk_cache import ChunkCache
+from video_cutter.envelope_cache import EnvelopeCache
+from video_cutter.ui.sweep_curve import SweepCurveWidget
+from video_cutter.ui.job_queue import JobQueuePanel
+from video_cutter.ui.thumbnail_strip import ThumbnailStrip
+from video_cutter.ui.prefetch import PrefetchThread
 
 def open_folder(path):
     """Ouvre un dossier dans l'explorateur de fichiers"""
@@ -39,43 +46,112 @@ class ProcessThread(QThread):
     progress = pyqtSignal(str, int)  # Message et pourcentage
     finished = pyqtSignal(bool, str)
     
-    def __init__(self, video_path, threshold, margin, output_path):
+    def __init__(self, video_path, threshold, margin, output_path, resumable=False, cache=None,
+                 normalize=False, keep_visual=False, stable_detection=False, envelope_cache=None,
+                 drop_retakes=False, draft=False, segments=None, threads=None):
         QThread.__init__(self)
         self.video_path = video_path
         self.threshold = threshold
         self.margin = margin
         self.output_path = output_path
-        self.analyzer = AudioAnalyzer()
+        self.resumable = resumable
+        self.cache = cache
+        self.normalize = normalize
+        self.keep_visual = keep_visual
+        self.stable_detection = stable_detection
+        self.drop_retakes = drop_retakes
+        self.draft = draft
+        # Segments d'un brouillon précédent : repris tels quels, sans nouvelle détection
+        self.segments = segments
+        # Threads de chaque FFmpeg d'export (None : un par cœur)
+        self.threads = threads
+        # Durée de la source, connue après l'analyse (débit mesuré par la file d'attente)
+        self.media_duration = None
+        from video_cutter.audio_analyzer import AudioAnalyzer
+        self.analyzer = AudioAnalyzer(envelope_cache)
         
     def run(self):
         try:
             # Initialiser l'analyseur
             self.analyzer.set_threshold(self.threshold)
             self.analyzer.set_margin(self.margin)
+            self.analyzer.set_keep_visual_activity(self.keep_visual)
+            self.analyzer.set_hysteresis(self.stable_detection)
+            self.analyzer.set_threads(self.threads)
             
-            # Extraire l'audio
-            self.progress.emit("Extraction de l'audio...", 10)
-            audio_data, sample_rate = self.analyzer.extract_audio(self.video_path)
-            
-            # Détecter les segments
-            self.progress.emit("Analyse audio et détection des segments...", 40)
-            segments = self.analyzer.detect_speech_segments(audio_data, sample_rate)
+            retakes = []
+            if self.segments is not None:
+                self.progress.emit("Reprise des segments du brouillon...", 40)
+                segments = self.segments
+                envelope = None
+                if self.normalize:
+                    envelope = self.analyzer.analyze(self.video_path, with_loudness=True)
+            else:
+                # Extraire l'audio
+                self.progress.emit("Extraction de l'audio...", 10)
+                envelope = self.analyzer.analyze(self.video_path, with_loudness=self.normalize,
+                                                 with_visual=self.keep_visual)
+                self.media_duration = envelope.duration
+                self.analyzer.check_cancelled()
+                
+                # Détecter les segments
+                self.progress.emit("Analyse audio et détection des segments...", 40)
+                segments = self.analyzer.segments_from_envelope(envelope)
+                
+                if not segments:
+                    self.finished.emit(False, "Aucun segment de parole n'a été détecté. Essayez d'ajuster le seuil de détection.")
+                    return
+                
+                if self.drop_retakes:
+                    self.progress.emit("Recherche des prises recommencées...", 50)
+                    from video_cutter.retakes import detect_retakes, drop_retakes
+                    retakes = detect_retakes(self.video_path, segments, self.analyzer.cancel_event)
+                    segments = drop_retakes(segments, retakes)
+                    self.analyzer.check_cancelled()
+                # Gardés pour un rendu final sans nouvelle analyse
+                self.segments = segments
             
-            if not segments:
-                self.finished.emit(False, "Aucun segment de parole n'a été détecté. Essayez d'ajuster le seuil de détection.")
-                return
+            audio_filter = None
+            if self.normalize:
+                self.progress.emit("Mesure de l'intensité sonore...", 60)
+                audio_filter = self.analyzer.normalization_filter(envelope, segments)
             
             # Exporter les segments
-            self.progress.emit("Export de la vidéo...", 70)
+            self.analyzer.check_cancelled()
+            self.progress.emit("Export du brouillon..." if self.draft else "Export de la vidéo...", 70)
             output_dir = os.path.dirname(self.output_path)
             output_name = os.path.basename(self.output_path)
-            self.analyzer.export_segments(self.video_path, segments, output_dir, output_name)
+            summary = self.analyzer.export_segments(self.video_path, segments, output_dir, output_name,
+                                                    resumable=self.resumable,
+                                                    progress_callback=self.export_progress,
+                                                    cache=self.cache,
+                                                    audio_filter=audio_filter,
+                                                    draft=self.draft)
             
             self.progress.emit("Finalisation...", 95)
-            self.finished.emit(True, f"Traitement terminé avec succès !\nLa vidéo sans les blancs a été enregistrée sous :\n{self.output_path}")
+            message = f"Traitement terminé avec succès !\nLa vidéo sans les blancs a été enregistrée sous :\n{self.output_path}"
+            if self.draft:
+                message = (f"Brouillon enregistré sous :\n{self.output_path}\n\n"
+                           "Le rendu final reprendra les mêmes coupes si les réglages ne changent pas.")
+            if summary and summary.get("cached"):
+                message += f"\n\n{summary['cached']}/{summary['chunks']} segments repris du cache"
+            if retakes:
+                message += f"\n\n{len(retakes)} prises recommencées retirées"
+            self.finished.emit(True, message)
             
         except Exception as e:
-            self.finished.emit(False, f"Erreur lors du traitement : {str(e)}")
+            if self.analyzer.cancel_event.is_set():
+                self.finished.emit(False, "Traitement annulé")
+            else:
+                self.finished.emit(False, f"Erreur lors du traitement : {str(e)}")
+
+    def cancel(self):
+        """Demande l'arrêt du traitement"""
+        self.analyzer.cancel()
+
+    def export_progress(self, done, total):
+        """Relaie l'avancement de l'export par blocs"""
+        self.progress.emit(f"Export de la vidéo (bloc {done}/{total})...", 70 + int(25 * done / total))
 
 class VideoPreviewThread(QThread):
     """Thread pour la prévisualisation de la vidéo"""
@@ -86,10 +162,20 @@ class VideoPreviewThread(QThread):
         super().__init__()
         self.video_path = video_path
         self.running = True
+        self.seek_position = None
+        
+    def seek(self, seconds):
+        """Reprend la lecture à la position donnée"""
+        self.seek_position = seconds
         
     def run(self):
+        import cv2
         cap = cv2.VideoCapture(self.video_path)
         fps = cap.get(cv2.CAP_PROP_FPS)
+        if not cap.isOpened() or fps <= 0:
+            # Fichier audio seul : pas d'image à afficher
+            cap.release()
+            return
         frame_delay = int(1000 / fps)
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         duration = total_frames / fps
@@ -98,6 +184,9 @@ class VideoPreviewThread(QThread):
         self.duration_ready.emit(duration, 0)  # La durée estimée sera mise à jour plus tard
         
         while self.running and cap.isOpened():
+            if self.seek_position is not None:
+                cap.set(cv2.CAP_PROP_POS_MSEC, self.seek_position * 1000)
+                self.seek_position = None
             ret, frame = cap.read()
             if ret:
                 # Convertir BGR en RGB
@@ -125,6 +214,17 @@ class VideoPreviewThread(QThread):
         self.running = False
         self.wait()
 
+class WarmupThread(QThread):
+    """Importe les modules lourds en arrière-plan une fois la fenêtre affichée"""
+    
+    def run(self):
+        try:
+            import cv2  # noqa: F401
+            import video_cutter.audio_analyzer  # noqa: F401
+            logging.info("Modules d'analyse chargés en arrière-plan")
+        except Exception as e:
+            logging.error(f"Erreur lors du préchargement des modules : {str(e)}")
+
 class LoadingIndicator(QWidget):
     """Widget d'indication de chargement"""
     def __init__(self, parent=None):
@@ -186,7 +286,18 @@ class MainWindow(QMainWindow):
         self.setup_tooltips()
         self.preview_thread = None
         self.original_duration = 0
-        self.analyzer = AudioAnalyzer()
+        self.analyzer = None
+        self.warmup_thread = None
+        # Enveloppes partagées entre l'analyseur de la fenêtre, le préchargement et le traitement
+        self.envelope_cache = EnvelopeCache()
+        self.prefetch_thread = None
+        # Échecs d'analyse du préchargement par (fichier, activité visuelle), oubliés à la sélection suivante
+        self.analysis_errors = {}
+        # Durée cible demandée avant la fin de l'analyse
+        self.target_pending = False
+        self.chunk_cache = None
+        self.sweep_result = None
+        self.sweep_key = None
         self.loading_preset = False
         self.estimate_timer = QTimer()
         self.estimate_timer.setSingleShot(True)
@@ -194,6 +305,65 @@ class MainWindow(QMainWindow):
         self.estimate_timer.timeout.connect(self.delayed_estimate)
         logging.info("Application démarrée")
         
+    def start_background_warmup(self):
+        """Précharge cv2 et l'analyseur sans bloquer l'interface"""
+        if self.warmup_thread is None:
+            self.warmup_thread = WarmupThread()
+            self.warmup_thread.start()
+            
+    def get_analyzer(self):
+        """Analyseur de la fenêtre, créé à la première utilisation"""
+        if self.analyzer is None:
+            from video_cutter.audio_analyzer import AudioAnalyzer
+            # Détection et balayage des seuils seulement : les enveloppes sont calculées par le préchargement
+            self.analyzer = AudioAnalyzer(self.envelope_cache)
+        return self.analyzer
+        
+    def start_prefetch(self, video_path):
+        """Lance l'analyse en arrière-plan de la vidéo choisie et des suivantes du dossier"""
+        if self.prefetch_thread is None:
+            self.prefetch_thread = PrefetchThread(self.envelope_cache)
+            self.prefetch_thread.analysis_ready.connect(self.on_prefetch_ready)
+            self.prefetch_thread.analysis_failed.connect(self.on_prefetch_failed)
+            self.prefetch_thread.start(QThread.Priority.LowPriority)
+        self.prefetch_thread.request(video_path, with_visual=self.visual_checkbox.isChecked())
+        
+    def request_analysis(self):
+        """Demande au préchargement l'enveloppe de la vidéo choisie avec les mesures actuelles
+
+        Retourne l'enveloppe si elle est déjà en cache, sinon None : l'analyse
+        tourne en arrière-plan et relancera l'estimation. L'interface ne
+        décode jamais elle-même.
+        """
+        with_visual = self.visual_checkbox.isChecked()
+        envelope = self.get_analyzer().cached_envelope(self.video_path, with_visual=with_visual)
+        if envelope is not None:
+            return envelope
+        error = self.analysis_errors.get((self.video_path, with_visual))
+        if error is not None:
+            raise Exception(error)
+        if self.prefetch_thread is None or not self.prefetch_thread.is_pending(self.video_path):
+            self.start_prefetch(self.video_path)
+        self.estimated_duration_label.setText("Durée estimée : analyse en cours...")
+        self.estimated_duration_label.setToolTip("")
+        return None
+        
+    def on_prefetch_ready(self, video_path):
+        """Affiche l'estimation dès que l'analyse de la vidéo choisie est prête (ou a échoué)"""
+        if video_path == self.video_path:
+            if self.preview_thread is None:
+                # L'aperçu vient d'être produit (ou a échoué : lecture de la source)
+                self.start_preview(video_path, fallback=True)
+            self.estimate_duration()
+            if self.target_pending:
+                self.target_pending = False
+                self.reach_target_duration()
+            
+    def on_prefetch_failed(self, video_path, message):
+        """Retient l'échec pour ne pas relancer sans fin la même analyse"""
+        self.analysis_errors[(video_path, self.visual_checkbox.isChecked())] = message
+        self.on_prefetch_ready(video_path)
+        
     def setup_logging(self):
         """Configure le système de logging"""
         log_dir = os.path.join(os.path.expanduser("~"), "AutoDerush_logs")
@@ -311,11 +481,21 @@ class MainWindow(QMainWindow):
         self.preview_label = QLabel()
         self.preview_label.setMinimumSize(480, 270)  # Format 16:9
         self.preview_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.preview_label.setStyleSheet("QLabel { background-color: black; border: 1px solid #666; }")
+        self.preview_label.setStyleSheet("QLabel { background-color: black; color: white; border: 1px solid #666; }")
         preview_layout.addWidget(self.preview_label)
         
         left_column.addWidget(preview_group)
         
+        # Vignettes des segments gardés et des coupes
+        segments_group = QGroupBox("Segments gardés et coupes")
+        segments_layout = QVBoxLayout(segments_group)
+        self.thumbnail_strip = ThumbnailStrip()
+        self.thumbnail_strip.setToolTip("Cliquez sur une vignette pour la voir dans la prévisualisation")
+        self.thumbnail_strip.time_selected.connect(self.seek_preview)
+        segments_layout.addWidget(self.thumbnail_strip)
+        
+        left_column.addWidget(segments_group)
+        
         # Colonne de droite (40% de la largeur)
         right_column = QVBoxLayout()
         right_column.setContentsMargins(10, 0, 0, 0)  # Marge à gauche pour séparer les colonnes
@@ -388,6 +568,54 @@ class MainWindow(QMainWindow):
         margin_layout.addWidget(self.margin_spinbox)
         params_layout.addLayout(margin_layout)
         
+        # Conservation des passages visuellement actifs
+        self.visual_checkbox = QCheckBox("Garder les passages visuellement actifs")
+        self.visual_checkbox.setToolTip(
+            "Analyse l'image en basse résolution et conserve les silences\n"
+            "pendant lesquels il se passe quelque chose à l'écran (démos, captures d'écran)."
+        )
+        self.visual_checkbox.toggled.connect(self.schedule_estimate)
+        params_layout.addWidget(self.visual_checkbox)
+        
+        # Détection avec hystérésis
+        self.stable_checkbox = QCheckBox("Détection stable (hystérésis)")
+        self.stable_checkbox.setToolTip(
+            "Un segment s'ouvre au-dessus du seuil et ne se ferme que sous un seuil plus bas.\n"
+            "Les fins de mots peu sonores ne sont plus hachées : moins de segments, export plus rapide."
+        )
+        self.stable_checkbox.toggled.connect(self.schedule_estimate)
+        params_layout.addWidget(self.stable_checkbox)
+        
+        # Prises recommencées
+        self.retakes_checkbox = QCheckBox("Retirer les prises recommencées")
+        self.retakes_checkbox.setToolTip(
+            "Repère les phrases répétées après une erreur (empreintes audio) et ne garde que la dernière prise.\n"
+            "Appliqué à l'export : la durée estimée ne le prend pas en compte."
+        )
+        params_layout.addWidget(self.retakes_checkbox)
+        
+        # Courbe durée de sortie / seuil
+        curve_layout = QVBoxLayout()
+        curve_layout.addWidget(QLabel("Durée de sortie selon le seuil :"))
+        self.sweep_curve = SweepCurveWidget()
+        self.sweep_curve.value_selected.connect(self.threshold_slider.setValue)
+        self.threshold_slider.valueChanged.connect(self.sweep_curve.set_current)
+        self.sweep_curve.set_current(self.threshold_slider.value())
+        curve_layout.addWidget(self.sweep_curve)
+        params_layout.addLayout(curve_layout)
+        
+        # Durée cible
+        target_layout = QHBoxLayout()
+        target_layout.addWidget(QLabel("Durée cible :"))
+        self.target_duration_edit = QTimeEdit()
+        self.target_duration_edit.setDisplayFormat("HH:mm:ss")
+        target_layout.addWidget(self.target_duration_edit, 1)
+        target_button = QPushButton("Atteindre")
+        target_button.setToolTip("Choisit le seuil qui donne la durée de sortie la plus proche de la cible")
+        target_button.clicked.connect(self.reach_target_duration)
+        target_layout.addWidget(target_button)
+        params_layout.addLayout(target_layout)
+        
         right_column.addWidget(params_group)
         
         # Groupe Export
@@ -420,6 +648,30 @@ class MainWindow(QMainWindow):
         self.output_name_edit.setPlaceholderText("nom_de_la_video.mp4")
         export_layout.addWidget(self.output_name_edit)
         
+        # Export par blocs avec reprise
+        self.resumable_checkbox = QCheckBox("Export reprenable (par blocs)")
+        self.resumable_checkbox.setToolTip(
+            "Encode la vidéo par blocs finalisés au fur et à mesure.\n"
+            "Si l'export est interrompu, le relancer reprend au dernier bloc terminé."
+        )
+        export_layout.addWidget(self.resumable_checkbox)
+        
+        # Cache des segments encodés
+        self.cache_checkbox = QCheckBox("Réutiliser les segments déjà encodés (cache)")
+        self.cache_checkbox.setToolTip(
+            "Conserve chaque segment encodé sur le disque.\n"
+            "Après un léger changement de seuil, seuls les segments modifiés sont réencodés."
+        )
+        export_layout.addWidget(self.cache_checkbox)
+        
+        # Normalisation de l'intensité sonore
+        self.normalize_checkbox = QCheckBox("Normaliser le volume (EBU R128)")
+        self.normalize_checkbox.setToolTip(
+            "Mesure l'intensité des passages gardés pendant l'analyse\n"
+            "et la ramène à -23 LUFS pendant l'export, sans décodage supplémentaire."
+        )
+        export_layout.addWidget(self.normalize_checkbox)
+        
         right_column.addWidget(export_group)
         
         # Groupe Progression
@@ -441,20 +693,38 @@ class MainWindow(QMainWindow):
         # Bouton de traitement
         self.process_button = QPushButton("Traiter la vidéo")
         self.process_button.setToolTip("Lancer le traitement de la vidéo avec les paramètres actuels")
-        self.process_button.clicked.connect(self.process_video)
+        self.process_button.clicked.connect(lambda: self.process_video())
         self.process_button.setEnabled(False)
         self.process_button.setMinimumHeight(40)
         self.process_button.setStyleSheet("QPushButton { font-weight: bold; }")
         right_column.addWidget(self.process_button)
         
+        # Brouillon de relecture
+        self.draft_button = QPushButton("Brouillon rapide")
+        self.draft_button.setToolTip(
+            "Rendu en basse résolution, bien plus rapide que la durée de la vidéo, pour vérifier le rythme.\n"
+            "Le rendu final reprend ensuite les mêmes coupes sans nouvelle analyse."
+        )
+        self.draft_button.clicked.connect(lambda: self.process_video(draft=True))
+        self.draft_button.setEnabled(False)
+        right_column.addWidget(self.draft_button)
+        
         # Ajout des colonnes au layout principal
         content_layout.addLayout(left_column, 60)
         content_layout.addLayout(right_column, 40)
         main_layout.addLayout(content_layout)
         
+        # File d'attente de plusieurs vidéos, sur toute la largeur
+        self.job_queue_panel = JobQueuePanel(self.presets, self.current_job_options, ProcessThread,
+                                             cache_provider=self.get_chunk_cache)
+        main_layout.addWidget(self.job_queue_panel)
+        
         # Variables de classe
         self.video_path = None
         self.process_thread = None
+        # Réglages de détection et segments du dernier traitement, repris par le rendu suivant
+        self.last_segments = None
+        self.process_thread_settings = None
         
         # Charger le préréglage par défaut après l'initialisation de l'interface
         QTimer.singleShot(100, lambda: self.load_preset("Standard"))
@@ -465,26 +735,37 @@ class MainWindow(QMainWindow):
             self,
             "Sélectionner une vidéo",
             "",
-            "Fichiers vidéo (*.mp4 *.avi *.mkv *.mov);;Tous les fichiers (*.*)"
+            "Fichiers vidéo et audio (*.mp4 *.avi *.mkv *.mov *.wav *.flac *.mp3 *.m4a *.ogg *.opus);;"
+            "Tous les fichiers (*.*)"
         )
         
         if file_path:
             self.video_path = file_path
             self.video_label.setText(os.path.basename(file_path))
             self.process_button.setEnabled(True)
+            self.draft_button.setEnabled(True)
+            self.thumbnail_strip.clear_segments()
+            self.original_duration = 0
             
             # Mettre à jour le dossier de sortie par défaut
             self.output_dir_path.setText(os.path.dirname(file_path))
             
             # Suggérer un nom de fichier de sortie
-            base_name = os.path.splitext(os.path.basename(file_path))[0]
-            self.output_name_edit.setText(f"{base_name}_sans_blancs.mp4")
+            base_name, extension = os.path.splitext(os.path.basename(file_path))
+            if is_audio_file(file_path):
+                # Podcast ou voix off : export audio seul dans le même format
+                self.output_name_edit.setText(f"{base_name}_sans_blancs{extension.lower()}")
+            else:
+                self.output_name_edit.setText(f"{base_name}_sans_blancs.mp4")
             
             # Démarrer la prévisualisation
             self.start_preview(file_path)
             
-            # Estimer la durée avec les paramètres actuels
-            QTimer.singleShot(1000, self.estimate_duration)  # Attendre 1 seconde pour laisser le temps à la prévisualisation de s'initialiser
+            # Analyser tout de suite en arrière-plan : l'estimation s'affichera dès qu'elle sera prête
+            self.estimated_duration_label.setText("Durée estimée : analyse en cours...")
+            self.analysis_errors = {}
+            self.target_pending = False
+            self.start_prefetch(file_path)
             
             logging.info(f"Vidéo sélectionnée : {file_path}")
             
@@ -504,8 +785,14 @@ class MainWindow(QMainWindow):
         """Met à jour l'affichage de la valeur du seuil"""
         self.threshold_label.setText(str(value))
         
-    def process_video(self):
-        """Lance le traitement de la vidéo"""
+    def detection_settings(self):
+        """Réglages dont dépendent les segments : s'ils n'ont pas changé, les segments sont repris"""
+        return (self.video_path, self.threshold_slider.value(), self.margin_spinbox.value(),
+                self.visual_checkbox.isChecked(), self.stable_checkbox.isChecked(),
+                self.retakes_checkbox.isChecked())
+        
+    def process_video(self, draft=False):
+        """Lance le traitement de la vidéo (ou son brouillon de relecture)"""
         try:
             # Vérifier que tous les champs sont remplis
             if not self.video_path:
@@ -522,6 +809,7 @@ class MainWindow(QMainWindow):
             
             # Désactiver les contrôles
             self.process_button.setEnabled(False)
+            self.draft_button.setEnabled(False)
             self.progress_bar.show()
             self.status_label.show()
             self.progress_bar.setValue(0)
@@ -529,20 +817,47 @@ class MainWindow(QMainWindow):
             
             # Préparer le chemin de sortie
             output_path = os.path.join(self.output_dir_path.text(), self.output_name_edit.text())
+            if draft:
+                output_path = os.path.splitext(output_path)[0] + "_brouillon.mp4"
+            
+            # Même vidéo, mêmes réglages : les segments du traitement précédent sont repris
+            segments = None
+            if self.last_segments is not None and self.last_segments[0] == self.detection_settings():
+                segments = self.last_segments[1]
+                logging.info("Reprise des segments du traitement précédent")
             
             logging.info("Début du traitement de la vidéo")
             logging.info(f"Fichier vidéo : {self.video_path}")
             logging.info(f"Fichier de sortie : {output_path}")
             logging.info(f"Seuil : {self.threshold_slider.value()}")
             logging.info(f"Marge : {self.margin_spinbox.value()}")
+            logging.info(f"Export reprenable : {self.resumable_checkbox.isChecked()}")
+            logging.info(f"Cache des segments : {self.cache_checkbox.isChecked()}")
+            logging.info(f"Normalisation du volume : {self.normalize_checkbox.isChecked()}")
+            logging.info(f"Activité visuelle : {self.visual_checkbox.isChecked()}")
+            logging.info(f"Détection stable : {self.stable_checkbox.isChecked()}")
+            logging.info(f"Prises recommencées retirées : {self.retakes_checkbox.isChecked()}")
+            logging.info(f"Brouillon : {draft}")
+            
+            cache = self.get_chunk_cache() if self.cache_checkbox.isChecked() else None
             
             # Créer et démarrer le thread de traitement
             self.process_thread = ProcessThread(
                 self.video_path,
                 self.threshold_slider.value(),
                 self.margin_spinbox.value(),
-                output_path
+                output_path,
+                resumable=self.resumable_checkbox.isChecked(),
+                cache=cache,
+                normalize=self.normalize_checkbox.isChecked(),
+                keep_visual=self.visual_checkbox.isChecked(),
+                stable_detection=self.stable_checkbox.isChecked(),
+                envelope_cache=self.envelope_cache,
+                drop_retakes=self.retakes_checkbox.isChecked(),
+                draft=draft,
+                segments=segments
             )
+            self.process_thread_settings = self.detection_settings()
             
             self.process_thread.progress.connect(self.update_progress)
             self.process_thread.finished.connect(self.process_finished)
@@ -551,9 +866,30 @@ class MainWindow(QMainWindow):
         except Exception as e:
             self.show_error("Erreur", f"Erreur lors du lancement du traitement : {str(e)}")
             self.process_button.setEnabled(True)
+            self.draft_button.setEnabled(True)
             self.progress_bar.hide()
             self.status_label.hide()
             
+    def get_chunk_cache(self):
+        """Cache des segments encodés, partagé par tous les traitements"""
+        if self.chunk_cache is None:
+            self.chunk_cache = ChunkCache()
+        return self.chunk_cache
+        
+    def current_job_options(self):
+        """Paramètres courants appliqués aux vidéos ajoutées à la file d'attente"""
+        return {
+            "preset": self.presets_combo.currentText(),
+            "threshold": self.threshold_slider.value(),
+            "margin": self.margin_spinbox.value(),
+            "output_dir": self.output_dir_path.text(),
+            "use_cache": self.cache_checkbox.isChecked(),
+            "normalize": self.normalize_checkbox.isChecked(),
+            "keep_visual": self.visual_checkbox.isChecked(),
+            "stable_detection": self.stable_checkbox.isChecked(),
+            "drop_retakes": self.retakes_checkbox.isChecked()
+        }
+        
     def update_progress(self, message, percent):
         """Met à jour la barre de progression"""
         self.progress_bar.setValue(percent)
@@ -562,9 +898,12 @@ class MainWindow(QMainWindow):
     def process_finished(self, success, message):
         """Gère la fin du traitement"""
         self.process_button.setEnabled(True)
+        self.draft_button.setEnabled(True)
         self.progress_bar.hide()
         self.status_label.hide()
         
+        if success and self.process_thread.segments is not None:
+            self.last_segments = (self.process_thread_settings, self.process_thread.segments)
         if success:
             QMessageBox.information(self, "Succès", message)
         else:
@@ -651,6 +990,7 @@ class MainWindow(QMainWindow):
             
             # Sauvegarder dans le fichier
             self.save_presets()
+            self.job_queue_panel.set_presets(self.presets)
             logging.info(f"Nouveau préréglage sauvegardé : {name}")
             
     def delete_preset(self):
@@ -677,18 +1017,43 @@ class MainWindow(QMainWindow):
             del self.presets[preset_name]
             self.presets_combo.removeItem(self.presets_combo.currentIndex())
             self.save_presets()
+            self.job_queue_panel.set_presets(self.presets)
             logging.info(f"Préréglage supprimé : {preset_name}")
 
-    def start_preview(self, video_path):
-        """Démarre la prévisualisation de la vidéo"""
+    def preview_source(self, video_path):
+        """Aperçu produit pendant l'analyse, ou None s'il n'existe pas encore"""
+        from video_cutter.ingest import existing_proxy
+        return existing_proxy(video_path)
+        
+    def start_preview(self, video_path, fallback=False):
+        """Démarre la prévisualisation de la vidéo sur son aperçu
+
+        L'aperçu est produit par le décodage de l'analyse ; tant qu'il
+        n'existe pas, la prévisualisation attend la fin de l'analyse. Avec
+        fallback, la source est lue directement si l'aperçu manque.
+        """
         if self.preview_thread is not None:
             self.preview_thread.stop()
+            self.preview_thread = None
+        if is_audio_file(video_path):
+            # Fichier audio seul : pas d'image à afficher
+            self.preview_label.clear()
+            return
+        source = self.preview_source(video_path) or (video_path if fallback else None)
+        if source is None:
+            self.preview_label.setText("Préparation de l'aperçu...")
+            return
             
-        self.preview_thread = VideoPreviewThread(video_path)
+        self.preview_thread = VideoPreviewThread(source)
         self.preview_thread.frame_ready.connect(self.update_preview)
         self.preview_thread.duration_ready.connect(self.update_durations)
         self.preview_thread.start()
         
+    def seek_preview(self, seconds):
+        """Place la prévisualisation sur un segment ou une coupe"""
+        if self.preview_thread is not None:
+            self.preview_thread.seek(seconds)
+            
     def update_preview(self, image):
         """Met à jour l'image de prévisualisation"""
         self.preview_label.setPixmap(QPixmap.fromImage(image))
@@ -705,18 +1070,37 @@ class MainWindow(QMainWindow):
     def estimate_duration(self):
         """Estime la durée finale en fonction des paramètres actuels"""
         if hasattr(self, 'video_path') and self.video_path:
+            if self.prefetch_thread is not None and self.prefetch_thread.is_pending(self.video_path):
+                # L'analyse tourne déjà en arrière-plan : elle relancera l'estimation
+                return
             try:
                 # Configurer l'analyseur avec les paramètres actuels
-                self.analyzer.set_threshold(self.threshold_slider.value())
-                self.analyzer.set_margin(self.margin_spinbox.value())
+                analyzer = self.get_analyzer()
+                analyzer.set_threshold(self.threshold_slider.value())
+                analyzer.set_margin(self.margin_spinbox.value())
+                analyzer.set_keep_visual_activity(self.visual_checkbox.isChecked())
+                analyzer.set_hysteresis(self.stable_checkbox.isChecked())
                 
-                # Extraire l'audio et analyser
-                audio_data, sample_rate = self.analyzer.extract_audio(self.video_path)
-                segments = self.analyzer.detect_speech_segments(audio_data, sample_rate)
+                # Enveloppe calculée en arrière-plan (une seule fois par fichier)
+                envelope = self.request_analysis()
+                if envelope is None:
+                    return
+                segments = analyzer.segments_from_envelope(envelope)
+                self.update_sweep_curve(envelope)
+                
+                if not self.original_duration:
+                    # Pas de durée lue par la prévisualisation (fichier audio seul)
+                    self.original_duration = envelope.duration
+                if not is_audio_file(self.video_path):
+                    if self.preview_thread is None:
+                        self.start_preview(self.video_path, fallback=True)
+                    # Vignettes décodées depuis l'aperçu (images clés rapprochées, petite image)
+                    self.thumbnail_strip.set_segments(self.preview_source(self.video_path) or self.video_path,
+                                                      segments, envelope.duration)
                 
                 if segments:
                     # Calculer la durée totale des segments
-                    total_duration = sum((end - start) for start, end in segments)
+                    total_duration = segments.total_duration()
                     # Mettre à jour l'affichage
                     self.update_durations(self.original_duration, total_duration)
                 else:
@@ -728,10 +1112,64 @@ class MainWindow(QMainWindow):
                 self.estimated_duration_label.setText("Durée estimée : --:--:--")
                 self.estimated_duration_label.setToolTip("Erreur lors de l'estimation")
 
+    def update_sweep_curve(self, envelope):
+        """Recalcule la courbe durée / seuil si l'enveloppe ou la marge a changé"""
+        margin = self.margin_spinbox.value()
+        key = (id(envelope), margin, self.visual_checkbox.isChecked(), self.stable_checkbox.isChecked())
+        if self.sweep_key != key:
+            self.sweep_result = self.get_analyzer().sweep_thresholds(envelope, margin)
+            self.sweep_key = key
+            self.sweep_curve.set_curve(self.sweep_result["values"], self.sweep_result["durations"],
+                                       envelope.duration)
+            
+    def reach_target_duration(self):
+        """Place le seuil sur la valeur qui donne la durée cible"""
+        if not self.video_path:
+            self.show_error("Erreur", "Veuillez sélectionner une vidéo.")
+            return
+        try:
+            target = QTime(0, 0).secsTo(self.target_duration_edit.time())
+            analyzer = self.get_analyzer()
+            analyzer.set_keep_visual_activity(self.visual_checkbox.isChecked())
+            analyzer.set_hysteresis(self.stable_checkbox.isChecked())
+            envelope = self.request_analysis()
+            if envelope is None:
+                # Le seuil sera placé dès que l'analyse en arrière-plan sera prête
+                self.target_pending = True
+                self.target_duration_edit.setToolTip("Analyse en cours, le seuil sera placé ensuite")
+                return
+            value, duration = analyzer.solve_threshold_for_duration(
+                envelope, target, self.margin_spinbox.value())
+            self.threshold_slider.setValue(value)
+            self.target_duration_edit.setToolTip(f"Seuil {value} : durée obtenue {format_duration(duration)}")
+        except Exception as e:
+            logging.error(f"Erreur lors de la recherche de la durée cible : {str(e)}")
+            self.show_error("Erreur", f"Impossible d'atteindre la durée cible : {str(e)}")
+
     def closeEvent(self, event):
         """Gestionnaire d'événement de fermeture de la fenêtre"""
+        if self.job_queue_panel.has_running_jobs():
+            reply = QMessageBox.question(
+                self,
+                "Travaux en cours",
+                "Des vidéos de la file d'attente sont en cours de traitement.\n"
+                "Les interrompre et quitter ? Les exports reprendront au dernier bloc terminé.",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if reply == QMessageBox.StandardButton.No:
+                event.ignore()
+                return
+            self.job_queue_panel.shutdown()
+        if self.process_thread is not None and self.process_thread.isRunning():
+            self.process_thread.cancel()
+            self.process_thread.wait()
         if self.preview_thread is not None:
             self.preview_thread.stop()
+        if self.prefetch_thread is not None:
+            self.prefetch_thread.stop()
+        self.thumbnail_strip.stop()
+        if self.warmup_thread is not None:
+            self.warmup_thread.wait()
         event.accept()
 
     def schedule_estimate(self):
@@ -0,0 +1,110 @@
+import os
+import logging
+import threading
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from video_cutter.media_probe import MEDIA_EXTENSIONS
+
+# Nombre de fichiers suivants du dossier analysés par anticipation
+PREFETCH_AHEAD = 2
+
+
+def next_files(video_path, count=PREFETCH_AHEAD):
+    """Fichiers média qui suivent video_path dans son dossier (ordre alphabétique)"""
+    folder = os.path.dirname(os.path.abspath(video_path))
+    name = os.path.basename(video_path)
+    try:
+        names = sorted((entry for entry in os.listdir(folder)
+                        if os.path.splitext(entry)[1].lower() in MEDIA_EXTENSIONS),
+                       key=str.lower)
+    except OSError:
+        return []
+    if name not in names:
+        return []
+    index = names.index(name)
+    return [os.path.join(folder, entry) for entry in names[index + 1:index + 1 + count]]
+
+
+class PrefetchThread(QThread):
+    """Analyse en arrière-plan la vidéo sélectionnée puis les suivantes du dossier
+
+    Les enveloppes vont dans le cache partagé avec l'analyseur de la fenêtre :
+    la première estimation n'a plus qu'à les relire. FFmpeg tourne en basse
+    priorité pour ne pas gêner la prévisualisation. Une nouvelle sélection
+    remplace les demandes en attente et interrompt l'analyse spéculative
+    d'un fichier qui n'est plus demandé.
+    """
+    analysis_ready = pyqtSignal(str)
+    analysis_failed = pyqtSignal(str, str)
+
+    def __init__(self, envelope_cache, parent=None):
+        super().__init__(parent)
+        self.envelope_cache = envelope_cache
+        self.analyzer = None
+        self.pending = []
+        self.current = None
+        self.with_visual = False
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+
+    def request(self, video_path, with_visual=False):
+        """Analyse video_path en priorité, puis les fichiers suivants du dossier"""
+        paths = [video_path] + next_files(video_path)
+        with self.condition:
+            # Le fichier en cours d'analyse n'est pas remis dans la file
+            self.pending = [path for path in paths if path != self.current]
+            self.with_visual = with_visual
+            if self.current is not None and self.current not in paths and self.analyzer is not None:
+                logging.info(f"Préchargement interrompu : {self.current}")
+                self.analyzer.cancel_event.set()
+            self.condition.notify()
+        logging.info(f"Préchargement demandé : {', '.join(os.path.basename(path) for path in paths)}")
+
+    def is_pending(self, video_path):
+        """Indique si video_path est en cours d'analyse ou en attente"""
+        with self.condition:
+            return video_path == self.current or video_path in self.pending
+
+    def run(self):
+        # Import dans ce thread : NumPy et l'analyseur ne bloquent pas l'interface
+        from video_cutter.audio_analyzer import AudioAnalyzer
+        self.analyzer = AudioAnalyzer(self.envelope_cache)
+        self.analyzer.low_priority = True
+        # Le même décodage produit l'aperçu de prévisualisation
+        self.analyzer.set_proxy(True)
+
+        while not self.stop_event.is_set():
+            with self.condition:
+                while not self.pending and not self.stop_event.is_set():
+                    self.condition.wait()
+                if self.stop_event.is_set():
+                    break
+                video_path = self.pending.pop(0)
+                with_visual = self.with_visual
+                self.current = video_path
+                self.analyzer.cancel_event = threading.Event()
+            error = None
+            try:
+                self.analyzer.analyze(video_path, with_visual=with_visual)
+                logging.info(f"Préchargement terminé : {video_path}")
+            except Exception as e:
+                error = str(e)
+            cancelled = self.analyzer.cancel_event.is_set()
+            # Libérer le fichier avant de prévenir la fenêtre, qui vérifie is_pending
+            with self.condition:
+                self.current = None
+            if error is None:
+                self.analysis_ready.emit(video_path)
+            elif not cancelled:
+                logging.warning(f"Préchargement impossible pour {video_path} : {error}")
+                self.analysis_failed.emit(video_path, error)
+
+    def stop(self):
+        """Arrête le préchargement (à la fermeture de la fenêtre)"""
+        with self.condition:
+            self.stop_event.set()
+            self.pending = []
+            if self.analyzer is not None:
+                self.analyzer.cancel_event.set()
+            self.condition.notify()
+        self.wait()
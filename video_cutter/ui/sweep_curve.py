@@ -0,0 +1,84 @@
+from PyQt6.QtWidgets import QWidget
+from PyQt6.QtCore import Qt, QPointF, pyqtSignal
+from PyQt6.QtGui import QPainter, QPen, QColor, QPolygonF
+
+
+class SweepCurveWidget(QWidget):
+    """Courbe de la durée de sortie en fonction de la valeur du seuil
+
+    Un clic sur la courbe sélectionne directement la valeur correspondante.
+    """
+    value_selected = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.values = []
+        self.durations = []
+        self.original_duration = 0
+        self.current_value = None
+        self.setMinimumHeight(90)
+        self.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.setToolTip("Durée de sortie estimée pour chaque valeur du seuil.\n"
+                        "Cliquez sur la courbe pour choisir une valeur.")
+
+    def set_curve(self, values, durations, original_duration):
+        """Met à jour la courbe"""
+        self.values = [int(value) for value in values]
+        self.durations = [float(duration) for duration in durations]
+        self.original_duration = original_duration
+        self.update()
+
+    def clear_curve(self):
+        """Efface la courbe"""
+        self.values = []
+        self.durations = []
+        self.update()
+
+    def set_current(self, value):
+        """Met à jour la valeur courante signalée sur la courbe"""
+        self.current_value = value
+        self.update()
+
+    def plot_rect(self):
+        """Zone de tracé, en laissant une petite marge"""
+        return self.rect().adjusted(6, 6, -6, -6)
+
+    def point_for(self, value, duration):
+        """Position à l'écran d'un point (valeur, durée)"""
+        rect = self.plot_rect()
+        max_duration = max(self.original_duration, max(self.durations), 1e-9)
+        x = rect.left() + (value - 1) / 99 * rect.width()
+        y = rect.bottom() - duration / max_duration * rect.height()
+        return QPointF(x, y)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.fillRect(self.rect(), QColor("#FAFAFA"))
+        painter.setPen(QPen(QColor("#BDBDBD"), 1))
+        painter.drawRect(self.plot_rect())
+
+        if not self.values:
+            painter.setPen(QColor("#9E9E9E"))
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "Courbe disponible après l'analyse")
+            return
+
+        points = [self.point_for(value, duration) for value, duration in zip(self.values, self.durations)]
+        painter.setPen(QPen(QColor("#2196F3"), 2))
+        painter.drawPolyline(QPolygonF(points))
+
+        if self.current_value in self.values:
+            index = self.values.index(self.current_value)
+            point = points[index]
+            painter.setPen(QPen(QColor("#F44336"), 1, Qt.PenStyle.DashLine))
+            painter.drawLine(QPointF(point.x(), self.plot_rect().top()), QPointF(point.x(), self.plot_rect().bottom()))
+            painter.setBrush(QColor("#F44336"))
+            painter.drawEllipse(point, 4, 4)
+
+    def mousePressEvent(self, event):
+        if not self.values:
+            return
+        rect = self.plot_rect()
+        ratio = (event.position().x() - rect.left()) / max(rect.width(), 1)
+        value = int(round(1 + min(max(ratio, 0.0), 1.0) * 99))
+        self.value_selected.emit(value)
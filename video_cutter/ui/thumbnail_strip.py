@@ -0,0 +1,219 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from PyQt6.QtWidgets import QListWidget, QListWidgetItem, QListView, QAbstractItemView
+from PyQt6.QtCore import Qt, QSize, QThread, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap, QIcon, QColor
+
+from video_cutter.ffmpeg_runner import run_ffmpeg, FFmpegError
+
+# Taille des vignettes
+THUMBNAIL_SIZE = (160, 90)
+# Les instants sont arrondis à ce pas : deux vignettes proches partagent la même image
+TIMESTAMP_STEP = 0.5
+# Nombre d'images décodées gardées en mémoire (environ 43 Ko chacune)
+MAX_CACHED_FRAMES = 512
+# Délai maximal de décodage d'une vignette
+THUMBNAIL_TIMEOUT = 20
+
+KEPT_COLOR = QColor("#E8F5E9")
+CUT_COLOR = QColor("#FFEBEE")
+
+
+def quantize(timestamp):
+    """Arrondit un instant au pas des vignettes"""
+    return round(round(timestamp / TIMESTAMP_STEP) * TIMESTAMP_STEP, 3)
+
+
+class FrameCache:
+    """Images décodées les plus récemment utilisées, par (vidéo, instant)"""
+
+    def __init__(self, max_entries=MAX_CACHED_FRAMES):
+        self.max_entries = max_entries
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, video_path, timestamp):
+        with self.lock:
+            image = self.frames.get((video_path, timestamp))
+            if image is None:
+                self.misses += 1
+                return None
+            self.frames.move_to_end((video_path, timestamp))
+            self.hits += 1
+            return image
+
+    def put(self, video_path, timestamp, image):
+        with self.lock:
+            self.frames[(video_path, timestamp)] = image
+            self.frames.move_to_end((video_path, timestamp))
+            while len(self.frames) > self.max_entries:
+                self.frames.popitem(last=False)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.frames
+
+
+def decode_thumbnail(video_path, timestamp, cancel_event=None):
+    """Décode l'image clé la plus proche de timestamp, directement à la taille des vignettes
+
+    -noaccurate_seek évite de décoder les images entre l'image clé et l'instant demandé.
+    """
+    width, height = THUMBNAIL_SIZE
+    command = [
+        'ffmpeg',
+        '-v', 'error',
+        '-noaccurate_seek',
+        '-ss', f"{timestamp:.3f}",
+        '-i', video_path,
+        '-frames:v', '1',
+        '-an',
+        '-vf', f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+               f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
+        '-f', 'rawvideo',
+        '-pix_fmt', 'rgb24',
+        'pipe:1'
+    ]
+    result = run_ffmpeg(command, cancel_event=cancel_event, timeout=THUMBNAIL_TIMEOUT,
+                        capture_stdout=True, binary_stdout=True)
+    if len(result.stdout) < width * height * 3:
+        return None
+    image = QImage(result.stdout, width, height, width * 3, QImage.Format.Format_RGB888)
+    # Copie : l'image ne doit pas dépendre du tampon d'octets
+    return image.copy()
+
+
+class ThumbnailWorker(QThread):
+    """Décode en arrière-plan les vignettes demandées, les plus récentes d'abord"""
+    thumbnail_ready = pyqtSignal(str, float, QImage)
+
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.pending = []
+        self.condition = threading.Condition()
+        self.cancel_event = threading.Event()
+
+    def request(self, video_path, timestamps):
+        """Remplace les demandes en attente (seules les vignettes visibles comptent)"""
+        with self.condition:
+            self.pending = [(video_path, timestamp) for timestamp in timestamps
+                            if (video_path, timestamp) not in self.cache]
+            self.condition.notify()
+
+    def run(self):
+        while not self.cancel_event.is_set():
+            with self.condition:
+                while not self.pending and not self.cancel_event.is_set():
+                    self.condition.wait()
+                if self.cancel_event.is_set():
+                    break
+                video_path, timestamp = self.pending.pop(0)
+            try:
+                image = decode_thumbnail(video_path, timestamp, self.cancel_event)
+            except FFmpegError as e:
+                if not self.cancel_event.is_set():
+                    logging.warning(f"Vignette à {timestamp:.1f}s non décodée : {str(e)}")
+                continue
+            if image is not None:
+                self.cache.put(video_path, timestamp, image)
+                self.thumbnail_ready.emit(video_path, timestamp, image)
+
+    def stop(self):
+        with self.condition:
+            self.cancel_event.set()
+            self.condition.notify()
+        self.wait()
+
+
+class ThumbnailStrip(QListWidget):
+    """Bande de vignettes : une image par segment gardé et par coupe
+
+    Seules les vignettes visibles sont demandées au décodeur ; celles déjà
+    décodées sont reprises du cache, y compris après un changement de seuil.
+    """
+    time_selected = pyqtSignal(float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.video_path = None
+        self.cache = FrameCache()
+        self.worker = ThumbnailWorker(self.cache, self)
+        self.worker.thumbnail_ready.connect(self.on_thumbnail_ready)
+        self.worker.start()
+
+        width, height = THUMBNAIL_SIZE
+        self.setViewMode(QListView.ViewMode.IconMode)
+        self.setFlow(QListView.Flow.LeftToRight)
+        self.setWrapping(False)
+        self.setMovement(QListView.Movement.Static)
+        self.setIconSize(QSize(width, height))
+        self.setFixedHeight(height + 60)
+        self.setHorizontalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setSpacing(4)
+        self.placeholder = QPixmap(width, height)
+        self.placeholder.fill(QColor("#424242"))
+        self.horizontalScrollBar().valueChanged.connect(self.request_visible)
+        self.itemClicked.connect(lambda item: self.time_selected.emit(item.data(Qt.ItemDataRole.UserRole + 1)))
+
+    def set_segments(self, video_path, segments, duration):
+        """Affiche les segments gardés et les coupes d'une vidéo"""
+        self.video_path = video_path
+        entries = [(start, end, True) for start, end in segments]
+        entries += [(start, end, False) for start, end in segments.complement(0.0, duration)]
+        entries.sort()
+
+        self.clear()
+        for start, end, kept in entries:
+            timestamp = quantize((start + end) / 2)
+            label = "Gardé" if kept else "Coupé"
+            item = QListWidgetItem(f"{label} {timedelta(seconds=int(start))}\n{end - start:.1f}s")
+            item.setData(Qt.ItemDataRole.UserRole, timestamp)
+            item.setData(Qt.ItemDataRole.UserRole + 1, start)
+            item.setBackground(KEPT_COLOR if kept else CUT_COLOR)
+            item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+            image = self.cache.get(video_path, timestamp)
+            item.setIcon(QIcon(QPixmap.fromImage(image) if image is not None else self.placeholder))
+            self.addItem(item)
+        self.request_visible()
+
+    def clear_segments(self):
+        self.video_path = None
+        self.clear()
+
+    def visible_items(self):
+        viewport = self.viewport().rect()
+        return [self.item(row) for row in range(self.count())
+                if self.visualItemRect(self.item(row)).intersects(viewport)]
+
+    def request_visible(self):
+        """Demande les vignettes visibles qui ne sont pas encore décodées"""
+        if self.video_path is None:
+            return
+        timestamps = []
+        for item in self.visible_items():
+            timestamp = item.data(Qt.ItemDataRole.UserRole)
+            if timestamp not in timestamps and (self.video_path, timestamp) not in self.cache:
+                timestamps.append(timestamp)
+        self.worker.request(self.video_path, timestamps)
+
+    def on_thumbnail_ready(self, video_path, timestamp, image):
+        if video_path != self.video_path:
+            return
+        icon = QIcon(QPixmap.fromImage(image))
+        for row in range(self.count()):
+            item = self.item(row)
+            if item.data(Qt.ItemDataRole.UserRole) == timestamp:
+                item.setIcon(icon)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.request_visible()
+
+    def stop(self):
+        """Arrête le décodeur (à la fermeture de la fenêtre)"""
+        self.worker.stop()
@@ -0,0 +1,111 @@
+import logging
+import traceback
+
+import cv2
+import numpy as np
+
+from video_cutter.segments import SegmentList
+
+# Nombre d'images analysées par seconde de vidéo
+SAMPLE_FPS = 4.0
+# Résolution d'analyse (largeur, hauteur)
+ANALYSIS_SIZE = (64, 36)
+# Nombre d'images traitées ensemble
+BATCH_SIZE = 256
+# Différence moyenne (niveaux de gris 0-255) au-delà de laquelle l'image bouge
+MOTION_THRESHOLD = 2.0
+# Luminance moyenne en dessous de laquelle l'image est considérée noire
+BLACK_THRESHOLD = 16.0
+# Durée minimale d'un passage actif
+MIN_ACTIVE_DURATION = 0.5
+
+
+def frame_activity(frames, previous=None):
+    """Mesure l'activité d'un lot d'images en niveaux de gris (N, h, w)
+
+    Retourne la différence moyenne avec l'image précédente et la luminance
+    moyenne de chaque image. previous est la dernière image du lot précédent.
+    """
+    frames = frames.astype(np.int16)
+    if previous is None:
+        reference = np.concatenate((frames[:1], frames[:-1]))
+    else:
+        reference = np.concatenate((previous[np.newaxis].astype(np.int16), frames[:-1]))
+    difference = np.abs(frames - reference).mean(axis=(1, 2))
+    luma = frames.mean(axis=(1, 2))
+    return difference, luma
+
+
+def activity_mask(difference, luma, motion_threshold=MOTION_THRESHOLD, black_threshold=BLACK_THRESHOLD):
+    """Images actives : elles bougent et ne sont ni noires ni figées"""
+    black = luma < black_threshold
+    frozen = difference < motion_threshold
+    return ~black & ~frozen
+
+
+def detect_visual_activity(video_path, sample_fps=SAMPLE_FPS, motion_threshold=MOTION_THRESHOLD,
+                           black_threshold=BLACK_THRESHOLD):
+    """Détecte les passages où l'image bouge, sur une vidéo très réduite
+
+    Seule une image sur plusieurs est convertie et réduite ; les autres sont
+    simplement sautées. Les images retenues sont traitées par lots NumPy.
+    Retourne une SegmentList des passages visuellement actifs.
+    """
+    try:
+        logging.info("Détection de l'activité visuelle")
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise Exception(f"Impossible d'ouvrir la vidéo : {video_path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        step = max(1, int(round(fps / sample_fps)))
+
+        differences = []
+        lumas = []
+        batch = np.empty((BATCH_SIZE, ANALYSIS_SIZE[1], ANALYSIS_SIZE[0]), dtype=np.uint8)
+        filled = 0
+        previous = None
+        frame_index = 0
+
+        while True:
+            # Les images intermédiaires sont sautées sans conversion
+            if not cap.grab():
+                break
+            if frame_index % step == 0:
+                ok, frame = cap.retrieve()
+                if not ok:
+                    break
+                small = cv2.resize(frame, ANALYSIS_SIZE, interpolation=cv2.INTER_AREA)
+                batch[filled] = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+                filled += 1
+                if filled == BATCH_SIZE:
+                    difference, luma = frame_activity(batch, previous)
+                    differences.append(difference)
+                    lumas.append(luma)
+                    previous = batch[-1].copy()
+                    filled = 0
+            frame_index += 1
+
+        if filled:
+            difference, luma = frame_activity(batch[:filled], previous)
+            differences.append(difference)
+            lumas.append(luma)
+        cap.release()
+
+        if not differences:
+            logging.warning("Aucune image lue pour la détection visuelle")
+            return SegmentList()
+
+        active = activity_mask(np.concatenate(differences), np.concatenate(lumas),
+                               motion_threshold, black_threshold)
+        # Chaque image analysée représente les step images qui la suivent
+        segments = SegmentList.from_mask(active, step, fps, frame_index)
+        segments = segments.filter_min_length(MIN_ACTIVE_DURATION, strict=False)
+        logging.info(f"Activité visuelle : {len(segments)} passages, {segments.total_duration():.1f}s "
+                     f"sur {frame_index / fps:.1f}s ({len(active)} images analysées)")
+        return segments
+
+    except Exception as e:
+        error_msg = f"Erreur lors de la détection de l'activité visuelle : {str(e)}"
+        logging.error(error_msg)
+        logging.error(traceback.format_exc())
+        raise Exception(error_msg)